@@ -3,10 +3,13 @@
 
 import base64  # base64: 画像などのデータを、安全に送受信できる「テキスト（文字だけ）」に変換したり、元に戻したりする道具
 import datetime  # datetime: 今日の日付や、今の時間を取得するための道具
+import hashlib  # hashlib: ファイルの中身から「指紋（ハッシュ）」を作る道具
+import json  # json: 翻訳データなどを、指紋を作るための文字にする道具
 import os  # os: コンピューターのファイルやフォルダを操作する（場所を調べたりする）ための道具
-from io import BytesIO  # BytesIO: データを「一時的なファイル」のように扱うための道具
+import string  # string: アルファベットや数字など「よく使う文字の一覧」が入っている道具
+import tempfile  # tempfile: まとめたPDFを、一時的にファイルに書いておくための道具
+import threading  # threading: PDF作りの準備を「裏側のスレッド」でやってもらうための道具
 
-import requests  # requests: インターネット上のウェブサイトとやりとりする（情報を送ったり、もらったりする）ための道具
 from flask import (  # flask: ウェブサイト（ホームページ）を作るための中心的な道具箱
     Flask,  # Flask: ウェブサイトの「土台」を作るための道具
     Response,  # Response: ユーザーのブラウザ（Chromeなど）に「はい、どうぞ」と返事をするための道具
@@ -15,8 +18,24 @@ from flask import (  # flask: ウェブサイト（ホームページ）を作
     request,  # request: ユーザーが送ってきた情報（フォームに入力した内容など）を受け取るための道具
     url_for,  # url_for: ページのアドレス（URL）を正しく作るための道具
 )
-from fpdf import FPDF  # fpdf: PDFファイルを作成するための専門的な道具
-from PIL import Image  # PIL (Image): 画像ファイルを開いたり、保存したりするための道具
+from markupsafe import escape  # escape: HTMLの中に文字を安全に埋め込むための道具（flaskと一緒に入ります）
+
+from audit_log import AuditLog  # audit_log: 署名の「記録帳（監査ログ）」を作る道具（このフォルダの中にあります）
+from blob_client import DEFAULT_BASE_URL, BlobClient, UploadQueue  # blob_client: 倉庫（Vercel Blob）とやりとりする道具（このフォルダの中にあります）
+from metrics import init_app, metrics, span  # metrics: どこに時間がかかっているかを測る道具（このフォルダの中にあります）
+from page_cache import CachedPage, conditional_response, load_snapshot  # page_cache: できあがったページを覚えておく道具（このフォルダの中にあります）
+from registry import Registry  # registry: 説明者と翻訳データの「登録簿」を作る道具（このフォルダの中にあります）
+# （PDF作りに使う重い道具（batch・font_cache・pdf_template → fpdf や fontTools）は、
+#   ページを見るだけのリクエストを速くするために、使うときに読み込みます。下の warm_up() を見てください）
+from signature_image import MAX_SIGNATURE_BYTES, check_signature, decoded_size, normalize_signature  # signature_image: 署名画像を整える道具（このフォルダの中にあります）
+from signature_store import (  # signature_store: 署名画像の「置き場所（ストア）」を作る道具（このフォルダの中にあります）
+    BlobBackend,
+    DiskBackend,
+    MemoryStore,
+    SignatureStore,
+    content_key,
+)
+from signature_vector import encode_strokes  # signature_vector: 署名を「線のデータ」として扱う道具（このフォルダの中にあります）
 
 # --- プログラムの「場所」に関する設定 ---
 # このプログラムファイルが、コンピューターのどこにあるか（パス）を調べて、覚えておきます。
@@ -24,7 +43,19 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 # 「Flask」という道具を使って、ウェブサイト作りを開始します。
 # 「'templates'という名前のフォルダに、HTMLファイル（ページの設計図）が入っていますよ」と教えてあげます。
-app = Flask(__name__, template_folder=os.path.join(basedir, "templates"))
+# 「'static'という名前のフォルダに、CSSやJavaScriptのファイルが入っていますよ」とも教えてあげます。
+app = Flask(
+    __name__,
+    template_folder=os.path.join(basedir, "templates"),
+    static_folder=os.path.join(basedir, "static"),
+)
+
+# CSSやJavaScriptのファイルは、ブラウザに「1年間保存しておいていいですよ」と伝えます。
+# （ファイルの中身が変わったら、asset_url() が作る住所も変わるので、古いものが使われることはありません）
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 365 * 24 * 60 * 60
+
+# フォームで受け取れるデータの大きさの上限です。署名データ（base64のテキスト）の上限に合わせておきます。
+app.config["MAX_FORM_MEMORY_SIZE"] = MAX_SIGNATURE_BYTES * 4 // 3 + 1024
 
 # --- 大事な「秘密の情報」の設定 ---
 # SECRET_TOKEN: このシステムを使うための「合言葉」です。
@@ -32,37 +63,317 @@ app = Flask(__name__, template_folder=os.path.join(basedir, "templates"))
 # （もし読み込めなかったら、"LOS" を仮の合言葉にします）
 SECRET_TOKEN = os.environ.get("SECRET_TOKEN", "LOS")
 
+# ADMIN_TOKEN: 管理者用のページ（/export）を使うための「合言葉」です。
+# SECRET_TOKEN とは別のものにします。設定されていないときは、管理者用のページは使えません。
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
 # BLOB_READ_WRITE_TOKEN: データを保存する「インターネット上の倉庫（Vercel Blob）」を使うための「鍵」です。
 # これも「環境変数」から読み込みます。
 BLOB_READ_WRITE_TOKEN = os.environ.get("BLOB_READ_WRITE_TOKEN")
 
+# BLOB_BASE_URL: 倉庫の住所です。ふだんは Vercel Blob ですが、
+# テストでは手元の「にせものの倉庫」（benchmarks/fake_blob_server.py）の住所に置きかえられます。
+BLOB_BASE_URL = os.environ.get("BLOB_BASE_URL", DEFAULT_BASE_URL)
+
+# SIGNATURE_STORE_DIR: これが設定されていると、署名画像を倉庫（Vercel Blob）ではなく、この「手元のフォルダ」に保存します。
+# （テストや開発で、インターネットの倉庫を使わずに動かしたいときのための設定です）
+SIGNATURE_STORE_DIR = os.environ.get("SIGNATURE_STORE_DIR")
+
+# SIGNATURE_CACHE_BYTES / SIGNATURE_CACHE_TTL: 署名画像を「手元の棚（メモリ）」に置いておける合計の大きさ（バイト）と、時間（秒）です。
+SIGNATURE_CACHE_BYTES = int(os.environ.get("SIGNATURE_CACHE_BYTES", 32 * 1024 * 1024))
+SIGNATURE_CACHE_TTL = int(os.environ.get("SIGNATURE_CACHE_TTL", 60 * 60))
+
+# SIGNATURE_MODE: 署名を、ブラウザからどんな形で送ってもらうかです。
+#   "png": 画像（PNG）で送ってもらいます（以前からのやり方です）
+#   "vector": 指やマウスが通った「点の並び（線のデータ）」で送ってもらいます
+#             画像よりずっと小さく、PDFにも線として直接描くので、拡大してもぼやけません
+SIGNATURE_MODE = os.environ.get("SIGNATURE_MODE", "png")
+
+# PDF_CACHE_BYTES: できあがったPDFを「手元の棚（メモリ）」に置いておける合計の大きさ（バイト）です。
+# （同じ署名・説明者・日付のPDFをもう一度頼まれたら、作り直さずに棚のものを返します。時間は SIGNATURE_CACHE_TTL と同じです）
+PDF_CACHE_BYTES = int(os.environ.get("PDF_CACHE_BYTES", 16 * 1024 * 1024))
+
+# UPLOAD_QUEUE_SIZE: 裏側でのPDFの保存を、いくつまで並べておけるかです。
+# （倉庫が遅いときに、保存を待っているPDFでメモリがいっぱいにならないようにするための上限です）
+UPLOAD_QUEUE_SIZE = int(os.environ.get("UPLOAD_QUEUE_SIZE", 32))
+
+# BATCH_MAX_RECORDS: /batch-pdf で、1回にまとめて作れる人数の上限です。
+# BATCH_WORKERS: /batch-pdf でPDFを作るワーカー（プロセス）の数です。（全部のリクエストで使い回します。0 ならコアの数）
+# MAX_REQUEST_BYTES: 1回のリクエストで受け取れるデータの大きさの上限（バイト）です。（/batch-pdf のJSONも、これより大きいものは断ります）
+BATCH_MAX_RECORDS = int(os.environ.get("BATCH_MAX_RECORDS", 200))
+BATCH_WORKERS = int(os.environ.get("BATCH_WORKERS", 0))
+MAX_REQUEST_BYTES = int(os.environ.get("MAX_REQUEST_BYTES", 32 * 1024 * 1024))
+app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+
+# REQUEST_LOG: "0" にすると、1回のリクエストごとの記録（1行のJSON）を出さなくなります。
+REQUEST_LOG = os.environ.get("REQUEST_LOG", "1") != "0"
+
+# AUDIT_LOG_PATH: 署名の「記録帳（監査ログ）」を保存するファイルの場所です。
+# （Vercelでは "/tmp" にしか書き込めないので、ふだんはそこに置きます。ただし /tmp は、起動し直すたびに空っぽになります）
+# 場所がまちがっていて開けないときは、起動時にエラーになります。
+AUDIT_LOG_PATH = os.environ.get("AUDIT_LOG_PATH", "/tmp/signature_audit.sqlite3")
+
+# AUDIT_JOURNAL: "0" にすると、記録帳に書いた記録を、倉庫に「日誌のかけら」として置かなくなります。
+# （/tmp の記録帳は消えてしまうので、ずっと残る場所に AUDIT_LOG_PATH を置けるとき以外は、"1" のままにしてください）
+AUDIT_JOURNAL = os.environ.get("AUDIT_JOURNAL", "1") != "0"
+
+# AUDIT_JOURNAL_ROWS / AUDIT_JOURNAL_INTERVAL: 日誌のかけらを置く間隔です。（この件数がたまるか、この秒数がたったら、1つ置きます）
+# 間隔を長くすると、倉庫へのアップロードとかけらの数は減りますが、プロセスが止まったときに、まだ置いていない分は失われます。
+AUDIT_JOURNAL_ROWS = int(os.environ.get("AUDIT_JOURNAL_ROWS", 200))
+AUDIT_JOURNAL_INTERVAL = float(os.environ.get("AUDIT_JOURNAL_INTERVAL", 60))
+
+# PAGE_SNAPSHOT_PATH: 起動時に作るページを、前もって作って保存しておくファイルの場所です。
+# （`python page_cache.py` を実行すると作られます。無ければ、起動時にページを作ります）
+PAGE_SNAPSHOT_PATH = os.environ.get("PAGE_SNAPSHOT_PATH", os.path.join(basedir, "page_snapshot.pickle"))
+
+# WARM_UP: PDF作りの準備（フォントの読み込みなど）を、いつするかです。
+#   "background": 最初にガイダンスページが開かれたときに、裏側で始めます（ふだんはこれです）
+#                 ガイダンスを読んでいるあいだに準備が終わるので、言語選択のページはすぐに開きます。
+#   "eager": プログラムの起動時に済ませます（ずっと動き続けるサーバー向けです）
+#   "off": 最初にPDFを作るときに準備します
+WARM_UP = os.environ.get("WARM_UP", "background")
+
+# REGISTRY_DIR: 説明者の名前と、各言語の翻訳データ（JSONファイル）が入っているフォルダの場所です。
+# （デプロイとは別の場所に置いておけば、言語や説明者を足すときに、デプロイし直す必要はありません）
+REGISTRY_DIR = os.environ.get("REGISTRY_DIR", os.path.join(basedir, "data"))
+
+# REGISTRY_RELOAD_INTERVAL: REGISTRY_DIR のファイルが書きかえられていないかを、何秒ごとに確かめるかです。（0 なら確かめません）
+REGISTRY_RELOAD_INTERVAL = float(os.environ.get("REGISTRY_RELOAD_INTERVAL", 30))
+
 # FONT_FILE: PDFに日本語を表示するための「フォントファイル（文字のデザイン）」がどこにあるか、場所を覚えておきます。
 FONT_FILE = os.path.join(basedir, "NotoSansJP-Regular.ttf")
 
+# FONT_SUBSET_FILE: 確認書で使う文字だけを取り出した「小さいフォントファイル」の場所です。
+# （`python font_cache.py` を実行すると作られます。無ければ、いつもの大きいフォントを使います）
+FONT_SUBSET_FILE = os.path.join(basedir, "NotoSansJP-Subset.ttf")
+USE_FONT_SUBSET = os.path.exists(FONT_SUBSET_FILE)
+
+# ページごと・処理の段階ごとに、かかった時間を測るしかけを取りつけます。（くわしくは metrics.py を見てください）
+init_app(app, log=REQUEST_LOG)
+
 # --- プログラム内で使う「データ」の準備 ---
 
-# EXPLAINERS: ガイダンスを説明する担当者の名前を、言語ごとにまとめたリスト（辞書）
-EXPLAINERS = {
-    "vi": ["PHAM VAN THINH", "HOANG ANH NAM"],
-    "id": [
-        "PETRI SURYANI",
-        "IMELDA SARIHUTAJULU",
-        "FEBRI SAHRULLAH AHDIN",
-        "MARISYA UTARI",
-        "MOHAMMAD FARID HIDAYATULLAH",
-        "VANESSA KOBAYASHI",
-    ],
-    "my": ["PYO EAINDRAY MIN", "PHYOWAI ZAW"],
-    "jp": ["上林 あかり"],
-    "en": ["櫻井 功"],
-}
-
-# (TRANSLATIONSとJAPANESE_TEXTのデータは長いため、内容は省略しますが、
-#  TRANSLATIONS: 各言語の「翻訳データ」（ページのタイトル、説明文、ボタンの文字など）
-#  JAPANESE_TEXT: 翻訳の「お手本」となる日本語のテキストデータ
-#  ...という役割です)
-TRANSLATIONS = { "en": { "title": "Confirmation of Preliminary Guidance", "items": [ "1. Matters concerning the content of duties, amount of remuneration, and other working conditions.", "2. Content of activities that I can perform in Japan.", "3. Matters concerning immigration procedures.", "4. Neither I, nor my spouse, lineal relatives, cohabiting relatives, or other persons in a close social relationship with me, will have money or other property managed, nor will any contract stipulating penalties for non-performance of the Specified Skilled Worker employment contract be concluded, in connection with my activities in Japan.", "5. If I have paid fees to an organization in my home country for brokerage of the Specified Skilled Worker employment contract application or for preparation for activities, I must fully understand the amount and breakdown and have agreed to it with that organization.", "6. The costs required for my support will not be borne by me, either directly or indirectly.", "7. The accepting organization must provide transportation from the port of entry or airport where I will arrive in Japan.", "8. Support for securing appropriate housing will be provided to me.", "9. A system is in place to receive consultations or complaints from me regarding my professional, daily, or social life." ], "final_confirmation": "Furthermore, regarding item 4, neither I nor my spouse, etc., have currently made any payments for security deposits or entered into contracts related to penalties, and we will not do so in the future.", "signature_label": "Signature of the Specified Skilled Worker", "agree_checkbox": "I confirm and agree to all the contents above.", "submit_button": "Submit Signature and Proceed" }, "id": { "title": "Konfirmasi Bimbingan Awal", "items": [ "1. Hal-hal mengenai isi pekerjaan, jumlah upah, dan kondisi kerja lainnya.", "2. Isi kegiatan yang dapat saya lakukan di Jepang.", "3. Hal-hal mengenai prosedur masuk ke Jepang.", "4. Saya, pasangan saya, kerabat langsung, kerabat yang tinggal bersama, atau orang lain yang memiliki hubungan sosial yang erat dengan saya tidak akan menyerahkan pengelolaan uang atau properti lainnya, dan tidak akan menandatangani kontrak yang menetapkan denda atas wanprestasi kontrak kerja Pekerja Berketerampilan Spesifik.", "5. Jika saya telah membayar biaya kepada organisasi di negara asal saya untuk perantaraan aplikasi kontrak kerja atau persiapan kegiatan, saya harus sepenuhnya memahami jumlah dan rinciannya dan telah menyetujuinya.", "6. Biaya yang diperlukan untuk dukungan saya tidak akan dibebankan kepada saya, baik secara langsung maupun tidak langsung.", "7. Organisasi penerima harus menyediakan penjemputan di pelabuhan atau bandara kedatangan saya di Jepang.", "8. Dukungan untuk mendapatkan tempat tinggal yang layak akan diberikan kepada saya.", "9. Tersedia sistem untuk menerima konsultasi atau keluhan dari saya mengenai kehidupan kerja, sehari-hari, atau sosial." ], "final_confirmation": "Selanjutnya, mengenai butir 4, saya maupun pasangan saya, dll., saat ini tidak melakukan pembayaran uang jaminan atau terikat kontrak terkait denda, dan tidak akan melakukannya di masa mendatang.", "signature_label": "Tanda Tangan Pekerja Berketerampilan Spesifik", "agree_checkbox": "Saya mengonfirmasi dan menyetujui semua isi di atas.", "submit_button": "Kirim Tanda Tangan dan Lanjutkan" }, "my": { "title": "ကြိုတင်လမ်းညွှန်ချက် အတည်ပြုလွှာ", "items": [ "၁။ ကျွန်ုပ်လုပ်ဆောင်ရမည့် လုပ်ငန်းတာဝန်များ၊ လစာပမာဏနှင့် အခြားအလုပ်သမားဆိုင်ရာ အခြေအနေများ။", "၂။ ကျွန်ုပ် ဂျပန်နိုင်ငံတွင် လုပ်ဆောင်နိုင်သော လှုပ်ရှားမှုများ၏ အကြောင်းအရာ။", "၃။ ကျွန်ုပ်၏ နိုင်ငံတွင်းဝင်ရောက်ခြင်းဆိုင်ရာ လုပ်ထုံးလုပ်နည်းများနှင့် ပတ်သက်သည့်အချက်များ။", "၄။ ကျွန်ုပ် သို့မဟုတ် ကျွန်ုပ်၏အိမ်ထောင်ဖက်၊ တိုက်ရိုက်ဆွေမျိုးများ၊ အတူနေဆွေမျိုးများ သို့မဟုတ် ကျွန်ုပ်နှင့် လူမှုရေးအရ ရင်းနှီးသောဆက်ဆံရေးရှိသူများသည် သတ်မှတ်ထားသော ကျွမ်းကျင်လုပ်သား အလုပ်ခန့်ထားမှု စာချုပ်အရ ကျွန်ုပ်၏ ဂျပန်နိုင်ငံでの လှုပ်ရှားမှုများနှင့်ဆက်စပ်၍ အာမခံငွေကောက်ခံခြင်း သို့မဟုတ် အခြားမည်သည့်အကြောင်းပြချက်ဖြင့်မဆို ငွေကြေး သို့မဟုတ် အခြားပိုင်ဆိုင်မှုများကို စီမံခန့်ခွဲခြင်းမပြုရ။ ထို့အပြင် စာချုပ်ပါအချက်များကို မလိုက်နာပါက ဒဏ်ငွေသတ်မှတ်သည့် စာချုပ်များ သို့မဟုတ် ငွေကြေးနှင့် အခြားပိုင်ဆိုင်မှုများကို မတရားလွှဲပြောင်းရန် စီစဉ်သည့် စာချုပ်များ ချုပ်ဆိုထားခြင်းမရှိသလို ချုပ်ဆိုရန် အလားအလာလည်း မရှိပါ။", "၅။ ကျွန်ုပ်သည် သတ်မှတ်ထားသော ကျွမ်းကျင်လုပ်သား အလုပ်ခန့်ထားမှုစာချုပ် လျှောက်လွှာကို ကြားခံဆောင်ရွက်ပေးခြင်း သို့မဟုတ် ကျွန်ုပ်၏နိုင်ငံရှိ အဖွဲ့အစည်းတစ်ခုသို့ လုပ်ငန်းဆောင်ရွက်မှုများအတွက် ကြိုတင်ပြင်ဆင်ခြင်းအတွက် အခကြေးငွေပေးချေခဲ့ပါက၊ ပမာဏနှင့် အသေးစိတ်အချက်အလက်များကို အပြည့်အဝနားလည်ပြီး ထိုအဖွဲ့အစည်းနှင့် သဘောတူညီမှု ရရှိထားရပါမည်။", "၆။ ကျွန်ုပ်အား ပံ့ပိုးကူညီရန် လိုအပ်သော ကုန်ကျစရိတ်များကို တိုက်ရိုက်ဖြစ်စေ၊ သွယ်ဝိုက်၍ဖြစ်စေ ကျွန်ုပ်က ကျခံမည်မဟုတ်ပါ။", "၇။ ကျွန်ုပ်အား လက်ခံသည့်အဖွဲ့အစည်းသည် ကျွန်ုပ် ဂျပန်နိုင်ငံသို့ ဆိုက်ရောက်မည့် ဆိပ်ကမ်း သို့မဟုတ် လေဆိပ်တွင် ကြိုပို့ဝန်ဆောင်မှုပေးရပါမည်။", "８။ ကျွန်ုပ်အတွက် သင့်လျော်သော နေထိုင်စရာနေရာ ရရှိရေးအတွက် အထောက်အပံ့များ ပေးအပ်ပါမည်။", "၉။ ကျွန်ုပ်၏ အလုပ်အကိုင်၊ နေ့စဉ်ဘဝ သို့မဟုတ် လူမှုဘဝနှင့်ပတ်သက်၍ တိုင်ပင်ဆွေးနွေးမှုများ သို့မဟုတ် တိုင်ကြားမှုများကို လက်ခံရန် စနစ်တစ်ခု ရှိပါသည်။" ], "final_confirmation": "ထို့အပြင်၊ အချက် ၄ နှင့်ပတ်သက်၍ ကျွန်ုပ်နှင့် ကျွန်ုပ်၏အိမ်ထောင်ဖက်စသည်တို့သည် အာမခံငွေပေးချေခြင်း သို့မဟုတ် ဒဏ်ငွေများနှင့်သက်ဆိုင်သော စာချုပ်များကို လက်ရှိတွင် ချုပ်ဆိုထားခြင်းမရှိသလို အနာဂတ်တွင်လည်း ချုပ်ဆိုမည်မဟုတ်ပါ။", "signature_label": "သတ်မှတ်ထားသော ကျွမ်းကျင်လုပ်သား၏ လက်မှတ်", "agree_checkbox": "အထက်ပါ အကြောင်းအရာအားလုံးကို ကျွန်ုပ် အတည်ပြုပြီး သဘောတူပါသည်။", "submit_button": "လက်မှတ်ထိုးပြီး ဆက်လက်ဆောင်ရွက်ပါ" }, "vi": { "title": "Giấy xác nhận Hướng dẫn Sơ bộ", "items": [ "1. Các vấn đề liên quan đến nội dung công việc, mức lương và các điều kiện lao động khác.", "2. Nội dung các hoạt động tôi có thể thực hiện tại Nhật Bản.", "3. Các vấn đề liên quan đến thủ tục nhập cảnh vào Nhật Bản.", "4. Tôi hoặc vợ/chồng, họ hàng trực hệ hoặc sống cùng, hoặc những người có quan hệ xã hội mật thiết khác với tôi, sẽ không bị quản lý tiền bạc hoặc tài sản khác liên quan đến hoạt động của tôi tại Nhật Bản theo hợp đồng lao động kỹ năng đặc định, và không ký kết bất kỳ hợp đồng nào quy định tiền phạt vi phạm hợp đồng hoặc các hợp đồng dự kiến chuyển giao tài sản bất hợp pháp khác, và dự kiến sẽ không để bị buộc ký kết.", "5. Nếu tôi đã trả phí cho một tổ chức ở nước tôi để môi giới đơn xin hợp đồng lao động hoặc để chuẩn bị cho các hoạt động, tôi phải hiểu đầy đủ số tiền và chi tiết và đã đồng ý với tổ chức đó.", "6. Các chi phí cần thiết để hỗ trợ tôi sẽ không do tôi chịu, dù trực tiếp hay gián tiếp.", "7. Tổ chức tiếp nhận phải bố trí đưa đón tôi tại cảng hoặc sân bay nơi tôi dự định nhập cảnh vào Nhật Bản.", "8. Tôi sẽ được hỗ trợ để đảm bảo nhà ở phù hợp.", "9. Có một hệ thống để tiếp nhận các cuộc tham vấn hoặc khiếu nại từ tôi liên quan đến cuộc sống nghề nghiệp, sinh hoạt hàng ngày hoặc đời sống xã hội." ], "final_confirmation": "Ngoài ra, về điều 4, tôi và vợ/chồng của tôi, v.v., hiện không thanh toán tiền đặt cọc hoặc ký kết các hợp đồng liên quan đến tiền phạt, và sẽ không làm seperti vậy trong tương lai.", "signature_label": "Chữ ký của Người lao động Kỹ năng Đặc định", "agree_checkbox": "Tôi xác nhận và đồng ý với tất cả các nội dung trên.", "submit_button": "Gửi chữ ký và Tiếp tục" }, "th": { "title": "เอกสารยืนยันการให้ข้อมูลเบื้องต้น", "items": [ "1. เรื่องที่เกี่ยวกับเนื้อหาของงาน จำนวนค่าตอบแทน และเงื่อนไขการทำงานอื่นๆ", "2. เนื้อหาของกิจกรรมที่ฉันสามารถทำได้ในญี่ปุ่น", "3. เรื่องที่เกี่ยวกับขั้นตอนการเข้าประเทศของฉัน", "4. ข้าพเจ้า คู่สมรส ญาติสายตรงหรือญาติที่อาศัยอยู่ด้วยกัน หรือบุคคลอื่นที่มีความสัมพันธ์ใกล้ชิดทางสังคมกับข้าพเจ้า จะไม่ถูกจัดการเงินหรือทรัพย์สินอื่นใดที่เกี่ยวข้องกับกิจกรรมของข้าพเจ้าในญี่ปุ่นตามสัญญาจ้างงานทักษะเฉพาะ และไม่ได้ทำสัญญาที่กำหนดค่าปรับสำหรับการไม่ปฏิบัติตามสัญญาจ้างงานหรือสัญญาอื่นใดที่คาดว่าจะมีการโอนเงินหรือทรัพย์สินอื่นโดยมิชอบ และคาดว่าจะไม่ถูกบังคับให้ทำสัญญาดังกล่าว", "5. ในกรณีที่ฉันได้จ่ายค่าใช้จ่ายให้กับหน่วยงานในประเทศของตนเองเกี่ยวกับการเป็นนายหน้าในการสมัครสัญญาจ้างงานหรือการเตรียมความพร้อมสำหรับกิจกรรมทักษะเฉพาะประเภทที่ 1 ฉันจำเป็นต้องเข้าใจจำนวนเงินและรายละเอียดอย่างถ่องแท้และได้ตกลงกับหน่วยงานนั้นๆ", "6. ค่าใช้จ่ายที่จำเป็นสำหรับการสนับสนุนของฉัน จะไม่ถูกเรียกเก็บจากฉันไม่ว่าโดยตรงหรือโดยอ้อม", "7. องค์กรต้นสังกัดทักษะเฉพาะจะต้องจัดให้มีการรับส่งฉันที่ท่าเรือหรือสนามบินที่ฉันจะเดินทางเข้าประเทศ", "8. จะมีการให้ความช่วยเหลือแก่ฉันในการจัดหาที่อยู่อาศัยที่เหมาะสม", "9. มีระบบรองรับการให้คำปรึกษาหรือการร้องทุกข์จากฉันเกี่ยวกับชีวิตการทำงาน ชีวิตประจำวัน หรือชีวิตในสังคม" ], "final_confirmation": "นอกจากนี้ เกี่ยวกับข้อ 4 ข้าพเจ้าและคู่สมรสของข้าพเจ้า ฯλฯ ไม่ได้จ่ายเงินประกันหรือทำสัญญาเกี่ยวกับค่าปรับใดๆ ในปัจจุบัน และจะไม่ทำในอนาคต", "signature_label": "ลายมือชื่อของแรงงานทักษะเฉพาะ", "agree_checkbox": "ข้าพเจ้ายืนยันและยอมรับเนื้อหาทั้งหมดข้างต้น", "submit_button": "ส่งลายมือชื่อและดำเนินการต่อ" } }
-JAPANESE_TEXT = { "title": "事前ガイダンスの確認書", "items": [ "１ 私が従事する業務の内容、報酬の額その他の労働条件に関する事項", "２ 私が日本において行うことができる活動の内容", "３ 私の入国に当たっての手続に関する事項", "４ 私又は私の配偶者、直系若しくは同居の親族その他私と社会生活において密接な関係を有する者が、特定技能雇用契約に基づく私の日本における活動に関連して、保証金の徴収その他名目のいかんを問わず、金銭その他の財産を管理されず、かつ特定技能雇用契約の不履行について違約金を定める契約その他の不当に金銭その他の財産の移転を予定する契約の締結をしておらず、かつ、締結させないことが見込まれること", "５ 私が特定技能雇用契約の申込みの取次ぎ又は自国等における特定技能１号の活動の準備に関して自国等の機関に費用を支払っている場合は、その額及び内訳を十分理解して、当該機関との間で合意している必要があること", "６ 私に対し、私の支援に要する費用について、直接又は間接に負担させないこととしていること", "７ 私に対し、特定技能所属機関等が私が入国しようとする港又は飛行場において送迎を行う必要があることとなっていること", "８ 私に対し、適切な住居の確保に係る支援がされること", "９ 私からの、職業生活、日常生活又は社会生活に関する相談又は苦情の申出を受ける体制があること" ], "final_confirmation": "また、４について、私及び私の配偶者等は、保証金の支払や違約金等に係る契約を現にしておらず、また、将来にわたりしません。", }
+# registry: 説明者の名前と、各言語の翻訳データの「登録簿」です。（くわしくは registry.py を見てください）
+# data フォルダのファイルから1回だけ読み込んで、言語ごとにそろえた「読み取り専用の写し（スナップショット）」を作ります。
+# registry.current() で、今のスナップショットを取り出します。
+#   .languages[言語]: その言語の翻訳と、ガイダンスページに出す (日本語, 翻訳) の組の並び
+#   .explainers_for(言語): 説明者を選ぶページに出す名前の並び（順番どおり、重なりなし）
+#   .template_text: PDFのひな形に渡す、確認項目・最後の確認文・説明者の名前の文字
+# ファイルが書きかえられたら、プログラムを止めずに読み直します。（REGISTRY_RELOAD_INTERVAL 秒ごとに確かめます）
+registry = Registry(REGISTRY_DIR, reload_interval=REGISTRY_RELOAD_INTERVAL)
+
+
+def subset_text():
+    # サブセットフォントに入れておく文字の一覧です。
+    # PDFの固定の文章と説明者の名前、日付の数字、画面に出す日本語、それに英数字・記号を入れておきます。
+    from pdf_template import template_chars
+
+    snapshot = registry.current()
+    japanese = snapshot.japanese["title"] + "".join(snapshot.japanese["items"]) + snapshot.japanese["final_confirmation"]
+    return template_chars(snapshot.template_text) + japanese + string.printable
+
+
+# サブセットフォントに、確認書の文章の文字が全部入っているかどうかを、今のデータの版の分だけ覚えておく場所です。
+# （データを読み直して版が変わったら、前の版の分は捨てます）
+_subset_covers_text = {}
+
+
+def pdf_font_file(explainer_name):
+    # PDFに使うフォントファイルを選びます。
+    # サブセットフォントがあって、確認書の文章と説明者の名前の文字が全部入っていれば、小さいほうを使います。
+    # （データを読み直して、サブセットフォントに無い文字が増えたときは、`python font_cache.py` で作り直すまで大きいほうを使います）
+    if not USE_FONT_SUBSET:
+        return FONT_FILE
+
+    from font_cache import covers
+    from pdf_template import template_chars
+
+    snapshot = registry.current()
+    covered = _subset_covers_text.get(snapshot.version)
+    if covered is None:
+        covered = covers(FONT_SUBSET_FILE, template_chars(snapshot.template_text))
+        _subset_covers_text.clear()
+        _subset_covers_text[snapshot.version] = covered
+    if covered and covers(FONT_SUBSET_FILE, explainer_name):
+        return FONT_SUBSET_FILE
+    return FONT_FILE
+
+
+# blob_client: 倉庫とやりとりするための窓口です。接続を使い回し、失敗したらやり直します。（くわしくは blob_client.py を見てください）
+blob_client = BlobClient(BLOB_READ_WRITE_TOKEN, base_url=BLOB_BASE_URL)
+
+# upload_queue: PDFの保存を「裏側」でやってもらうための順番待ちの列です。
+upload_queue = UploadQueue(workers=2, max_pending=UPLOAD_QUEUE_SIZE)
+
+# signature_store: 署名画像の「置き場所」です。（くわしくは signature_store.py を見てください）
+signature_store = SignatureStore(
+    DiskBackend(SIGNATURE_STORE_DIR) if SIGNATURE_STORE_DIR else BlobBackend(blob_client),
+    MemoryStore(max_bytes=SIGNATURE_CACHE_BYTES, ttl=SIGNATURE_CACHE_TTL),
+)
+
+# pdf_store: できあがったPDFの「置き場所」です。倉庫は署名画像と同じものを使い、手元の棚だけ別にします。
+pdf_store = SignatureStore(signature_store.backend, MemoryStore(max_bytes=PDF_CACHE_BYTES, ttl=SIGNATURE_CACHE_TTL))
+
+
+def iter_chunks(data, chunk_size=64 * 1024):
+    # PDFのデータを、64KBずつに分けて順番に返します。
+    # Response にそのまま渡すと、全体がもう1つコピーされてしまうので、
+    # memoryview で「のぞき窓」を作り、少しずつ取り出してユーザーに送ります。
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
+
+# audit_log: 署名の「記録帳」です。書き込みは裏側でやってもらいます。（くわしくは audit_log.py を見てください）
+# 書いた記録は、署名画像と同じ倉庫にも「日誌のかけら」として置きます。（起動し直して /tmp が空っぽになっても、記録は消えません）
+# （1件ごとには置かずに、まとめて置きます。かけらは、export.py の --compact で1つにまとめます）
+audit_log = AuditLog(
+    AUDIT_LOG_PATH,
+    journal=signature_store.backend if AUDIT_JOURNAL else None,
+    journal_rows=AUDIT_JOURNAL_ROWS,
+    journal_interval=AUDIT_JOURNAL_INTERVAL,
+)
+if not AUDIT_JOURNAL and AUDIT_LOG_PATH.startswith("/tmp/"):
+    print(f"Warning: the audit log {AUDIT_LOG_PATH} is not persistent and AUDIT_JOURNAL is off; records will be lost on restart.")
+
+
+# --- CSSやJavaScriptのファイルの「住所」を作る ---
+# ファイルの中身から作った「指紋（ハッシュ）」を、住所のうしろに「?v=...」としてつけます。
+# 中身が変われば住所も変わるので、ブラウザはずっと保存しておいても大丈夫になります。
+_asset_versions = {}
+
+
+@app.template_global()
+def asset_url(filename):
+    version = _asset_versions.get(filename)
+    if version is None:
+        with open(os.path.join(app.static_folder, filename), "rb") as f:
+            version = hashlib.sha256(f.read()).hexdigest()[:12]
+        _asset_versions[filename] = version
+    return url_for("static", filename=filename, v=version)
+
+
+# --- できあがったページの準備 ---
+# 言語選択ページと、各言語のガイダンスページは、起動時に1回だけ作って覚えておきます。（くわしくは page_cache.py を見てください）
+# 説明者を選ぶページは、署名画像のURLだけが毎回変わるので、その前と後ろの部分を言語ごとに覚えておきます。
+SIGNATURE_URL_SLOT = "__SIGNATURE_URL__"
+_pages = None
+
+
+def download_explainers(lang):
+    # 選ばれた言語の説明者と、どの言語にも出す説明者（日本語の説明者）の並びを返します。
+    # 並びは registry が読み込むときに1回だけ作ってあるので（順番どおり、重なりなし）、ここでは取り出すだけです。
+    return registry.current().explainers_for(lang)
+
+
+def render_download_parts(lang, snapshot=None):
+    # 説明者を選ぶページを、署名画像のURLのところで2つに分けて返します。
+    snapshot = snapshot or registry.current()
+    html = render_template(
+        "download.html", signature_url=SIGNATURE_URL_SLOT, lang=lang, explainers=snapshot.explainers_for(lang)
+    )
+    before, after = html.split(SIGNATURE_URL_SLOT)
+    return before, after
+
+
+def prerender_pages(snapshot=None):
+    # ページを作るには「リクエストの中」である必要があるので、練習用のリクエストの中で作ります。
+    snapshot = snapshot or registry.current()
+    with app.test_request_context():
+        return {
+            "language_select": CachedPage(
+                # 言語の並びは、翻訳データのファイルから作ります。（ファイルを足せば、選べる言語も増えます）
+                render_template("language_select.html", token=SECRET_TOKEN, languages=snapshot.languages)
+            ),
+            "guidance": {
+                lang: CachedPage(
+                    render_template(
+                        "index.html",
+                        token=SECRET_TOKEN,  # 合言葉
+                        lang=lang,  # 選ばれた言語
+                        translations=view.translations,  # その言語の「翻訳データ」
+                        items=view.items,  # 確認項目の (日本語, 翻訳) の組の並び
+                        signature_mode=SIGNATURE_MODE,  # 署名を画像で送るか、線のデータで送るか
+                        japanese_text=snapshot.japanese,  # 「日本語のお手本データ」
+                    )
+                )
+                for lang, view in snapshot.languages.items()
+            },
+            "download": {
+                lang: render_download_parts(lang, snapshot) for lang in snapshot.explainers if lang is not None
+            },
+        }
+
+
+def page_fingerprint(snapshot=None):
+    # ページの材料（テンプレート・CSSやJavaScript・翻訳データ・説明者・合言葉）から作った「指紋」です。
+    # 材料が1つでも変われば指紋も変わるので、古い保存ファイル（スナップショット）がまちがって使われることはありません。
+    # （翻訳データと説明者は、registry がファイルの中身から作った指紋（version）を使います）
+    snapshot = snapshot or registry.current()
+    digest = hashlib.sha256()
+    for folder in (app.template_folder, app.static_folder):
+        for root, dirs, files in os.walk(folder):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, folder).encode("utf-8"))
+                with open(path, "rb") as f:
+                    digest.update(f.read())
+    data = [snapshot.version, SECRET_TOKEN, SIGNATURE_MODE]
+    digest.update(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cached_pages():
+    # 覚えておいたページを取り出します。まだ作っていなければ、ここで作ります。
+    # 前もって保存したページ（スナップショット）があれば、作るかわりにそれを読み込みます。
+    # 翻訳データや説明者が読み直されたら（registry の version が変わったら）、ページも作り直します。
+    # （同時に2回作られてしまっても、中身は同じなので困りません）
+    global _pages
+    snapshot = registry.current()
+    if _pages is None or _pages[0] != snapshot.version:
+        pages = load_snapshot(PAGE_SNAPSHOT_PATH, page_fingerprint(snapshot)) or prerender_pages(snapshot)
+        # ページと version を1回の代入で入れかえるので、ほかのスレッドが半分だけ新しいものを見ることはありません。
+        _pages = (snapshot.version, pages)
+    return _pages[1]
+
+
+# --- PDF作りの準備（ウォームアップ） ---
+# fpdf・fontTools・Pillow・requests の読み込みと、フォントの読み込み、PDFのひな形作りは、合わせると時間がかかります。
+# 言語選択やガイダンスのページを見るだけの人には必要ないので、起動時にはやらずに、
+# WARM_UP の設定に合わせて、PDFを作る前のどこかで済ませておきます。
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+def warm_up():
+    try:
+        from PIL import Image
+
+        from pdf_template import get_template
+
+        # 署名画像を読むための部品（PNGなど）を、先に読み込んでおきます。
+        Image.preinit()
+        # 倉庫とやりとりする準備（requests の読み込みと、セッション作り）をしておきます。
+        blob_client.session
+        get_template(FONT_SUBSET_FILE if USE_FONT_SUBSET else FONT_FILE, registry.current().template_text)
+    except Exception as e:
+        # フォントファイルが無いときなどは、ここでは止めずに、PDFを作るときにもう一度試します。
+        print(f"Error warming up PDF template: {e}")
+
+
+def start_warm_up():
+    # warm_up() を、裏側のスレッドで1回だけ始めます。（すぐに戻ります）
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+if WARM_UP == "eager":
+    warm_up()
+cached_pages()
 
 
 # --- ウェブサイトの「ページ」を作る ---
@@ -79,37 +390,38 @@ def language_select():
         # 「アクセス権がありません。」というエラーメッセージを表示します。（403は「アクセス禁止」という意味の番号です）
         return "アクセス権がありません。", 403
     
-    # 合言葉が正しければ、「language_select.html」という設計図（HTMLファイル）を使って、
-    # ユーザーに「言語を選択するページ」を表示します。合言葉も一緒に渡しておきます。
-    return render_template("language_select.html", token=provided_token)
+    # 合言葉が正しければ、ユーザーに「言語を選択するページ」を表示します。
+    # （ページは「language_select.html」という設計図から、起動時に作って覚えてあるものを使います）
+    return cached_pages()["language_select"].response()
 
 
-# '/guidance' という住所に、'POST' という方法でアクセスが来たら、
-# （'POST' とは、ユーザーがフォームで「決定」ボタンを押したときなどに使われる方法です）
-@app.route("/guidance", methods=["POST"])
+# '/guidance' という住所に、'GET' か 'POST' という方法でアクセスが来たら、
+# （'POST' とは、ユーザーがフォームで「決定」ボタンを押したときなどに使われる方法です。
+#   言語選択ページのフォームは 'GET' で送るので、ブラウザがページを保存して使い回せます）
+@app.route("/guidance", methods=["GET", "POST"])
 def guidance_page():
     # フォームから送られてきた「合言葉（token）」と「選ばれた言語（lang）」を受け取ります。
-    provided_token = request.form.get("token")
-    lang = request.form.get("lang")
+    # （request.values は、住所（URL）についてきたものと、フォームで送られてきたものの両方を見てくれます）
+    provided_token = request.values.get("token")
+    lang = request.values.get("lang")
     
     # 合言葉をチェックします。
     if provided_token != SECRET_TOKEN:
         return "アクセス権がありません。", 403
     
-    # もし、言語が選ばれていなかったり、私たちが翻訳データ（TRANSLATIONS）を持っていない言語だったりしたら...
-    if not lang or lang not in TRANSLATIONS:
+    # もし、言語が選ばれていなかったり、私たちが翻訳データ（data/translations）を持っていない言語だったりしたら...
+    pages = cached_pages()
+    if not lang or lang not in pages["guidance"]:
         # エラーメッセージを表示します。（400は「あなたのリクエストが変ですよ」という意味の番号です）
         return "言語が選択されていません。", 400
     
-    # すべてOKなら、「index.html」という設計図（HTMLファイル）を使って、
-    # ユーザーに「ガイダンスの確認ページ」を表示します。
-    return render_template(
-        "index.html",
-        token=provided_token,  # 合言葉
-        lang=lang,  # 選ばれた言語
-        translations=TRANSLATIONS[lang],  # その言語の「翻訳データ」
-        japanese_text=JAPANESE_TEXT,  # 「日本語のお手本データ」
-    )
+    # ガイダンスを読んでいるあいだに、PDF作りの準備を裏側で済ませておきます。
+    if WARM_UP == "background":
+        start_warm_up()
+
+    # すべてOKなら、ユーザーに「ガイダンスの確認ページ」を表示します。
+    # （ページは「index.html」という設計図から、言語ごとに起動時に作って覚えてあるものを使います）
+    return pages["guidance"][lang].response()
 
 
 # '/sign' という住所に、'POST' という方法でアクセス（署名が「送信」）されたら、
@@ -126,56 +438,67 @@ def sign():
     # フォームから送られてきた「署名データ（signature_data）」を受け取ります。
     # これは「データURL」という、画像がテキスト（文字）になったものです。
     signature_data_url = request.form.get("signature_data")
+    # SIGNATURE_MODE が "vector" のときは、画像のかわりに「線のデータ（signature_strokes）」が送られてきます。
+    signature_strokes = request.form.get("signature_strokes")
     
     # もし署名データが空っぽだったら（署名されていなかったら）、
-    if not signature_data_url:
+    if not signature_data_url and not signature_strokes:
         # 最初の言語選択ページに「戻します（redirect）」。
         return redirect(url_for("language_select", token=provided_token))
 
-    # 「datetime」道具を使って、今の「日時」を取得します。
+    # 「datetime」道具を使って、今の「日時」を取得します。（記録帳に書くためです）
     timestamp = datetime.datetime.now()
-    # 署名画像を保存するための「ファイル名」を作ります。
-    # 例: "signature_20251027_102030.png" のように、日時を入れて、他のファイルと名前が被らないようにします。
-    filename = f"signature_{timestamp.strftime('%Y%m%d_%H%M%S')}.png"
 
-    # `try...except` は、「ひとまず、tryの中を実行してみて。もしエラーが出たら、exceptの中を実行してね」という命令です。
-    # これで、もし失敗してもプログラム全体が止まらないようになります。
-    try:
-        # 署名データ（テキスト）を「,」で2つに分けます。
-        # （前半は "data:image/png;base64" みたいな説明文、後半が「画像データ本体」）
-        header, encoded = signature_data_url.split(",", 1)
+    if signature_strokes:
+        # 線のデータで届いたときは、署名欄に合わせてそろえた、小さなバイナリにします。（くわしくは signature_vector.py を見てください）
+        try:
+            with span("encode_strokes"):
+                image_data = encode_strokes(signature_strokes)
+        except Exception as e:
+            print(f"Error reading signature strokes: {e}")
+            return "署名画像が正しくありません。", 400
+        extension, content_type = ".sig", "application/octet-stream"
+    else:
+        # 署名データが大きすぎないかを、画像に戻す「前」に調べます。
+        # （とても大きなデータを全部戻してから断るのでは、時間もメモリもむだになるからです）
+        if decoded_size(signature_data_url) > MAX_SIGNATURE_BYTES:
+            return "署名画像が大きすぎます。", 413
+
+        # `try...except` は、「ひとまず、tryの中を実行してみて。もしエラーが出たら、exceptの中を実行してね」という命令です。
+        # これで、もし失敗してもプログラム全体が止まらないようになります。
+        try:
+            # 署名データ（テキスト）を「,」で2つに分けます。
+            # （前半は "data:image/png;base64" みたいな説明文、後半が「画像データ本体」）
+            header, encoded = signature_data_url.split(",", 1)
         
-        # 「base64」道具を使って、テキスト（暗号みたい）を、元の「画像データ」に戻します。
-        image_data = base64.b64decode(encoded)
+            # 「base64」道具を使って、テキスト（暗号みたい）を、元の「画像データ」に戻します。
+            with span("decode"):
+                image_data = base64.b64decode(encoded)
 
-        # --- 「インターネット上の倉庫（Vercel Blob）」に、署名画像をアップロードする処理 ---
-        
-        # 倉庫に送る荷物の「送り状（headers）」を作ります。
-        headers = {
-            # 「この荷物は、倉庫の鍵（BLOB_READ_WRITE_TOKEN）を使って送ります」
-            "Authorization": f"Bearer {BLOB_READ_WRITE_TOKEN}",
-            # 「荷物の中身は、PNG画像です」
-            "Content-Type": "image/png",
-        }
-        # 倉庫の「荷物を置く場所（アップロード先のURL）」を指定します。
-        upload_url = f"https://blob.vercel-storage.com/{filename}"
+            # 署名画像を、PDFの署名欄にちょうどいい大きさ・色に整えます。（くわしくは signature_image.py を見てください）
+            with span("normalize"):
+                image_data = normalize_signature(image_data)
 
-        # 「requests」道具を使って、指定した場所に、画像データ（image_data）を
-        # 「送り状（headers）」付きで「送ります（put）」。
-        response = requests.put(upload_url, data=image_data, headers=headers)
-        
-        # もし、アップロードが失敗したら（例：倉庫の鍵が間違っていたら）、
-        # ここでエラーを発生させて、下の「except」にジャンプさせます。
-        response.raise_for_status()
+        # もし、画像として読めなかったら...
+        except Exception as e:
+            print(f"Error reading signature image: {e}")
+            return "署名画像が正しくありません。", 400
+        extension, content_type = ".png", "image/png"
 
-        # アップロードが成功したら、倉庫からの「返事（response）」を調べます。
-        # 返事の中から、アップロードされた画像の「公開URL（誰でも見られるアドレス）」を取り出します。
-        public_url = response.json().get("url")
-        
-        # もし、なぜか公開URLが返事に含まれていなかったら...
-        if not public_url:
-            # 自分たちでエラーを発生させて、「except」にジャンプさせます。
-            raise Exception("Blob upload response did not contain a URL.")
+    # 署名画像を保存するための「ファイル名」を、整えた画像の中身から作ります。
+    # 例: "signature_3f2a...9c.png" のように、中身の「指紋」を入れるので、ちがう署名が同じ名前になることはありません。
+    # （ボタンの二度押しで同じ署名が2回届いても、同じ名前になるので、2回目はアップロードしません）
+    filename = content_key("signature", extension, image_data)
+
+    try:
+        # --- 署名画像を「置き場所（ストア）」に保存する処理 ---
+
+        # 倉庫（Vercel Blob）にアップロードして、同時に「手元の棚（メモリ）」にも置いておきます。
+        # 手元の棚に置いておくと、このあとのPDF作成で、倉庫から取ってくる手間が省けます。
+        # 返事として、アップロードされた画像の「公開URL（誰でも見られるアドレス）」が返ってきます。
+        # （アップロードが失敗したり、URLが取れなかったりしたときは、エラーになって下の「except」にジャンプします）
+        with span("store_put"):
+            public_url = signature_store.put(filename, image_data, content_type)
 
     # もし、`try` の中で何かエラーが起きたら（例：アップロード失敗、URLが取れない）...
     except Exception as e:
@@ -184,6 +507,9 @@ def sign():
         # ユーザーには「失敗しました」というメッセージを表示します。
         return "署名画像のアップロードに失敗しました。", 500
 
+    # 記録帳に「署名されました」と書き足しておきます。（書き込みは裏側でやるので、ユーザーは待ちません）
+    audit_log.record("sign", timestamp=timestamp, lang=lang, signature_key=filename, signature_bytes=len(image_data))
+
     # すべてが成功したら、ユーザーを「/download_page（ダウンロード準備ページ）」に移動させます。
     # そのとき、さっき取得した「画像の公開URL」と「言語」を、次のページに渡します。
     return redirect(url_for("download_page", signature_url=public_url, lang=lang))
@@ -201,20 +527,28 @@ def download_page():
         # エラーメッセージを表示します。
         return "必要な情報が不足しています。", 400
 
-    # 最初に準備した「EXPLAINERS（説明者リスト）」から、
-    # 「選ばれた言語の説明者」と「日本語の説明者（'jp'）」の両方のリストを取り出します。
-    available_explainers = EXPLAINERS.get(lang, []) + EXPLAINERS.get("jp", [])
-    
-    # 2つのリストを足したので、もし名前がダブっていたら、
-    # `set()` で重複をなくしてから、もう一度 `list()` でリストに戻します。
-    unique_explainers = list(set(available_explainers))
-
-    # 「download.html」という設計図（HTMLファイル）を使って、
-    # ユーザーに「説明者を選ぶページ」を表示します。
-    return render_template(
-        "download.html",
-        signature_url=signature_url,  # 署名画像のURL（次のPDF作成で使います）
-        explainers=unique_explainers,  # 説明者のリスト（選択肢として使います）
+    # 「download.html」という設計図（HTMLファイル）から作った、「説明者を選ぶページ」を表示します。
+    # 言語ごとに覚えてある前と後ろの部分のあいだに、署名画像のURL（次のPDF作成で使います）を安全に埋め込みます。
+    # （覚えていない言語のときは、ここで作ります）
+    parts = cached_pages()["download"].get(lang) or render_download_parts(lang)
+    return conditional_response(parts[0] + str(escape(signature_url)) + parts[1])
+
+
+def archive_pdf(pdf_key, pdf_output, lang, explainer_name, signature_key, signature_location):
+    # PDFを倉庫に保存して、保存した場所を記録帳に書いておきます。
+    # （日ごと・月ごとのまとめファイルを作るときに、この記録から探します。くわしくは export.py を見てください）
+    # 同じPDFの保存が2回並んでいたときは、先のほうが置き終わっているので、記録を二重に書かずに終わります。
+    if pdf_store.location(pdf_key) is not None:
+        return
+    location = pdf_store.put(pdf_key, pdf_output, "application/pdf")
+    audit_log.record(
+        "pdf_stored",
+        lang=lang,
+        explainer=explainer_name,
+        signature_key=signature_key,
+        pdf_key=pdf_key,
+        pdf_bytes=len(pdf_output),
+        extra={"location": location, "signature_location": signature_location},
     )
 
 
@@ -224,30 +558,27 @@ def generate_pdf():
     # フォームから送られてきた「署名画像のURL」と「選ばれた説明者の名前」を受け取ります。
     signature_url = request.form.get("signature_url")
     explainer_name = request.form.get("explainer_name")
+    lang = request.form.get("lang")
 
     # もし、どちらかの情報が足りなかったら...
     if not signature_url or not explainer_name:
         # エラーメッセージを表示します。
         return "必要な情報が不足しています。", 400
 
-    # また `try...except` を使います。（今度は、画像を「ダウンロード」する処理です）
+    # また `try...except` を使います。（今度は、画像を「取り出す」処理です）
     try:
-        # --- 「インターネット上の倉庫（Vercel Blob）」から、署名画像をダウンロードする処理 ---
-        
-        # 「requests」道具を使って、指定されたURL（signature_url）から「画像をもらってきます（get）」。
-        response = requests.get(signature_url)
-        # もしダウンロードが失敗したら（例：URLが間違っていたら）、エラーを発生させます。
-        response.raise_for_status()
-        # ダウンロードした「画像データ本体」を取り出します。
-        signature_image_data = response.content
-
-        # 「PIL (Image)」道具を使って、ダウンロードした画像データを開きます。
-        signature_image = Image.open(BytesIO(signature_image_data))
-        
-        # 画像を「一時的なファイル」として、サーバー（プログラムが動いている場所）に保存します。
-        # (Vercelという環境では、"/tmp" というフォルダにしか保存できないルールになっています)
-        temp_signature_path = f"/tmp/{os.path.basename(signature_url)}"
-        signature_image.save(temp_signature_path)
+        # --- 署名画像を「置き場所（ストア）」から取り出す処理 ---
+
+        # まず「手元の棚（メモリ）」を見て、無いときだけ倉庫（Vercel Blob）からダウンロードします。
+        # 画像データはそのままPDFに渡すので、PILで開き直したり、/tmp に保存したりはしません。
+        with span("store_get"):
+            signature_image_data = signature_store.get(os.path.basename(signature_url), signature_url)
+        # もし、どこにも見つからなかったら、エラーを発生させます。
+        if signature_image_data is None:
+            raise Exception("Signature image not found.")
+        # 取ってきたものが、PDFに描ける署名（PNG画像か、線のデータ）かどうかを、PDFを作る「前」に確かめます。
+        # （URLに署名以外のもの（PDFやこわれた画像）を指定されたときに、PDF作りの途中で止まらないようにするためです）
+        check_signature(signature_image_data)
 
     # もし、`try` の中でエラーが起きたら（例：ダウンロード失敗）...
     except Exception as e:
@@ -257,121 +588,221 @@ def generate_pdf():
         return "署名画像の取得に失敗しました。", 404
 
     # --- PDFを作成する処理 ---
-    
-    # 「FPDF」道具を使って、PDFの「真っ白な紙」を準備します。
-    pdf = FPDF()
-    # 1ページ目を追加します。
-    pdf.add_page()
-    # このPDFで「NotoSansJP」という名前で、さっき指定した「日本語フォントファイル」を使えるように登録します。
-    pdf.add_font("NotoSansJP", "", FONT_FILE)
-
-    # --- PDFの見た目（レイアウト）を作る ---
-    # (ここからは、PDFに文字や線を書き込んでいく、お絵かきのような作業です)
-    
-    # フォントを「NotoSansJP」のサイズ10に設定
-    pdf.set_font("NotoSansJP", "", 10)
-    # ページの左上（X=左端, Y=10mm）に移動
-    pdf.set_xy(pdf.l_margin, 10)
-    # 「参考様式第５－９号」という文字を書きます (align='L'は左寄せ)
-    pdf.cell(0, 10, "参考様式第５－９号", align="L")
-    
-    # Y=25mm の位置に移動
-    pdf.set_xy(0, 25)
-    # フォントサイズを16に変更
-    pdf.set_font("NotoSansJP", "", 16)
-    # ページの真ん中（align='C'）にタイトルを書きます。
-    # new_x, new_yは「書いた後に、次の行の先頭に移動する」という意味です。
-    pdf.cell(0, 10, "事 前 ガ イ ダ ン ス の 確 認 書", new_x="LMARGIN", new_y="NEXT", align="C")
-    
-    # 12mmのすき間をあけます。
-    pdf.ln(12)
-    # フォントサイズを10.5に戻します。
-    pdf.set_font("NotoSansJP", "", 10.5)
-    
-    # 確認項目のリスト（日本語）
-    list_items = [("１", "私が従事する業務の内容、報酬の額その他の労働条件に関する事項"),("２", "私が日本において行うことができる活動の内容"),("３", "私の入国に当たっての手続に関する事項"),("４", "私又は私の配偶者、直系若しくは同居の親族その他私と社会生活において密接な関係を有する者が、特定技能雇用契約に基づく私の日本における活動に関連して、保証金の徴収その他名目のいかんを問わず、金銭その他の財産を管理されず、かつ特定技能雇用契約の不履行について違約金を定める契約その他の不当に金銭その他の財産の移転を予定する契約の締結をしておらず、かつ、締結させないことが見込まれること"),("５", "私が特定技能雇用契約の申込みの取次ぎ又は自国等における特定技能１号の活動の準備に関して自国等の機関に費用を支払っている場合は、その額及び内訳を十分理解して、当該機関との間で合意している必要があること"),("６", "私に対し、私の支援に要する費用について、直接又は間接に負担させないこととしていること"),("７", "私に対し、特定技能所属機関等が私が入国しようとする港又は飛行場において送迎を行う必要があることとなっていること"),("８", "私に対し、適切な住居の確保に係る支援がされること"),("９", "私からの、職業生活、日常生活又は社会生活に関する相談又は苦情の申出を受ける体制があること")]
-    
-    # 最初の左端の位置（X座標）を覚えておきます。
-    initial_x = pdf.get_x()
-    
-    # リストの項目を、ひとつずつPDFに書き出します。
-    for number, text in list_items:
-        pdf.set_x(initial_x)  # 左端の位置をそろえます。
-        pdf.cell(8, 5, number, align="L")  # まず「番号」（１、２...）を書きます。
-        # `multi_cell` は、長い文章を「自動で折り返して」書いてくれる道具です。
-        pdf.multi_cell(pdf.w - pdf.l_margin - pdf.r_margin - 8, 5, text, new_x="LMARGIN", new_y="NEXT")
-        pdf.ln(1)  # 少しだけすき間をあけます。
-
-    # ...（ここからも、日付や説明者名、下線などをPDFに書き込む処理が続きます）...
-    
-    pdf.set_font_size(11)
-    pdf.ln(8)
-    pdf.multi_cell(0, 8, "について、")
-    pdf.ln(1)
+
+    # 確認書の「ひな形」を取り出します。
+    # 変わらない部分（タイトルや確認項目など）は、プログラムが起動して最初の1回だけ描いて覚えてあるので、
+    # ここでは「日付」「説明者の名前」「署名画像」だけを書き足します。（くわしくは pdf_template.py を見てください）
+    # フォントも、読み込み済みのものを使い回します。（くわしくは font_cache.py を見てください）
+    from pdf_template import get_template
+
     today = datetime.date.today()
-    # 文字列内の全角スペースを半角2スペースに修正
-    date_time_str = f"{today.year}年{today.month}月{today.day}日  13時00分から16時00分まで"
-    text_width = pdf.get_string_width(date_time_str)
-    start_x = (pdf.w - text_width) / 2
-    pdf.cell(0, 8, date_time_str, new_x="LMARGIN", new_y="NEXT", align="C")
-    y_pos = pdf.get_y()
-    pdf.line(start_x, y_pos - 1, start_x + text_width, y_pos - 1)
-    pdf.ln(4)
-    underline_length = 80
-    indent = 70
-    pdf.cell(0, 8, "特定技能所属機関（又は登録支援機関）の氏名又は名称", new_x="LMARGIN", new_y="NEXT")
-    pdf.ln(1)
-    text_to_underline = "レバレジーズオフィスサポート株式会社"
-    pdf.set_x(pdf.l_margin + indent)
-    pdf.cell(underline_length, 8, text_to_underline, new_x="LMARGIN", new_y="NEXT")
-    y_pos = pdf.get_y()
-    pdf.line(pdf.l_margin + indent, y_pos - 1, pdf.l_margin + indent + underline_length, y_pos - 1)
-    pdf.ln(4)
-    pdf.cell(0, 8, "説明者の氏名", new_x="LMARGIN", new_y="NEXT")
-    pdf.ln(1)
-    # ここで、ユーザーが選んだ「説明者の名前」を使います。
-    text_to_underline = explainer_name
-    pdf.set_x(pdf.l_margin + indent)
-    pdf.cell(underline_length, 8, text_to_underline, new_x="LMARGIN", new_y="NEXT")
-    y_pos = pdf.get_y()
-    pdf.line(pdf.l_margin + indent, y_pos - 1, pdf.l_margin + indent + underline_length, y_pos - 1)
-    pdf.ln(4)
-    pdf.multi_cell(0, 8, "から説明を受け、内容を十分に理解しました。")
-    pdf.ln(2)
-    pdf.multi_cell(0, 8, "また、４について、私及び私の配偶者等は、保証金の支払や違約金等に係る契約を現にしておらず、また、将来にわたりしません。")
-    
-    # 署名欄のレイアウト
-    date_str = f"{today.year}年{today.month}月{today.day}日"
-    sig_y_pos = pdf.h - 35  # ページの下から35mmの位置
-    pdf.set_y(sig_y_pos)
-    pdf.cell(45, 8, "特定技能外国人の署名")
-    line_start_x = pdf.get_x()
-    line_end_x = line_start_x + 65
-    pdf.line(line_start_x, sig_y_pos + 7, line_end_x, sig_y_pos + 7)  # 署名のための下線
-    
-    # `pdf.image` で、さっき一時保存した「署名画像」をPDFに貼り付けます。
-    pdf.image(temp_signature_path, x=line_start_x + 5, y=sig_y_pos - 10, w=55, h=15)
-    
-    pdf.set_xy(line_end_x + 5, sig_y_pos)
-    pdf.cell(0, 8, date_str, align="R")  # 右寄せで日付を記載
+    # 確認項目などの文章は、今読み込んであるデータ（registry のスナップショット）のものを使います。
+    snapshot = registry.current()
+
+    def render_pdf():
+        with span("template"):
+            template = get_template(pdf_font_file(explainer_name), snapshot.template_text)
+        # PDFの「データ」を完成させます。
+        # （署名は、画像でも線のデータでも、そのまま渡せば描いてくれます）
+        return template.render(explainer_name, signature_image_data, today)
 
     # --- PDFの完成と後片付け ---
-    
-    # PDFの「データ」を完成させます。
-    pdf_output = bytes(pdf.output())
 
-    # （おまけ）完成したPDFも、「インターネット上の倉庫（Vercel Blob）」にアップロードしておきます。
+    # PDFのファイル名を、PDFの材料（署名画像の中身・説明者の名前・日付・文章のデータの版）から作ります。
+    # 材料が同じなら、できあがるPDFも同じなので、もう一度頼まれたとき（やり直しや二度押し）は、
+    # 作り直さずに「手元の棚」に置いてあるPDFを返します。
+    pdf_filename = content_key(
+        "confirmation", ".pdf", signature_image_data, explainer_name, today.isoformat(), snapshot.version
+    )
+    pdf_output, created = pdf_store.get_or_create(pdf_filename, render_pdf)
+
+    # （おまけ）完成したPDFも、署名画像と同じ倉庫に保存しておきます。
+    # 保存は「裏側（別のスレッド）」でやってもらうので、ユーザーはアップロードが終わるのを待たずにPDFを受け取れます。
+    # 倉庫に置いた場所がもう分かっているPDFは、保存を頼みません。
+    # （「今作ったかどうか」ではなく「倉庫に置けたかどうか」で決めます。前の保存が、順番待ちの列がいっぱいで捨てられたり、
+    #   失敗したりしていたら、棚にあるPDFを返すときでも、もう一度保存を頼みます）
+    # （「倉庫に置いたものの場所」の索引は、このプロセスのメモリの中にしかありません。
+    #   ほかのプロセスや、起動し直したあと、索引からあふれたあとでは、同じPDFでもう一度保存を頼むことがあります。
+    #   名前が同じなので倉庫では上書きになり、記録帳に同じPDFの記録が増えても、export.py で1つにまとめます）
+    # 失敗したときは、裏側でエラーが記録されます。PDFの保存は「おまけ」なので、ダウンロードは続けます。
+    if pdf_store.location(pdf_filename) is None:
+        upload_queue.submit(
+            archive_pdf, pdf_filename, pdf_output, lang, explainer_name, os.path.basename(signature_url), signature_url
+        )
+
+    # 記録帳に「PDFを作りました」と書き足しておきます。
+    audit_log.record(
+        "pdf",
+        lang=lang,
+        explainer=explainer_name,
+        signature_key=os.path.basename(signature_url),
+        pdf_key=pdf_filename,
+        signature_bytes=len(signature_image_data),
+        pdf_bytes=len(pdf_output),
+        extra=None if created else {"cached": True},
+    )
+
+    # 完成したPDFを、ユーザーのブラウザに「ダウンロードするファイル」として、少しずつ送ります。
+    # 倉庫へのアップロードと同じデータを読むので、PDFはメモリの中に1つあるだけで済みます。
+    return Response(
+        iter_chunks(pdf_output),
+        mimetype="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename={pdf_filename}",
+            "Content-Length": str(len(pdf_output)),
+        },
+    )
+
+
+# '/batch-pdf' という住所に、'POST' という方法でアクセスが来たら、
+# （ガイダンスを受けた全員分の確認書を、まとめて作ります。くわしくは batch.py を見てください）
+@app.route("/batch-pdf", methods=["POST"])
+def batch_pdf():
+    # 送られてくるのは、次のようなJSONです。
+    # {"token": "...", "format": "zip" または "pdf", "date": "2025-10-27"（無ければ今日）,
+    #  "records": [{"signature_data": "data:image/png;base64,..."（または "signature_strokes": {...}、"signature_url": "..."）,
+    #               "explainer_name": "...", "lang": "vi"}, ...]}
+    from batch import BatchRecord, decode_signature, get_pool, render_multipage, stream_zip
+
+    payload = request.get_json(silent=True)
+
+    # 合言葉をチェックします。（JSONが {...} の形でなければ、合言葉も無いものとして扱います）
+    if not isinstance(payload, dict) or payload.get("token") != SECRET_TOKEN:
+        return "アクセス権がありません。", 403
+
+    items = payload.get("records")
+    output_format = payload.get("format", "zip")
+    # もし、作る人のリストが空っぽだったり、作り方（zip か pdf）が変だったりしたら...
+    if not isinstance(items, list) or not items or output_format not in ("zip", "pdf"):
+        return "必要な情報が不足しています。", 400
+    if len(items) > BATCH_MAX_RECORDS:
+        return f"一度に作れるのは {BATCH_MAX_RECORDS} 人分までです。", 400
+
     try:
-        # PDFのファイル名を、元の署名画像の名前に合わせて作ります。
-        pdf_filename = os.path.splitext(os.path.basename(signature_url))[0] + ".pdf"
-        
-        # 再び「送り状（headers）」を準備します。（今度は "application/pdf" です）
-        headers = {
-            "Authorization": f"Bearer {BLOB_READ_WRITE_TOKEN}",
-            "Content-Type": "application/pdf",
-        }
-        upload_url = f"https://blob.vercel-storage.com/{pdf_filename}"
-        
-        # PDFデータをアップロードします。
-        response = requests.put(upload_url, data=pdf_output, headers=headers)
-        response.raise_
\ No newline at end of file
+        today = datetime.date.fromisoformat(payload["date"]) if payload.get("date") else datetime.date.today()
+        records = []
+        for item in items:
+            if not isinstance(item, dict):
+                raise Exception("Each record must be an object.")
+            # 名前と言語は、ZIPの中のファイル名やフォント選びに使うので、文字（str）以外は断ります。
+            if not isinstance(item.get("explainer_name"), str) or not isinstance(item.get("lang", ""), str):
+                raise Exception("explainer_name and lang must be strings.")
+            # 署名画像は、データURLで直接もらうか、/sign で保存したもののURLで指定してもらいます。
+            if item.get("signature_strokes"):
+                signature = encode_strokes(json.dumps(item["signature_strokes"]))
+            elif item.get("signature_data"):
+                if decoded_size(item["signature_data"]) > MAX_SIGNATURE_BYTES:
+                    raise Exception("Signature image is too large.")
+                signature = normalize_signature(decode_signature(item["signature_data"]))
+            else:
+                signature_url = item["signature_url"]
+                signature = signature_store.get(os.path.basename(signature_url), signature_url)
+            if not signature or not item.get("explainer_name"):
+                raise Exception("Signature image or explainer name is missing.")
+            check_signature(signature)
+            records.append(BatchRecord(signature, item["explainer_name"], item.get("lang", "")))
+    except Exception as e:
+        # エラーをこっそり記録します。
+        print(f"Error reading batch records: {e}")
+        return "署名画像の取得に失敗しました。", 400
+
+    # 全員の名前が書けるフォントを選びます。
+    font_file = pdf_font_file("".join(record.explainer_name for record in records))
+    filename = f"confirmations_{today.strftime('%Y%m%d')}"
+
+    if output_format == "pdf":
+        # 全員分を、1つのPDF（1人1ページ）にまとめて返します。
+        pdf_output = render_multipage(records, font_file, registry.current().template_text, today)
+        return Response(
+            iter_chunks(pdf_output),
+            mimetype="application/pdf",
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}.pdf",
+                "Content-Length": str(len(pdf_output)),
+            },
+        )
+
+    # 1人1つのPDFを入れたZIPファイルを、できた部分から少しずつ返します。
+    # ワーカーの置き場は、返事を送り始める前に用意します。（作れないところでは None になり、このプロセスで作ります）
+    pool = get_pool(BATCH_WORKERS or None) if len(records) > 1 else None
+    return Response(
+        stream_zip(records, font_file, registry.current().template_text, today, pool),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}.zip"},
+    )
+
+
+# '/export' という住所にアクセスが来たら、その日・その月に保存したPDFを、1つのファイルにまとめて返します。（管理者用）
+# 例: /export?token=管理者の合言葉&period=2025-10&format=zip
+# （倉庫からのダウンロードとZIPへの書き込みは少しずつ進めるので、何百枚あってもメモリにはためません。くわしくは export.py を見てください）
+@app.route("/export")
+def export_archive():
+    if not ADMIN_TOKEN or request.args.get("token") != ADMIN_TOKEN:
+        return "アクセス権がありません。", 403
+
+    from export import MAX_MERGED_DOCUMENTS, check_merged, find_documents, iter_file, stream_zip, write_merged
+
+    period = request.args.get("period", "")
+    output_format = request.args.get("format", "zip")
+    if output_format not in ("zip", "pdf"):
+        return "必要な情報が不足しています。", 400
+    try:
+        # 日誌のかけらがあるときは、ここで倉庫のかけらを全部読んで、記録帳を作り直してから探します。（export.py を見てください）
+        documents = find_documents(audit_log, period)
+    except ValueError:
+        return "期間の書き方が正しくありません。（例: 2025-10 または 2025-10-07）", 400
+    except Exception as e:
+        print(f"Error rebuilding audit log for export: {e}")
+        return "記録帳を読み込めませんでした。しばらくしてから、もう一度お試しください。", 503
+    if not documents:
+        return "その期間に保存された確認書はありません。", 404
+    if output_format == "pdf":
+        try:
+            check_merged(documents)
+        except ValueError:
+            return f"1つのPDFにまとめられるのは{MAX_MERGED_DOCUMENTS}件までです。format=zip をお使いください。", 400
+
+    def fetch(document):
+        return pdf_store.backend.get(document.pdf_key, document.location)
+
+    filename = f"confirmations_{period}"
+    if output_format == "pdf":
+        # 保存したPDFをつなげて、1つのPDF（しおりつき）にまとめて返します。
+        # まとめたPDFは、メモリではなく一時ファイルに書いておき、そこから少しずつ送ります。（大きくなっても、メモリがいっぱいになりません）
+        output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        index, missing, archived = write_merged(documents, fetch, output)
+        if not index:
+            output.close()
+            if archived:
+                archives = ", ".join(dict.fromkeys(entry["archive"] for entry in archived))
+                return f"その期間の確認書は、まとめファイルに移してあります: {escape(archives)}", 404
+            return "確認書の取得に失敗しました。", 404
+        size = output.tell()
+        return Response(
+            iter_file(output),
+            mimetype="application/pdf",
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}.pdf",
+                "Content-Length": str(size),
+            },
+        )
+
+    return Response(
+        stream_zip(documents, fetch),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}.zip"},
+    )
+
+
+# '/metrics' という住所にアクセスが来たら、測った時間を Prometheus が読める形で返します。
+# （Prometheus の設定で、住所に ?token=合言葉 をつけて読みに来てもらいます）
+@app.route("/metrics")
+def metrics_page():
+    if request.args.get("token") != SECRET_TOKEN:
+        return "アクセス権がありません。", 403
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# このファイルを直接実行したとき（python app.py）だけ、開発用のサーバーを起動します。
+if __name__ == "__main__":
+    app.run(debug=True)
@@ -0,0 +1,434 @@
+# --- 署名の「記録帳（監査ログ）」を作る道具 ---
+# 以前は、署名の記録は signature_log.txt という「ふつうの文章のメモ」しかありませんでした。
+# 書き方が行ごとにばらばらで（"10:5757" のような時刻もあります）、
+# 「この日・この説明者の書類はどれ？」を探すのに、メモを全部読んだり、倉庫の中身を全部調べたりする必要がありました。
+#
+# この道具は、SQLite（1つのファイルでできた、小さなデータベース）に、
+# 「いつ・どの言語で・どの説明者で・どの署名画像とPDFか・大きさはいくつか」を、1件ずつ書き足していきます。
+#   ・書き足すだけで、あとから書きかえたり消したりはできません（追記専用）
+#   ・日付・説明者・言語で「索引（インデックス）」をつけるので、何か月分あってもすぐに探せます
+#   ・書き込みは「裏側のスレッド」がまとめてやるので、ユーザーを待たせません
+#   ・journal（倉庫）を渡すと、書き込んだ記録を「日誌のかけら（1行1件のJSONファイル）」として倉庫にも置きます
+#     Vercel の /tmp は、起動し直すたびに空っぽになるので、記録帳のファイルだけでは記録が消えてしまうためです。
+#     1件ごとには置かずに、journal_rows 件たまるか、journal_interval 秒たつごとに、まとめて1つのかけらにします。
+#     倉庫へのアップロードは、書き込みのスレッドとは別のスレッドでやります。（倉庫が遅くても、書き込みは止まりません）
+#     かけらは、あとから import-journal で記録帳に取り込み直せます。
+#     rebuild_from_journal() は、倉庫にあるかけらを全部読んで、記録帳を作り直します。（export.py はこれで探します）
+#     かけらがたまりすぎないように、compact_journal() で1つにまとめます。（export.py の --compact でも呼びます）
+#
+# コマンドとしても使えます（リポジトリのフォルダで実行します）:
+#     python audit_log.py import signature_log.txt    … 今までのメモを取り込みます
+#     python audit_log.py find --date 2025-10-07 [--explainer 名前] [--lang vi]
+#     python audit_log.py import-journal audit_*.jsonl     … 倉庫からダウンロードした日誌のかけらを取り込みます
+
+import argparse  # argparse: コマンドで渡された設定を読み取るための道具
+import atexit  # atexit: プログラムが終わるときに、まだ倉庫に置いていない記録を置くための道具
+import datetime  # datetime: 「いつ」の記録を作るための道具
+import json  # json: 決まった欄に入らない情報を、まとめて文字にして残すための道具
+import tempfile  # tempfile: 日誌のかけらをまとめるときに、一時的にファイルに書いておくための道具
+import queue  # queue: 書き込みを待つ記録の「順番待ちの列」を作る道具
+import re  # re: メモの文章の中から、日付や数字を探し出すための道具
+import sqlite3  # sqlite3: 1つのファイルでできた、小さなデータベースを使う道具
+import threading  # threading: 書き込みを「裏側のスレッド」でやってもらうための道具
+import time  # time: 日誌のかけらを、前に置いてからどれだけ時間がたったかを測るための道具
+import uuid  # uuid: 日誌のかけらに、ほかと重ならない（当てられない）名前をつけるための道具
+from concurrent.futures import ThreadPoolExecutor  # ThreadPoolExecutor: 日誌のかけらのアップロードを、別のスレッドに任せる道具
+
+# 記録帳の「表（テーブル）」の形です。
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    date TEXT NOT NULL,
+    event TEXT NOT NULL,
+    lang TEXT,
+    explainer TEXT,
+    signature_key TEXT,
+    pdf_key TEXT,
+    signature_bytes INTEGER,
+    pdf_bytes INTEGER,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS events_date ON events (date);
+CREATE INDEX IF NOT EXISTS events_explainer ON events (explainer, date);
+CREATE INDEX IF NOT EXISTS events_lang ON events (lang, date);
+CREATE INDEX IF NOT EXISTS events_signature_key ON events (signature_key);
+CREATE TRIGGER IF NOT EXISTS events_no_update BEFORE UPDATE ON events
+BEGIN SELECT RAISE(ABORT, 'events is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS events_no_delete BEFORE DELETE ON events
+BEGIN SELECT RAISE(ABORT, 'events is append-only'); END;
+"""
+
+# 1件の記録に入る欄の名前です。（id 以外）
+FIELDS = (
+    "timestamp", "date", "event", "lang", "explainer",
+    "signature_key", "pdf_key", "signature_bytes", "pdf_bytes", "extra",
+)
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    # WAL: 書き込みをしている間も、ほかの人が同時に読めるようにする設定です。
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+# 日誌のかけらの名前の始まりです。例: "audit_20251007_153000_<32文字>.jsonl"
+JOURNAL_PREFIX = "audit_"
+
+
+def _journal_key():
+    # かけらの名前です。うしろに、当てられない32文字をつけます。
+    # （倉庫のURLは、名前を知っていればだれでも読めます。かけらには署名やPDFの場所が書いてあるので、名前から推測されないようにします）
+    return f"{JOURNAL_PREFIX}{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.jsonl"
+
+
+def _journal_line(row):
+    return json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + "\n"
+
+
+class AuditLog:
+    # 記録帳です。path は SQLite のファイルの場所です。
+    # journal: 日誌のかけらを置く倉庫（signature_store.py の BlobBackend など）です。（None なら置きません）
+    # max_pending: 書き込みを待つ記録の上限です。あふれた分は捨てて、dropped に数えます。
+    # journal_rows / journal_interval: 日誌のかけらを置く間隔（件数 / 秒）です。どちらかに届いたら置きます。
+
+    def __init__(self, path, journal=None, max_pending=10000, journal_rows=500, journal_interval=300):
+        self.path = path
+        self.journal = journal
+        self.max_pending = max_pending
+        self.journal_rows = journal_rows
+        self.journal_interval = journal_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        # まだ倉庫に置いていない記録と、その最初の1件を書いた時刻です。
+        self._journal_pending = []
+        self._journal_since = None
+        self._journal_lock = threading.Lock()
+        self._journal_executor = None
+        if journal is not None:
+            self._journal_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit-journal")
+            # プログラムが終わるときに、残りを置いておきます。
+            atexit.register(self.flush)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._read_connection = None
+        self._read_lock = threading.Lock()
+        # 書き込み用の接続は、ここで開いておきます。
+        # 場所がまちがっていて開けないときは、ここでエラーにします。（裏側のスレッドで開くと、
+        # スレッドだけが黙って止まり、flush() がいつまでも終わらなくなってしまうためです）
+        self._connection = _connect(path)
+
+    def record(self, event, timestamp=None, **fields):
+        # 記録を1件、順番待ちの列に入れます。実際の書き込みは裏側のスレッドがやるので、すぐに戻ります。
+        self._append(self._row(event, timestamp, fields))
+
+    def _row(self, event, timestamp, fields):
+        timestamp = timestamp or datetime.datetime.now()
+        extra = fields.pop("extra", None)
+        row = dict(
+            fields,
+            timestamp=timestamp.isoformat(timespec="seconds"),
+            date=timestamp.date().isoformat(),
+            event=event,
+            extra=json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+        return tuple(row.get(name) for name in FIELDS)
+
+    def _append(self, row, block=False):
+        # block=False のときは、列がいっぱいなら待たずに捨てます。（記録のために、ユーザーを待たせないためです）
+        try:
+            self._queue.put(row, block=block)
+        except queue.Full:
+            self.dropped += 1
+            print(f"Audit log queue is full ({self.max_pending}); dropped a {row[FIELDS.index('event')]} record.")
+            return
+        self._start_writer()
+
+    def flush(self):
+        # 順番待ちの記録が、全部書き終わるまで待ちます。（コマンドやテストで使います）
+        # 日誌のかけらも、たまっている分をすぐに置いて、置き終わるまで待ちます。
+        self._queue.join()
+        if self._journal_executor is not None:
+            self._ship_journal()
+            try:
+                self._journal_executor.submit(lambda: None).result()
+            except RuntimeError:
+                # プログラムが終わるところで、アップロードのスレッドがもう止まっているときです。（_ship_journal() で置き終わっています）
+                pass
+
+    def close(self):
+        # 記録帳のファイルへの接続を閉じます。（export.py で、作り直した一時的な記録帳を片付けるときに使います）
+        self.flush()
+        with self._read_lock:
+            if self._read_connection is not None:
+                self._read_connection.close()
+                self._read_connection = None
+        self._connection.close()
+
+    def _start_writer(self):
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="audit-log", daemon=True)
+                    self._writer.start()
+
+    def _write_loop(self):
+        connection = self._connection
+        placeholders = ", ".join("?" for _ in FIELDS)
+        sql = f"INSERT INTO events ({', '.join(FIELDS)}) VALUES ({placeholders})"
+        while True:
+            # 1件来たら、そのとき列にたまっている分もまとめて書き込みます。
+            # （日誌のかけらを置くときは、記録が来なくても journal_interval 秒ごとに起きて、たまった分を置きます）
+            try:
+                rows = [self._queue.get(timeout=self.journal_interval if self.journal is not None else None)]
+            except queue.Empty:
+                self._ship_journal(only_due=True)
+                continue
+            while True:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with connection:
+                    connection.executemany(sql, rows)
+                if self.journal is not None:
+                    self._add_to_journal(rows)
+            except Exception as e:
+                # 記録に失敗しても、ユーザーの手続きは止めません。失敗したことだけ記録（print）しておきます。
+                print(f"Error writing audit log: {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def _add_to_journal(self, rows):
+        # 書き込んだ記録を、日誌のかけらの「置く前の分」に足します。件数か時間が届いたら、置きに行きます。
+        with self._journal_lock:
+            if not self._journal_pending:
+                self._journal_since = time.monotonic()
+            self._journal_pending.extend(rows)
+        self._ship_journal(only_due=True)
+
+    def _ship_journal(self, only_due=False):
+        # たまった記録を1つのかけらにして、アップロードを別のスレッドに頼みます。
+        with self._journal_lock:
+            if not self._journal_pending:
+                return
+            due = (
+                len(self._journal_pending) >= self.journal_rows
+                or time.monotonic() - self._journal_since >= self.journal_interval
+            )
+            if only_due and not due:
+                return
+            rows, self._journal_pending = self._journal_pending, []
+        try:
+            self._journal_executor.submit(self._upload_journal, rows)
+        except RuntimeError:
+            # プログラムが終わるところで、アップロードのスレッドがもう止まっているときは、ここで置きます。
+            self._upload_journal(rows)
+
+    def _upload_journal(self, rows):
+        # 1行1件のJSONにして、倉庫に置きます。名前は毎回ちがうので、いくつのプロセスから置いても上書きしません。
+        try:
+            data = "".join(_journal_line(row) for row in rows).encode("utf-8")
+            self.journal.put(_journal_key(), data, "application/x-ndjson")
+        except Exception as e:
+            # 置けなかった分は、次に置くときに、いっしょに置きます。（ただし max_pending 件をこえた古い分は、あきらめます）
+            print(f"Error uploading audit journal ({len(rows)} records): {e}")
+            with self._journal_lock:
+                pending = rows + self._journal_pending
+                if len(pending) > self.max_pending:
+                    print(f"Audit journal backlog is full; dropped {len(pending) - self.max_pending} records from the journal.")
+                    pending = pending[-self.max_pending:]
+                self._journal_pending = pending
+                self._journal_since = self._journal_since or time.monotonic()
+
+    def find(self, date=None, explainer=None, lang=None, event=None, since=None, until=None, limit=1000):
+        # 条件に合う記録を、新しい順に探します。（索引があるので、何か月分あってもすぐに見つかります）
+        # date: 1日だけ（"2025-10-07"）、since / until: 期間（"2025-10-01" 〜 "2025-10-31"）
+        conditions, params = [], []
+        for column, value in (("date", date), ("explainer", explainer), ("lang", lang), ("event", event)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since:
+            conditions.append("date >= ?")
+            params.append(since)
+        if until:
+            conditions.append("date <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        # 読むための接続は1つを使い回します。同時に使うと壊れてしまうので、「鍵」をかけて順番に使います。
+        with self._read_lock:
+            if self._read_connection is None:
+                self._read_connection = _connect(self.path)
+            cursor = self._read_connection.execute(
+                f"SELECT id, {', '.join(FIELDS)} FROM events {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+                params + [limit],
+            )
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+
+# --- 今までのメモ（signature_log.txt）を取り込む ---
+# メモの1行は「日時: ..., 署名ファイル: ..., 書類: ...」のように、「名前: 値」がカンマで並んでいます。
+LEGACY_FIELDS = {"日時": "timestamp", "署名ファイル": "signature_key", "署名者": "signer", "書類": "document", "同意": "agreement"}
+SIGNATURE_FILE_TIME = re.compile(r"signature_(\d{8})_(\d{6})")
+
+
+def parse_legacy_line(line):
+    # メモの1行を読んで、(いつ, 署名ファイル, そのほかの情報) を返します。読めない行は None です。
+    values = {}
+    for part in line.strip().split(", "):
+        name, separator, value = part.partition(": ")
+        if separator:
+            values[LEGACY_FIELDS.get(name.strip(), name.strip())] = value.strip()
+    if not values:
+        return None
+
+    signature_key = values.pop("signature_key", None)
+    raw_timestamp = values.pop("timestamp", "")
+    timestamp = None
+    # 時刻の書き方がばらばらなので（"10:5757" や "114326" など）、署名ファイルの名前にある日時を優先して使います。
+    match = SIGNATURE_FILE_TIME.search(signature_key or "")
+    if match:
+        timestamp = datetime.datetime.strptime("".join(match.groups()), "%Y%m%d%H%M%S")
+    else:
+        date_match = re.match(r"(\d{4})-(\d{2})-(\d{2})\s*(.*)", raw_timestamp)
+        if date_match:
+            digits = re.sub(r"\D", "", date_match.group(4)).ljust(6, "0")[:6]
+            timestamp = datetime.datetime.strptime("".join(date_match.groups()[:3]) + digits, "%Y%m%d%H%M%S")
+    if timestamp is None:
+        return None
+    if raw_timestamp:
+        values["original_timestamp"] = raw_timestamp
+    return timestamp, signature_key, values
+
+
+def import_legacy_log(audit_log, path):
+    # signature_log.txt を読んで、1行ずつ記録帳に書き足します。取り込んだ件数を返します。
+    count = 0
+    with open(path, encoding="utf-8-sig") as f:
+        for line in f:
+            parsed = parse_legacy_line(line)
+            if parsed is None:
+                continue
+            timestamp, signature_key, extra = parsed
+            # たくさんの行を一度に取り込むので、列がいっぱいのときは捨てずに、空くのを待ちます。
+            audit_log._append(audit_log._row("import", timestamp, {"signature_key": signature_key, "extra": extra}), block=True)
+            count += 1
+    audit_log.flush()
+    return count
+
+
+def compact_journal(audit_log):
+    # 倉庫にある日誌のかけらを、1つのかけらにまとめて、まとめ終わったものを消します。
+    # 戻り値は (まとめたかけらの数, 記録の件数) です。
+    # （まとめている間にほかのプロセスが置いたかけらは、最初に一覧にしていないので、消さずに残ります）
+    audit_log.flush()
+    backend = audit_log.journal
+    segments = backend.list(JOURNAL_PREFIX)
+    if len(segments) < 2:
+        return 0, 0
+    count = 0
+    # 全部をメモリにためないように、一時ファイルに書きながらまとめます。
+    with tempfile.TemporaryFile() as merged:
+        for key, location in segments:
+            data = backend.get(key, location)
+            if data is None:
+                raise Exception(f"Audit journal segment {key} could not be downloaded; nothing was deleted.")
+            merged.write(data)
+            count += data.count(b"\n")
+        merged.seek(0)
+        backend.put(_journal_key(), merged, "application/x-ndjson")
+    for key, location in segments:
+        backend.delete(key, location)
+    return len(segments), count
+
+
+def _journal_rows(lines):
+    # 日誌のかけらの1行1行を、記録帳の1件分（FIELDS の順の組）にして返します。
+    for line in lines:
+        if not line.strip():
+            continue
+        values = json.loads(line)
+        yield tuple(values.get(name) for name in FIELDS)
+
+
+def import_journal(audit_log, paths):
+    # 倉庫からダウンロードした日誌のかけらを読んで、記録帳に書き足します。取り込んだ件数を返します。
+    # （同じかけらを2回取り込むと、記録も2件になるので、空の記録帳に1回だけ取り込んでください）
+    count = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for row in _journal_rows(f):
+                audit_log._append(row, block=True)
+                count += 1
+    audit_log.flush()
+    return count
+
+
+def rebuild_from_journal(audit_log, path):
+    # 倉庫にある日誌のかけらを全部読んで、path に記録帳を作り直し、その AuditLog を返します。
+    # Vercel では、手元の記録帳には「最後に起動し直してから」の分しかありません。
+    # 全部の期間を探すとき（export.py）は、手元の記録帳ではなく、こちらを使います。
+    # かけらが1つでも読めなかったり、まだ置けていない記録が残っていたりするときは、欠けたまま探さないように、エラーにします。
+    audit_log.flush()
+    if audit_log._journal_pending:
+        raise Exception(f"{len(audit_log._journal_pending)} audit records are not in the journal yet; try again later.")
+    backend = audit_log.journal
+    connection = _connect(path)
+    placeholders = ", ".join("?" for _ in FIELDS)
+    sql = f"INSERT INTO events ({', '.join(FIELDS)}) VALUES ({placeholders})"
+    try:
+        for key, location in backend.list(JOURNAL_PREFIX):
+            data = backend.get(key, location)
+            if data is None:
+                raise Exception(f"Audit journal segment {key} could not be downloaded.")
+            with connection:
+                connection.executemany(sql, _journal_rows(data.decode("utf-8").splitlines()))
+    finally:
+        connection.close()
+    return AuditLog(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="署名の記録帳（監査ログ）")
+    parser.add_argument("--db", help="記録帳のファイル（指定しなければ AUDIT_LOG_PATH と同じ場所）")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_command = commands.add_parser("import", help="今までのメモ（signature_log.txt）を取り込みます")
+    import_command.add_argument("path")
+    journal_command = commands.add_parser("import-journal", help="倉庫からダウンロードした日誌のかけらを取り込みます")
+    journal_command.add_argument("paths", nargs="+")
+    find_command = commands.add_parser("find", help="記録を探します")
+    for name in ("--date", "--since", "--until", "--explainer", "--lang", "--event"):
+        find_command.add_argument(name)
+    find_command.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    if args.db:
+        path = args.db
+    else:
+        from app import AUDIT_LOG_PATH
+        path = AUDIT_LOG_PATH
+    audit_log = AuditLog(path)
+
+    if args.command == "import":
+        print(f"{import_legacy_log(audit_log, args.path)} records imported into {path}")
+    elif args.command == "import-journal":
+        print(f"{import_journal(audit_log, args.paths)} records imported into {path}")
+    else:
+        rows = audit_log.find(
+            date=args.date, explainer=args.explainer, lang=args.lang, event=args.event,
+            since=args.since, until=args.until, limit=args.limit,
+        )
+        for row in rows:
+            print(json.dumps(row, ensure_ascii=False))
+
+
+# このファイルを直接実行したとき（python audit_log.py）だけ、コマンドとして動きます。
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# --- 「まとめて作る」ための道具（バッチ処理） ---
+# ガイダンスは、何十人もの人に同じ日・同じ時間帯でまとめて行います。
+# 1人ずつ /generate-pdf を通すかわりに、全員分の (署名画像, 説明者の名前, 言語) を受け取って、
+# 1回でまとめて確認書を作ります。作り方は2通りあります。
+#   zip: 1人1つのPDFを作って、ZIPファイルにまとめます。
+#        PDF作りはコンピューターの「コア（頭脳）」の数だけ別々のプロセスに分けて同時に進め、
+#        できあがった順に、ZIPファイルを少しずつユーザーに送ります。
+#        （プロセスはリクエストごとには作らず、決まった数だけ1回作って、全部のリクエストで使い回します）
+#   pdf: 全員分を1つのPDF（1人1ページ）にまとめます。
+#        フォントの埋め込みが1回で済むので、1つのプロセスでも十分に速く作れます。
+# どちらも、フォントとPDFのひな形（pdf_template.py）は読み込み済みのものを使い回します。
+#
+# コマンドとしても使えます（リポジトリのフォルダで実行します）:
+#     python batch.py records.json -o confirmations.zip
+#     python batch.py records.json -o confirmations.pdf --format pdf
+# records.json は、次のような並びです。（signature には、PNGファイルの場所か、データURLを書きます）
+#     [{"signature": "signatures/worker01.png", "explainer_name": "PHAM VAN THINH", "lang": "vi"}, ...]
+# signature のかわりに "signature_strokes" で、線のデータ（{"pen": 1.5, "strokes": [[x0, y0, ...], ...]}）も書けます。
+
+import argparse  # argparse: コマンドで渡された設定（ファイル名など）を読み取るための道具
+import base64  # base64: データURLの中の「テキストになった画像」を、元の画像データに戻す道具
+import datetime  # datetime: 確認書に書く日付を扱うための道具
+import json  # json: records.json を読むための道具
+import multiprocessing  # multiprocessing: ワーカーのプロセスの作り方（forkserver / spawn）を選ぶための道具
+import os  # os: ファイルの場所やコアの数を調べるための道具
+import threading  # threading: 同時に来たリクエストで、ワーカーを二重に作らないための「鍵」の道具
+import zipfile  # zipfile: 何枚ものPDFを、1つのZIPファイルにまとめる道具
+from collections import namedtuple  # namedtuple: 名前つきの「組（タプル）」を作る道具
+from concurrent.futures import ProcessPoolExecutor  # ProcessPoolExecutor: 仕事を、いくつもの「別のプロセス」に分けて同時に進める道具
+from concurrent.futures.process import BrokenProcessPool  # BrokenProcessPool: ワーカーのプロセスが途中で止まってしまったときのエラー
+from itertools import repeat  # repeat: 同じ値（日付）を、何度もくり返し渡すための道具
+
+from pdf_template import get_template  # pdf_template: 確認書PDFの「ひな形」を作って覚えておく道具
+from signature_image import normalize_signature  # signature_image: 署名画像を整える道具
+from signature_vector import encode_strokes  # signature_vector: 署名を「線のデータ」にする道具
+
+# 1人分の情報です。signature は署名画像（PNG）か、線のデータ（signature_vector.py）そのもの（bytes）です。
+BatchRecord = namedtuple("BatchRecord", ["signature", "explainer_name", "lang"])
+
+
+def decode_signature(value):
+    # データURL（"data:image/png;base64,..."）を、画像データに戻します。
+    # （「,」が無いときは、base64のテキストだけが渡されたものとして扱います）
+    encoded = value.split(",", 1)[1] if "," in value else value
+    return base64.b64decode(encoded)
+
+
+def safe_name(value):
+    # ZIPファイルの中の名前に使えるように、空白とフォルダの区切り（/ と \）を「_」にかえます。
+    # （送られてきた言語や名前に "../" などが入っていても、ZIPの外を指す名前にならないようにするためです）
+    return (value or "").replace(" ", "_").replace("/", "_").replace("\\", "_")
+
+
+def entry_name(index, record):
+    # ZIPファイルの中での、PDFのファイル名です。例: "001_vi_PHAM_VAN_THINH.pdf"
+    return f"{index + 1:03d}_{safe_name(record.lang)}_{safe_name(record.explainer_name)}.pdf"
+
+
+# --- 別のプロセス（ワーカー）の中で動く部分 ---
+# ワーカーは全部のリクエストで使い回すので、フォントとひな形は、仕事といっしょに受け取ります。
+# （get_template() が覚えておくので、読み込むのは、ワーカーごと・ひな形ごとに最初の1回だけです）
+def _render_one(font_file, text, explainer_name, signature, today):
+    template = get_template(font_file, text)
+    return template.render(explainer_name, signature, today)
+
+
+# --- ワーカーのプロセスの「置き場」 ---
+# リクエストのたびにプロセスを作ると、同時に何件も来たときにプロセスが増えすぎてしまうので、
+# 決まった数のワーカーを1回だけ作って、全部のリクエストで使い回します。（同時に来た仕事は、順番待ちになります）
+# Webサーバーのプロセスは、いくつものスレッドが動いているので、そのまま「コピー（fork）」すると
+# 鍵がかかったままの状態まで写ってしまい、止まってしまうことがあります。
+# そのため、ワーカーは forkserver（使えないときは spawn）という、まっさらなプロセスから作るやり方で作ります。
+# Vercel（AWS Lambda）のように、プロセスどうしのやりとりに使う道具（/dev/shm）が無いところでは、ワーカーを作れません。
+# そのときは、このプロセスの中で1人分ずつ作ります。（作れなかったことは覚えておいて、次からは作ろうとしません）
+_pool = None
+_pool_size = 1
+_pool_unavailable = False
+_pool_lock = threading.Lock()
+
+# ワーカーを作ったあと、ちゃんと仕事を受け取れるかを確かめるときに、待つ時間の上限（秒）です。
+POOL_START_TIMEOUT = 30
+
+
+def get_pool(workers=None):
+    # 使い回すワーカーの置き場を返します。（無ければ作ります。workers は、最初に作るときだけ使います）
+    # ワーカーを作れないところでは None を返すので、そのときは、このプロセスで作ってください。
+    # （/batch-pdf では、返事を送り始める前に呼んで、作れるかどうかを先に確かめます）
+    global _pool, _pool_size, _pool_unavailable
+    with _pool_lock:
+        if _pool is None and not _pool_unavailable:
+            pool = None
+            try:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                size = workers or os.cpu_count() or 1
+                pool = ProcessPoolExecutor(max_workers=size, mp_context=context)
+                # ワーカーは最初の仕事を頼んだときに作られるので、小さな仕事を1つ頼んで、動くことを確かめます。
+                pool.submit(os.getpid).result(timeout=POOL_START_TIMEOUT)
+            except Exception as e:
+                print(f"Error starting batch worker pool, rendering in-process instead: {e}")
+                _pool_unavailable = True
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                _pool, _pool_size = pool, size
+        return _pool
+
+
+def _discard_pool(pool):
+    # ワーカーが途中で止まって使えなくなった置き場を捨てます。（次のリクエストで、新しく作り直します）
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+class ChunkWriter:
+    # zipfile が書き込んだデータを、少しずつ取り出すための入れ物です。
+    # （ZIPファイル全体をメモリにためずに、できた部分から順にユーザーへ送るために使います。export.py でも使います）
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _render_in_process(records, font_file, text, today):
+    # このプロセスの中で、1人分ずつPDFを作ります。
+    for record in records:
+        yield _render_one(font_file, text, record.explainer_name, record.signature, today)
+
+
+def stream_zip(records, font_file, text, today, pool=None):
+    # 全員分のPDFを作り、ZIPファイルのデータを少しずつ（bytesのかたまりで）返します。
+    # pool: get_pool() で受け取ったワーカーの置き場です。（None なら、このプロセスで作ります）
+    buffer = ChunkWriter()
+    # PDFはもともと圧縮されているので、ZIPではもう一度圧縮せずに、そのまま入れます。
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as archive:
+        if pool is None or len(records) == 1:
+            # 1人分だけなら、プロセスを分けるほうが遅いので、このプロセスで作ります。
+            pdfs = _render_in_process(records, font_file, text, today)
+        else:
+            # chunksize: 1回のやりとりで、ワーカーに何人分まとめて渡すか
+            chunksize = max(1, len(records) // (_pool_size * 4))
+            pdfs = pool.map(
+                _render_one,
+                repeat(font_file),
+                repeat(text),
+                [record.explainer_name for record in records],
+                [record.signature for record in records],
+                repeat(today),
+                chunksize=chunksize,
+            )
+        done = 0
+        try:
+            while done < len(records):
+                try:
+                    # map は「頼んだ順番」で結果を返すので、ZIPの中の順番も records と同じになります。
+                    # （途中でダウンロードが止められたときは、まだ始まっていない分の仕事は取り消されます）
+                    for pdf_bytes in pdfs:
+                        archive.writestr(entry_name(done, records[done]), pdf_bytes)
+                        done += 1
+                        yield buffer.drain()
+                except BrokenProcessPool as e:
+                    # ワーカーが途中で止まってしまっても、ユーザーへの返事はもう始まっているので、
+                    # 残りの分は、このプロセスで作って続けます。（置き場は、次のリクエストで作り直します）
+                    print(f"Batch worker pool broke, rendering the remaining {len(records) - done} in-process: {e}")
+                    _discard_pool(pool)
+                    pdfs = _render_in_process(records[done:], font_file, text, today)
+        finally:
+            pdfs.close()
+    # 最後に、ZIPファイルの「目次」の部分を送ります。
+    yield buffer.drain()
+
+
+def render_multipage(records, font_file, text, today):
+    # 全員分を、1つのPDF（1人1ページ）にまとめて作ります。
+    template = get_template(font_file, text)
+    return template.render_pages(
+        [(record.explainer_name, record.signature) for record in records], today
+    )
+
+
+def load_records(path):
+    # records.json を読んで、BatchRecord の並びにします。
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    records = []
+    for item in items:
+        if not isinstance(item.get("explainer_name"), str) or not isinstance(item.get("lang", ""), str):
+            raise ValueError(f"{path}: explainer_name and lang must be strings.")
+        if "signature_strokes" in item:
+            signature = encode_strokes(json.dumps(item["signature_strokes"]))
+            records.append(BatchRecord(signature, item["explainer_name"], item.get("lang", "")))
+            continue
+        signature = item["signature"]
+        if signature.startswith("data:"):
+            image_data = decode_signature(signature)
+        else:
+            # ファイルの場所は、records.json があるフォルダからの場所として読みます。
+            with open(os.path.join(base, signature), "rb") as f:
+                image_data = f.read()
+        records.append(BatchRecord(normalize_signature(image_data), item["explainer_name"], item.get("lang", "")))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ガイダンスの確認書を、まとめて作ります。")
+    parser.add_argument("records", help="(signature, explainer_name, lang) の並びを書いたJSONファイル")
+    parser.add_argument("-o", "--output", required=True, help="作ったファイルの保存先")
+    parser.add_argument("--format", choices=["zip", "pdf"], default="zip", help="zip: 1人1つのPDF / pdf: 全員分を1つのPDFに")
+    parser.add_argument("--date", help="確認書に書く日付（例: 2025-10-27）。指定しなければ今日")
+    parser.add_argument("--workers", type=int, help="同時に動かすプロセスの数（指定しなければ、コアの数）")
+    args = parser.parse_args()
+
+    from app import pdf_font_file, registry
+
+    records = load_records(args.records)
+    today = datetime.date.fromisoformat(args.date) if args.date else datetime.date.today()
+    font_file = pdf_font_file("".join(record.explainer_name for record in records))
+    text = registry.current().template_text
+
+    with open(args.output, "wb") as f:
+        if args.format == "pdf":
+            f.write(render_multipage(records, font_file, text, today))
+        else:
+            pool = get_pool(args.workers) if len(records) > 1 and args.workers != 1 else None
+            for chunk in stream_zip(records, font_file, text, today, pool):
+                f.write(chunk)
+    print(f"{len(records)} confirmations -> {args.output}")
+
+
+# このファイルを直接実行したとき（python batch.py）だけ、コマンドとして動きます。
+if __name__ == "__main__":
+    main()
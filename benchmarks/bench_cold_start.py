@@ -0,0 +1,145 @@
+# --- 起動の速さ（コールドスタート）のベンチマーク ---
+# Vercel では、しばらく使われないとプログラムが止まり、次のアクセスで新しいプロセスとしてまた起動します。
+# そのときに最初の人が待たされる時間を、新しいプロセスを何回か立ち上げて測ります。
+#   import     : app.py を読み込み終わるまで
+#   first_page : そのあと、言語選択ページ（/）を返すまで
+#   first_pdf  : そのあと、署名を送って（/sign）、最初のPDF（/generate-pdf）ができるまで
+# あわせて `python -X importtime` の結果から、読み込みに時間がかかっているモジュールの上位を表示します。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python benchmarks/bench_cold_start.py [-n 5] [--no-snapshot] [--warm-up background|eager|off] [--history 記録.jsonl]
+# --history をつけると、結果を1行のJSONとしてファイルの最後に書き足します。
+# （コミットごとに書き足していけば、起動が遅くなっていないかを、あとから見くらべられます）
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def child():
+    # 新しいプロセスの中で動く部分です。時間を測って、JSONで出力します。
+    import base64
+    import re
+    from io import BytesIO
+
+    started = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+
+    client = app.app.test_client()
+    client.get("/", query_string={"token": app.SECRET_TOKEN})
+    first_page = time.perf_counter()
+
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGBA", (1170, 600), (0, 0, 0, 0))
+    ImageDraw.Draw(image).line([(100, 400), (500, 150), (1000, 450)], fill=(0, 0, 0, 255), width=8)
+    output = BytesIO()
+    image.save(output, format="PNG")
+    signature_data = "data:image/png;base64," + base64.b64encode(output.getvalue()).decode("ascii")
+
+    signed = time.perf_counter()
+    response = client.post("/sign", data={"token": app.SECRET_TOKEN, "lang": "vi", "signature_data": signature_data})
+    page = client.get(response.headers["Location"])
+    signature_url = re.search(r'name="signature_url" value="([^"]+)"', page.get_data(as_text=True)).group(1)
+    response = client.post(
+        "/generate-pdf", data={"signature_url": signature_url, "explainer_name": app.download_explainers("vi")[0], "lang": "vi"}
+    )
+    first_pdf = time.perf_counter()
+
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "first_page_ms": (first_page - imported) * 1000,
+        # にせものの署名画像を作る時間は、数に入れません。
+        "first_pdf_ms": (first_pdf - signed) * 1000,
+        "pdf_ok": response.get_data().startswith(b"%PDF"),
+    }))
+
+
+def importtime_top(env, count=10):
+    # `python -X importtime -c "import app"` の結果から、(モジュール, 自分だけの時間, 合計の時間) の上位を返します。
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows[:count]
+
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="起動の速さ（コールドスタート）のベンチマーク")
+    parser.add_argument("-n", type=int, default=5, help="新しいプロセスを立ち上げる回数")
+    parser.add_argument("--no-snapshot", action="store_true", help="ページのスナップショットを使わずに測る")
+    parser.add_argument("--warm-up", choices=["background", "eager", "off"], default="background")
+    parser.add_argument("--history", help="結果を書き足していくJSONLファイル")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    env = dict(os.environ)
+    workdir = tempfile.mkdtemp(prefix="bench_cold_start_")
+    env["SIGNATURE_STORE_DIR"] = workdir
+    env["AUDIT_LOG_PATH"] = os.path.join(workdir, "audit.sqlite3")
+    env["REQUEST_LOG"] = "0"
+    env["WARM_UP"] = args.warm_up
+    if args.no_snapshot:
+        env["PAGE_SNAPSHOT_PATH"] = os.path.join(workdir, "no_snapshot.pickle")
+
+    runs = []
+    for _ in range(args.n):
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child"], cwd=ROOT, env=env, capture_output=True, text=True
+        )
+        process_ms = (time.perf_counter() - started) * 1000
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        run["process_ms"] = process_ms
+        runs.append(run)
+
+    report = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "runs": args.n,
+        "snapshot": not args.no_snapshot,
+        "warm_up": args.warm_up,
+        "pdf_ok": all(run["pdf_ok"] for run in runs),
+    }
+    for key in ("import_ms", "first_page_ms", "first_pdf_ms", "process_ms"):
+        report[key] = round(statistics.median(run[key] for run in runs), 1)
+
+    print(f"runs: {args.n}  snapshot: {report['snapshot']}  warm-up: {args.warm_up}  pdf ok: {report['pdf_ok']}")
+    print(f"median import: {report['import_ms']:.1f} ms  first page: {report['first_page_ms']:.1f} ms  "
+          f"first pdf: {report['first_pdf_ms']:.1f} ms  whole process: {report['process_ms']:.1f} ms")
+    print("slowest modules to import (self ms / cumulative ms):")
+    for name, self_ms, cumulative_ms in importtime_top(env):
+        print(f"  {name:<40}{self_ms:>10.1f}{cumulative_ms:>10.1f}")
+
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
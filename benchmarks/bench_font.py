@@ -0,0 +1,127 @@
+# --- フォント読み込みの「速さ」と「メモリ」をくらべるベンチマーク ---
+# 次の3つのやり方で、確認書PDFを作る時間と使うメモリを測ります。
+#   today  : 以前のやり方（PDFを作るたびに pdf.add_font() でフォントを読み込み直す）
+#   cached : フォントを1回だけ読み込んで使い回す（font_cache.py）
+#   subset : 使う文字だけの小さいフォント（サブセットフォント）を使い回す
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python benchmarks/bench_font.py [--font フォントファイル] [-n 回数]
+#
+# 「起動時間」は、新しいプロセスを立ち上げて最初のPDFができるまでの時間です。（Vercelのコールドスタートに当たります）
+# 「最大メモリ」は、そのプロセスが使ったメモリの最大値（maxrss）です。
+
+import argparse
+import datetime
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_signature(path):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (600, 200), "white")
+    ImageDraw.Draw(image).line([(20, 150), (200, 40), (380, 160), (580, 50)], fill="black", width=6)
+    image.save(path)
+
+
+def template_text():
+    # 確認書の文章のかたまりです。（app.py と同じ data フォルダから読みます）
+    from registry import load
+
+    return load(os.path.join(ROOT, "data")).template_text
+
+
+def render_today(font_file, text, signature_path, explainer_name):
+    # 以前の generate_pdf と同じく、毎回 FPDF() と add_font() から始めてレイアウトします。
+    from fpdf import FPDF
+
+    from pdf_template import ConfirmationTemplate
+
+    template = ConfirmationTemplate.__new__(ConfirmationTemplate)
+    template.font_file = font_file
+    template.text = text
+    template.char_order = ""
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.add_font("NotoSansJP", "", font_file)
+    template._draw_static(pdf)
+    pdf.set_xy(pdf.l_margin + 70, template.explainer_y)
+    pdf.cell(80, 8, explainer_name)
+    pdf.image(signature_path, x=template.line_start_x + 5, y=template.sig_y_pos - 10, w=55, h=15)
+    return bytes(pdf.output())
+
+
+def render_cached(font_file, text, signature_path, explainer_name):
+    from pdf_template import get_template
+
+    template = get_template(font_file, text)
+    return template.render(explainer_name, signature_path, datetime.date.today())
+
+
+def run_child(mode, font_file, signature_path, count):
+    # 子プロセスの中で実行されます。1枚目（起動時間）と、2枚目以降（1枚あたり）の時間を測ります。
+    started = time.perf_counter()
+    render = render_today if mode == "today" else render_cached
+    explainer_name = "PHAM VAN THINH"
+    text = template_text()
+    size = len(render(font_file, text, signature_path, explainer_name))
+    first = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(count):
+        render(font_file, text, signature_path, explainer_name)
+    per_pdf = (time.perf_counter() - started) / count
+
+    print(json.dumps({
+        "first_pdf_s": first,
+        "per_pdf_ms": per_pdf * 1000,
+        "pdf_bytes": size,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="フォント読み込みのベンチマーク")
+    parser.add_argument("--font", default=os.path.join(ROOT, "NotoSansJP-Regular.ttf"))
+    parser.add_argument("-n", type=int, default=20, help="2枚目以降に作るPDFの枚数")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--signature", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.font, args.signature, args.n)
+        return
+
+    from app import subset_text
+    from font_cache import build_subset
+
+    with tempfile.TemporaryDirectory() as tmp:
+        signature_path = os.path.join(tmp, "signature.png")
+        make_signature(signature_path)
+        subset_file = os.path.join(tmp, "subset.ttf")
+        build_subset(args.font, subset_file, subset_text() + "PHAM VAN THINH")
+
+        cases = [("today", args.font), ("cached", args.font), ("subset", subset_file)]
+        print(f"font: {args.font} ({os.path.getsize(args.font):,} bytes), subset: {os.path.getsize(subset_file):,} bytes")
+        print(f"{'mode':<8}{'first PDF (s)':>15}{'per PDF (ms)':>15}{'PDF (bytes)':>14}{'max RSS (MB)':>15}")
+        for mode, font_file in cases:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--font", font_file,
+                 "--signature", signature_path, "-n", str(args.n)],
+                check=True, capture_output=True, text=True, cwd=ROOT,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<8}{result['first_pdf_s']:>15.3f}{result['per_pdf_ms']:>15.1f}"
+                  f"{result['pdf_bytes']:>14,}{result['max_rss_mb']:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# --- ガイダンスの流れ全体をまとめて動かす「負荷テスト」のベンチマーク ---
+# 手元の「にせものの倉庫」（fake_blob_server.py）と、このアプリ（app.py）を両方とも裏側で立ち上げて、
+# 何人もの人が同時に
+#   言語選択（/） → ガイダンス（/guidance） → 署名の送信（/sign） → 説明者の選択（/download） → PDF作成（/generate-pdf）
+# の流れを進めたときの
+#   ・1秒あたりに何人分の流れを終えられたか（スループット）
+#   ・1回ごとにかかった時間の p50 / p95 / p99（100回のうち50回目・95回目・99回目に遅かったもの）
+#   ・処理の段階ごとにかかった時間の平均（/metrics から読みます）
+# を測ります。本番の台数を決めるときや、遅くなっていないかを確かめるときに使います。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python benchmarks/bench_load.py [--users 200] [--concurrency 8] [--blob-delay 0.05] [--cold-store] [--json 結果.json]
+# --cold-store をつけると、署名画像を「手元の棚（メモリ）」に置かずに、毎回倉庫から取ってくるようにします。
+# --json をつけると、結果をJSONファイルにも保存します。（前回の結果とくらべるときに使います）
+
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+STEPS = ["language_select", "guidance", "sign", "download", "generate_pdf"]
+
+
+def percentile(sorted_values, fraction):
+    # 小さい順に並べた値の中から、fraction（0.95 なら 95%）の位置にある値を返します。
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def make_signature_data_url(seed):
+    # スマートフォンで書いたような大きさの、にせものの署名画像（データURL）を作ります。
+    import base64
+    import random
+
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    image = Image.new("RGBA", (1170, 600), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    points = [(rng.uniform(100, 1070), rng.uniform(150, 450)) for _ in range(12)]
+    draw.line(points, fill=(0, 0, 0, 255), width=8, joint="curve")
+    output = BytesIO()
+    image.save(output, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(output.getvalue()).decode("ascii")
+
+
+def run_flow(base_url, token, lang, explainer_name, signature_data_url):
+    # 1人分の流れを進めて、段階ごとにかかった時間（秒）を返します。
+    import requests
+
+    timings = {}
+    with requests.Session() as session:
+        def timed(step, method, path, **kwargs):
+            started = time.perf_counter()
+            response = session.request(method, base_url + path, allow_redirects=False, **kwargs)
+            response.content
+            timings[step] = time.perf_counter() - started
+            if response.status_code >= 400:
+                raise Exception(f"{step} returned {response.status_code}")
+            return response
+
+        timed("language_select", "GET", "/", params={"token": token})
+        timed("guidance", "GET", "/guidance", params={"token": token, "lang": lang})
+        response = timed("sign", "POST", "/sign", data={"token": token, "lang": lang, "signature_data": signature_data_url})
+        location = response.headers["Location"]
+        page = timed("download", "GET", location if location.startswith("/") else location[len(base_url):])
+        signature_url = re.search(r'name="signature_url" value="([^"]+)"', page.text).group(1).replace("&amp;", "&")
+        response = timed(
+            "generate_pdf", "POST", "/generate-pdf",
+            data={"signature_url": signature_url, "explainer_name": explainer_name, "lang": lang},
+        )
+        if not response.content.startswith(b"%PDF"):
+            raise Exception("generate_pdf did not return a PDF")
+    return timings
+
+
+def stage_averages(metrics_text):
+    # /metrics の文字から、段階ごとの「合計時間」と「回数」を読み取って、平均（ミリ秒）にします。
+    sums, counts = {}, {}
+    for line in metrics_text.splitlines():
+        match = re.match(r'app_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)', line)
+        if match:
+            kind, stage, value = match.groups()
+            (sums if kind == "sum" else counts)[stage] = float(value)
+    return {stage: sums[stage] / counts[stage] * 1000 for stage in sorted(sums) if counts.get(stage)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ガイダンスの流れ全体の負荷テスト")
+    parser.add_argument("--users", type=int, default=100, help="流れを進める人数（合計）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同時に進める人数")
+    parser.add_argument("--blob-delay", type=float, default=0.0, help="にせものの倉庫の返事を遅らせる時間（秒）")
+    parser.add_argument("--blob-fail-rate", type=float, default=0.0, help="にせものの倉庫がわざと失敗する割合")
+    parser.add_argument("--cold-store", action="store_true", help="署名画像を手元の棚に置かず、毎回倉庫から取ってくる")
+    parser.add_argument("--lang", default="vi")
+    parser.add_argument("--json", help="結果を保存するJSONファイル")
+    args = parser.parse_args()
+
+    from fake_blob_server import start_server
+
+    blob_server, blob_url = start_server("127.0.0.1", delay=args.blob_delay, fail_rate=args.blob_fail_rate)
+
+    # app.py は読み込むときに設定を読むので、その前に「にせものの倉庫」を使うように設定しておきます。
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    os.environ["BLOB_BASE_URL"] = blob_url
+    os.environ["BLOB_READ_WRITE_TOKEN"] = "bench"
+    os.environ["AUDIT_LOG_PATH"] = os.path.join(workdir, "audit.sqlite3")
+    os.environ["REQUEST_LOG"] = "0"
+    os.environ.pop("SIGNATURE_STORE_DIR", None)
+    if args.cold_store:
+        os.environ["SIGNATURE_CACHE_BYTES"] = "0"
+
+    started = time.perf_counter()
+    import app as app_module
+    print(f"app import + warm-up: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    from werkzeug.serving import make_server
+
+    # 1回ごとのアクセス記録は、ベンチマークの邪魔になるので出しません。
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    token = app_module.SECRET_TOKEN
+    explainers = app_module.download_explainers(args.lang)
+    signatures = [make_signature_data_url(seed) for seed in range(min(args.users, 20))]
+
+    def one_user(index):
+        return run_flow(
+            base_url, token, args.lang, explainers[index % len(explainers)], signatures[index % len(signatures)]
+        )
+
+    # 最初の1人分は「ならし運転」として、結果に入れません。
+    one_user(0)
+
+    results, errors = [], []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        futures = [executor.submit(one_user, index) for index in range(args.users)]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                errors.append(str(e))
+    elapsed = time.perf_counter() - started
+
+    import requests
+
+    metrics_text = requests.get(f"{base_url}/metrics", params={"token": token}).text
+    server.shutdown()
+    blob_server.shutdown()
+
+    report = {
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "blob_delay": args.blob_delay,
+        "cold_store": args.cold_store,
+        "errors": len(errors),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_flows_per_s": round(len(results) / elapsed, 2),
+        "steps_ms": {},
+        "stages_ms": {stage: round(value, 2) for stage, value in stage_averages(metrics_text).items()},
+    }
+    for step in STEPS + ["flow"]:
+        values = sorted(
+            (sum(timings.values()) if step == "flow" else timings[step]) * 1000 for timings in results
+        )
+        report["steps_ms"][step] = {
+            "mean": round(statistics.mean(values), 2) if values else 0.0,
+            "p50": round(percentile(values, 0.50), 2),
+            "p95": round(percentile(values, 0.95), 2),
+            "p99": round(percentile(values, 0.99), 2),
+        }
+
+    print(f"users: {args.users}  concurrency: {args.concurrency}  blob delay: {args.blob_delay}s  "
+          f"errors: {len(errors)}  elapsed: {elapsed:.2f}s  throughput: {report['throughput_flows_per_s']} flows/s")
+    print(f"{'step':<16}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for step, values in report["steps_ms"].items():
+        print(f"{step:<16}{values['mean']:>10.1f}{values['p50']:>10.1f}{values['p95']:>10.1f}{values['p99']:>10.1f}")
+    print("stage averages (ms): " + "  ".join(f"{stage} {value:.1f}" for stage, value in report["stages_ms"].items()))
+    if errors:
+        print(f"first error: {errors[0]}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
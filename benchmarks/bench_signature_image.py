@@ -0,0 +1,98 @@
+# --- 署名画像を整える処理（signature_image.py）のベンチマーク ---
+# たくさんの署名画像（コーパス）に normalize_signature() をかけて、
+#   ・画像がどれだけ小さくなったか（バイト数と割合）
+#   ・1枚あたりにかかった時間
+# を測ります。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python benchmarks/bench_signature_image.py [署名画像(PNG)が入ったフォルダ] [--mode L|1] [--dpi 300]
+# フォルダを指定しなければ、スマートフォンやパソコンの画面の大きさ（devicePixelRatio 1〜3）を
+# まねて作った、にせものの署名画像を使います。
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from signature_image import normalize_signature  # noqa: E402
+
+# (画面上の幅, 画面上の高さ) … index.html の canvas は、幅いっぱい × 高さ200px です。
+CANVAS_SIZES = [(360, 200), (390, 200), (414, 200), (768, 200), (770, 200)]
+PIXEL_RATIOS = [1, 2, 3]
+
+
+def synthetic_corpus(count=60, seed=0):
+    # signature_pad で書いたような、なめらかな線の署名画像を作ります。
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        css_width, css_height = CANVAS_SIZES[index % len(CANVAS_SIZES)]
+        ratio = PIXEL_RATIOS[index % len(PIXEL_RATIOS)]
+        width, height = css_width * ratio, css_height * ratio
+        # 4倍の大きさで書いてから縮めて、線のふちをなめらかにします。（ブラウザの描き方に近づけるためです）
+        scale = 4
+        image = Image.new("RGBA", (width * scale, height * scale), (255, 255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        left = rng.uniform(0.05, 0.3) * width * scale
+        right = rng.uniform(0.6, 0.95) * width * scale
+        for _ in range(rng.randint(2, 5)):
+            points = []
+            x = rng.uniform(left, right)
+            y = rng.uniform(0.3, 0.7) * height * scale
+            for _ in range(rng.randint(15, 40)):
+                x = min(max(x + rng.uniform(-30, 60) * ratio * scale / 4, left), right)
+                y = min(max(y + rng.uniform(-40, 40) * ratio * scale / 4, 0.15 * height * scale), 0.85 * height * scale)
+                points.append((x, y))
+            draw.line(points, fill=(0, 0, 0, 255), width=int(2.5 * ratio * scale), joint="curve")
+        image = image.resize((width, height), Image.LANCZOS)
+        output = BytesIO()
+        image.save(output, format="PNG")
+        corpus.append((f"synthetic_{index:03d}_{css_width}x{css_height}@{ratio}x.png", output.getvalue()))
+    return corpus
+
+
+def load_corpus(directory):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(".png"):
+            with open(os.path.join(directory, name), "rb") as f:
+                corpus.append((name, f.read()))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="署名画像を整える処理のベンチマーク")
+    parser.add_argument("corpus", nargs="?", help="署名画像(PNG)が入ったフォルダ")
+    parser.add_argument("--mode", default="L", choices=["L", "1"])
+    parser.add_argument("--dpi", type=int, default=300)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    before_total = after_total = 0
+    times = []
+    for name, data in corpus:
+        started = time.perf_counter()
+        normalized = normalize_signature(data, dpi=args.dpi, mode=args.mode)
+        times.append((time.perf_counter() - started) * 1000)
+        before_total += len(data)
+        after_total += len(normalized)
+
+    times.sort()
+    print(f"images: {len(corpus)}  mode: {args.mode}  dpi: {args.dpi}")
+    print(f"bytes before: {before_total:,}  after: {after_total:,}  "
+          f"saved: {before_total - after_total:,} ({(1 - after_total / before_total) * 100:.1f}%)")
+    print(f"average per image: {before_total // len(corpus):,} -> {after_total // len(corpus):,} bytes")
+    print(f"time per image (ms): mean {statistics.mean(times):.1f}  "
+          f"p50 {times[len(times) // 2]:.1f}  p95 {times[int(len(times) * 0.95)]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
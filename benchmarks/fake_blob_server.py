@@ -0,0 +1,137 @@
+# --- 手元で動く「にせものの倉庫（Vercel Blob）」 ---
+# 本物の Vercel Blob を使わずに、アップロードやダウンロードを試したり、速さを測ったりするためのサーバーです。
+#   PUT /<名前>  … データを覚えて、{"url": "http://.../<名前>"} を返します
+#   GET /<名前>  … 覚えているデータを返します
+#   POST /delete … {"urls": [...]} で指定したデータを忘れます
+#   GET /?prefix=<名前の始まり> … 覚えているデータの一覧を返します（{"blobs": [{"pathname", "url"}], "hasMore": false}）
+# --delay で返事をわざと遅らせたり、--fail-rate でわざと失敗（503）させたりできるので、
+# タイムアウトやリトライ（やり直し）の動きも確かめられます。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python benchmarks/fake_blob_server.py --port 8787 [--delay 0.2] [--fail-rate 0.3]
+#     BLOB_BASE_URL=http://127.0.0.1:8787 python app.py
+#
+# テストやベンチマークの中からは、start_server() で裏側に立ち上げて使えます。
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class FakeBlobHandler(BaseHTTPRequestHandler):
+    def do_PUT(self):
+        server = self.server
+        with server.lock:
+            server.attempt_count += 1
+        time.sleep(server.delay)
+        if random.random() < server.fail_rate:
+            self.send_error(503)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length)
+        with server.lock:
+            server.objects[self.path] = (self.headers.get("Content-Type", "application/octet-stream"), data)
+            server.put_count += 1
+        body = json.dumps({"url": f"http://{server.server_address[0]}:{server.server_address[1]}{self.path}"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.delay)
+        parts = urlsplit(self.path)
+        if parts.path == "/":
+            self._list(parse_qs(parts.query).get("prefix", [""])[0])
+            return
+        with server.lock:
+            item = server.objects.get(self.path)
+            server.get_count += 1
+        if item is None:
+            self.send_error(404)
+            return
+        content_type, data = item
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _list(self, prefix):
+        server = self.server
+        base_url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+        with server.lock:
+            names = sorted(path[1:] for path in server.objects if path[1:].startswith(prefix))
+        blobs = [{"pathname": name, "url": f"{base_url}/{name}"} for name in names]
+        body = json.dumps({"blobs": blobs, "hasMore": False}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        if self.path != "/delete":
+            self.send_error(404)
+            return
+        time.sleep(server.delay)
+        length = int(self.headers.get("Content-Length", 0))
+        urls = json.loads(self.rfile.read(length)).get("urls", [])
+        prefix = f"http://{server.server_address[0]}:{server.server_address[1]}"
+        with server.lock:
+            for url in urls:
+                server.objects.pop(url[len(prefix):] if url.startswith(prefix) else url, None)
+            server.delete_count += len(urls)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        # 1回ごとのアクセス記録は、ベンチマークの邪魔になるので出しません。
+        pass
+
+
+def start_server(host="127.0.0.1", port=0, delay=0.0, fail_rate=0.0):
+    # にせものの倉庫を裏側のスレッドで立ち上げて、(サーバー, 住所) を返します。
+    # port=0 なら、空いている番号が自動で選ばれます。止めるときは server.shutdown() を呼びます。
+    server = ThreadingHTTPServer((host, port), FakeBlobHandler)
+    server.daemon_threads = True
+    server.objects = {}
+    server.lock = threading.Lock()
+    server.put_count = 0
+    # attempt_count: 失敗したものもふくめて、PUT が届いた回数です。（やり直しの回数を確かめるときに使います）
+    server.attempt_count = 0
+    server.get_count = 0
+    server.delete_count = 0
+    server.delay = delay
+    server.fail_rate = fail_rate
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="手元で動く、にせものの Vercel Blob")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--delay", type=float, default=0.0, help="返事を遅らせる時間（秒）")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="わざと503で失敗させる割合（0〜1）")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.host, args.port, args.delay, args.fail_rate)
+    print(f"Fake Blob server listening on {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
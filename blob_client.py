@@ -0,0 +1,203 @@
+# --- 「インターネット上の倉庫（Vercel Blob）」とやりとりする道具 ---
+# 以前は requests.put() を毎回そのまま呼んでいたので、
+#   ・毎回あたらしく接続し直していた（接続の準備だけで時間がかかる）
+#   ・待ち時間の上限（タイムアウト）が無く、倉庫が遅いといつまでも待っていた
+#   ・一度失敗したら、それでおしまいだった
+# という問題がありました。
+#
+# BlobClient は、
+#   ・1つの「セッション」を使い回して、接続をつなぎっぱなしにします（keep-alive）
+#   ・タイムアウトを決めておきます
+#   ・失敗したら、少しずつ間をあけて（バックオフ）、決まった回数までやり直します（リトライ）
+# UploadQueue は、アップロードを「裏側（別のスレッド）」でやってもらうための順番待ちの列です。
+# ユーザーへの返事（PDFのダウンロード）を先に返して、PDFの保存はあとから終わらせることができます。
+
+import io  # io: メモリの中のデータを「ファイル」のように読むための部品
+import threading  # threading: 同時に来たリクエストが、セッションを同時に作ったりしないようにする「鍵」の道具
+from concurrent.futures import ThreadPoolExecutor  # ThreadPoolExecutor: 仕事を「裏側のスレッド」に任せるための道具
+
+from metrics import span  # metrics: どこに時間がかかっているかを測る道具（このフォルダの中にあります）
+
+# Vercel Blob の住所です。（テストでは、手元の「にせものの倉庫」の住所に置きかえます）
+DEFAULT_BASE_URL = "https://blob.vercel-storage.com"
+
+
+class BlobClient:
+    # timeout: (接続までの待ち時間, 返事までの待ち時間) の上限（秒）
+    # retries: やり直す回数の上限
+    # backoff: やり直すときに待つ時間のもと（秒）。0.5なら 0.5秒、1秒、2秒…と増えていきます
+    # pool_size: つなぎっぱなしにしておく接続の数
+
+    def __init__(self, token, base_url=DEFAULT_BASE_URL, timeout=(5, 30), retries=3, backoff=0.5, pool_size=10):
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        # セッションは、最初に使うときに1回だけ作ります。
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    # requests は読み込むだけで時間がかかるので、倉庫を初めて使うときに読み込みます。
+                    # （ページを見るだけのリクエストでは、読み込まずに済みます）
+                    import requests  # requests: インターネット上のウェブサイトとやりとりする（情報を送ったり、もらったりする）ための道具
+                    from requests.adapters import HTTPAdapter  # HTTPAdapter: 接続の「使い回し」と「やり直し」の設定をする部品
+                    from urllib3.util.retry import Retry  # Retry: 失敗したときに、何回・どのくらい間をあけてやり直すかの設定
+
+                    retry = Retry(
+                        total=self.retries,
+                        backoff_factor=self.backoff,
+                        # 倉庫が混んでいる・調子が悪いときの返事なら、やり直します。
+                        status_forcelist=(429, 500, 502, 503, 504),
+                        # PUT は同じ場所に同じものを置くだけなので、やり直しても大丈夫です。
+                        allowed_methods=frozenset(["GET", "PUT"]),
+                    )
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+                    session = requests.Session()
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def put(self, key, data, content_type):
+        # 倉庫にデータを送って、その「公開URL」を返します。
+        # x-add-random-suffix: 0 … 名前のうしろに、倉庫が勝手に文字を足さないようにします。
+        #   （公開URLの最後が、いつも key のままになります。/generate-pdf では、URLの最後を手元の棚の名前として使うためです）
+        # x-allow-overwrite: 1 … 同じ名前のものがもうあっても、断らずに置きかえます。
+        #   （名前は中身から作っているので、同じ名前なら中身も同じです）
+        headers = {
+            "Authorization": f"Bearer {self.token}",
+            "Content-Type": content_type,
+            "x-add-random-suffix": "0",
+            "x-allow-overwrite": "1",
+        }
+        # bytes 以外（bytearray など）は、コピーせずに少しずつ読み出して送ります。
+        # （開いたファイルは、そのまま少しずつ読んで送ります。大きなまとめファイルでも、メモリに全部は読み込みません）
+        body = data if isinstance(data, bytes) or hasattr(data, "read") else BufferReader(data)
+        with span("blob_put"):
+            response = self.session.put(f"{self.base_url}/{key}", data=body, headers=headers, timeout=self.timeout)
+        response.raise_for_status()
+        public_url = response.json().get("url")
+        if not public_url:
+            raise Exception("Blob upload response did not contain a URL.")
+        return public_url
+
+    def delete(self, urls):
+        # 公開URLのデータを、倉庫から消します。（いくつかまとめて消せます）
+        headers = {"Authorization": f"Bearer {self.token}"}
+        with span("blob_delete"):
+            response = self.session.post(
+                f"{self.base_url}/delete", json={"urls": list(urls)}, headers=headers, timeout=self.timeout
+            )
+            response.raise_for_status()
+
+    def list(self, prefix):
+        # 名前が prefix で始まるものを、倉庫から探します。戻り値は (名前, 公開URL) の並びです。
+        # （倉庫は一度に1000件までしか返さないので、続きがあれば、続きの場所（cursor）を渡して何回か聞きます）
+        headers = {"Authorization": f"Bearer {self.token}"}
+        found, cursor = [], None
+        while True:
+            params = {"prefix": prefix, "limit": 1000}
+            if cursor:
+                params["cursor"] = cursor
+            with span("blob_list"):
+                response = self.session.get(f"{self.base_url}/", params=params, headers=headers, timeout=self.timeout)
+                response.raise_for_status()
+            result = response.json()
+            found.extend((blob["pathname"], blob["url"]) for blob in result.get("blobs", []))
+            cursor = result.get("cursor")
+            if not result.get("hasMore") or not cursor:
+                return found
+
+    def get(self, url):
+        # 公開URLから、データを取ってきます。
+        with span("blob_get"):
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.content
+
+
+class BufferReader(io.RawIOBase):
+    # メモリの中のデータ（bytearray など）を、コピーせずに「ファイル」のように読むための入れ物です。
+    # 同じデータを、ユーザーへの送信と倉庫へのアップロードで同時に読んでも、中身は1つで済みます。
+    # （やり直し（リトライ）のときに最初から読み直せるように、seek と tell も使えます）
+
+    def __init__(self, data):
+        super().__init__()
+        self._view = memoryview(data)
+        self._pos = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, min(offset, len(self._view)))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class UploadQueue:
+    # アップロードを「裏側のスレッド」でやってもらうための順番待ちの列です。
+    # workers: 同時にアップロードするスレッドの数
+    # max_pending: 列に並べておける数の上限（アップロード中のものもふくみます）
+    #   並んでいる仕事は、それぞれPDFをまるごと1つ持っています。倉庫が遅かったり失敗し続けたりしても、
+    #   メモリが増え続けないように、上限をこえた分は並べずに捨てます。（捨てたことは記録（print）します）
+
+    def __init__(self, workers=2, max_pending=32):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blob-upload")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self.dropped = 0
+
+    def submit(self, func, *args, **kwargs):
+        # func(*args, **kwargs) を裏側で実行します。すぐに戻るので、呼んだ側は待たされません。
+        # 列がいっぱいのときは、実行せずに None を返します。
+        if not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            print(f"Background Blob upload queue is full; dropped {getattr(func, '__name__', func)} (total dropped: {self.dropped})")
+            return None
+        try:
+            future = self._executor.submit(func, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        self._slots.release()
+        _report_failure(future)
+
+    def shutdown(self, wait=True):
+        # 残っているアップロードを（wait=True なら全部終わるまで待って）片付けます。
+        self._executor.shutdown(wait=wait)
+
+
+def _report_failure(future):
+    # 裏側での失敗は、ユーザーには見えないので、ここで記録（print）しておきます。
+    error = future.exception()
+    if error is not None:
+        print(f"Error in background Blob upload: {error}")
@@ -0,0 +1,353 @@
+# --- 保存した確認書PDFを、日ごと・月ごとにまとめて取り出す道具（エクスポート） ---
+# /generate-pdf で作ったPDFは、1枚ずつばらばらに倉庫（Vercel Blob）に置かれています。
+# 監査のときに「10月分を全部ください」と言われると、以前は1枚ずつ手でダウンロードしていました。
+#
+# この道具は、記録帳（audit_log.py）の「pdf_stored」の記録から、その日・その月のPDFを探して、
+#   zip: 倉庫から取ってきたPDFを、そのまま1つのZIPファイルにまとめます（中に index.json もつけます）
+#   pdf: 倉庫から取ってきたPDFを、そのままつなげて1つのPDFにまとめ、1人ずつ「しおり（ブックマーク）」をつけます
+#        （PDFのつなぎ合わせには pypdf を使います。作り直さないので、保存したときの確認書とまったく同じです）
+#        つなげ終わるまで全部をメモリに持つので、MAX_MERGED_DOCUMENTS 件までです。それより多いときは zip を使ってください。
+# を作ります。
+#   ・記録帳に「日誌のかけら」の倉庫（journal）があるときは、探す前に、かけらを全部読んで記録帳を作り直します。
+#     Vercel の手元の記録帳（/tmp）には「最後に起動し直してから」の分しかないので、そのまま探すと足りなくなるためです。
+#     （audit_log.py の rebuild_from_journal() を見てください。かけらが読めないときは、欠けたまま作らずにエラーにします）
+#     journal がないときは、手元の記録帳がすべてだと考えて、そのまま探します。
+#   ・--compact でまとめファイルに移したPDFは、倉庫にはもうありません。
+#     記録帳の「pdf_compacted」の記録から、どのまとめファイルに入っているかを調べて、目次（index.json）の
+#     "archived" に、まとめファイルの場所を書きます。（取ってこられなかったもの（"missing"）にはしません）
+#   ・倉庫からのダウンロードは、決まった数のスレッドで同時に進めます（同時に待つのは、その数の2倍まで）
+#   ・ZIPファイルは、取ってきた順に少しずつ書き込むので、全部をメモリにためることはありません
+#   ・--compact をつけると、まとめファイルと目次（index.json）を倉庫に置いてから、
+#     ばらばらのPDFを倉庫から消します（お片付け）。1枚でも取ってこられなかったときは、何も消しません。
+#     まとめファイルの名前には、まとめた日時と当てられない32文字をつけるので、同じ期間を何回まとめても、前のまとめファイルを上書きしません。
+#     記録帳の「日誌のかけら」も、1つにまとめます。（audit_log.py の compact_journal() を見てください）
+#
+# コマンドとして使います（リポジトリのフォルダで実行します）:
+#     python export.py 2025-10 -o confirmations_2025-10.zip
+#     python export.py 2025-10-07 -o confirmations_2025-10-07.pdf --format pdf
+#     python export.py 2025-10 -o confirmations_2025-10.zip --compact
+# 管理者用のページ（/export）からも、同じまとめファイルをダウンロードできます。（app.py を見てください）
+
+import argparse  # argparse: コマンドで渡された設定を読み取るための道具
+import calendar  # calendar: その月が何日まであるかを調べるための道具
+import datetime  # datetime: 日付を扱うための道具
+import io  # io: 取ってきたPDFのデータを、ファイルのように読むための道具
+import json  # json: 記録帳の「そのほかの情報」を読んだり、目次（index.json）を作ったりするための道具
+import os  # os: ファイルの場所を扱うための道具
+import tempfile  # tempfile: 日誌のかけらから作り直した記録帳を、一時的に置いておくための道具
+import uuid  # uuid: まとめファイルに、ほかと重ならない（当てられない）名前をつけるための道具
+import zipfile  # zipfile: 何枚ものPDFを、1つのZIPファイルにまとめる道具
+from collections import deque, namedtuple  # deque: 「頼んだ順番」に結果を取り出すための列 / namedtuple: 名前つきの組
+from concurrent.futures import ThreadPoolExecutor  # ThreadPoolExecutor: ダウンロードを、いくつものスレッドで同時に進める道具
+
+from audit_log import compact_journal, rebuild_from_journal  # audit_log: 記録帳の「日誌のかけら」をまとめたり、読み直したりする道具（このフォルダの中にあります）
+from batch import ChunkWriter, safe_name  # batch: ZIPファイルを少しずつ取り出すための入れ物など（このフォルダの中にあります）
+
+# まとめる1枚分の情報です。
+# archive / entry: --compact でまとめファイルに移したPDFなら、そのまとめファイルの場所と、その中での名前です。（移していなければ None）
+ExportDocument = namedtuple(
+    "ExportDocument",
+    ["pdf_key", "location", "date", "timestamp", "explainer", "lang", "signature_key", "signature_location", "archive", "entry"],
+    defaults=(None, None),
+)
+
+# 記録帳から、一度に探す件数の上限です。（1か月分なら、ふつうは十分です）
+MAX_DOCUMENTS = 100000
+
+# つなげて1つのPDFにする（format=pdf）ときの、件数の上限です。
+MAX_MERGED_DOCUMENTS = 200
+
+
+def period_range(period):
+    # "2025-10" なら ("2025-10-01", "2025-10-31")、"2025-10-07" なら ("2025-10-07", "2025-10-07") を返します。
+    parts = period.split("-")
+    if len(parts) == 2:
+        year, month = int(parts[0]), int(parts[1])
+        last_day = calendar.monthrange(year, month)[1]
+        return datetime.date(year, month, 1).isoformat(), datetime.date(year, month, last_day).isoformat()
+    day = datetime.date.fromisoformat(period)
+    return day.isoformat(), day.isoformat()
+
+
+def find_documents(audit_log, period):
+    # その日・その月に倉庫に保存したPDFを、古い順に探します。
+    # 同じPDF（同じ名前）が何回か保存されていても、1つにまとめます。
+    # まとめファイルに移したPDFには、そのまとめファイルの場所（archive）と、その中での名前（entry）をつけます。
+    # 日誌のかけらがあるときは、かけらから作り直した記録帳で探します。（いちばん上の説明を見てください）
+    since, until = period_range(period)
+    if audit_log.journal is None:
+        return _find_documents(audit_log, since, until)
+    with tempfile.TemporaryDirectory(prefix="export-") as directory:
+        history = rebuild_from_journal(audit_log, os.path.join(directory, "audit.sqlite3"))
+        try:
+            return _find_documents(history, since, until)
+        finally:
+            history.close()
+
+
+def _find_documents(audit_log, since, until):
+    compacted = {}
+    for row in audit_log.find(event="pdf_compacted", since=since, until=until, limit=MAX_DOCUMENTS):
+        # 新しい順に並んでいるので、何回かまとめ直したときは、いちばん新しいまとめファイルを使います。
+        if row["pdf_key"] not in compacted and row["extra"]:
+            compacted[row["pdf_key"]] = json.loads(row["extra"])
+    rows = audit_log.find(event="pdf_stored", since=since, until=until, limit=MAX_DOCUMENTS)
+    documents = {}
+    for row in reversed(rows):
+        extra = json.loads(row["extra"]) if row["extra"] else {}
+        if row["pdf_key"] in documents or not extra.get("location"):
+            continue
+        archived = compacted.get(row["pdf_key"], {})
+        documents[row["pdf_key"]] = ExportDocument(
+            row["pdf_key"],
+            extra["location"],
+            row["date"],
+            row["timestamp"],
+            row["explainer"],
+            row["lang"],
+            row["signature_key"],
+            extra.get("signature_location"),
+            archived.get("archive"),
+            archived.get("entry"),
+        )
+    return list(documents.values())
+
+
+def iter_downloads(items, fetch, workers=4):
+    # items を1つずつ fetch() で取ってきて、(item, データ) を items と同じ順番で返します。
+    # 同時に待つのは workers の2倍までなので、どれだけ多くても、メモリにたまるのはその分だけです。
+    # 取ってこられなかったものは、データを None にして返します。（そこで止めずに、残りを続けます）
+    def safe_fetch(item):
+        try:
+            return fetch(item)
+        except Exception as e:
+            print(f"Error downloading {item}: {e}")
+            return None
+
+    window = workers * 2
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export-download") as executor:
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(safe_fetch, item)))
+            if len(pending) >= window:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+
+def entry_name(document):
+    # ZIPファイルの中での名前です。例: "2025-10-07/vi_PHAM_VAN_THINH_confirmation_3f2a...pdf"
+    return f"{document.date}/{safe_name(document.lang)}_{safe_name(document.explainer)}_{document.pdf_key}"
+
+
+def outline_title(document):
+    # まとめたPDFの「しおり」に出す名前です。例: "2025-10-07 15:30:00 vi PHAM VAN THINH"
+    return f"{document.timestamp.replace('T', ' ')} {document.lang} {document.explainer}"
+
+
+def index_entry(document, name=None):
+    # 目次（index.json）の1行分です。
+    entry = dict(document._asdict())
+    if name:
+        entry["entry"] = name
+    return entry
+
+
+def split_archived(documents):
+    # まだ倉庫にあるPDFと、まとめファイルに移したPDF（目次に書く分）に分けます。
+    stored = [document for document in documents if not document.archive]
+    archived = [index_entry(document) for document in documents if document.archive]
+    return stored, archived
+
+
+def write_zip(documents, fetch, output, workers=4):
+    # PDFを倉庫から取ってきて、取ってきた順に output（ファイルなど）にZIPとして書き込みます。
+    # 戻り値は (目次, 取ってこられなかったもの, まとめファイルに移したもの) です。
+    # 3つとも、ZIPの最後に index.json としても入れます。
+    documents, archived = split_archived(documents)
+    index, missing = [], []
+    # PDFはもともと圧縮されているので、ZIPではもう一度圧縮せずに、そのまま入れます。
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as archive:
+        for document, data in iter_downloads(documents, fetch, workers):
+            if data is None:
+                missing.append(index_entry(document))
+                continue
+            name = entry_name(document)
+            archive.writestr(name, data)
+            index.append(index_entry(document, name))
+            yield
+        archive.writestr(
+            "index.json",
+            json.dumps({"documents": index, "missing": missing, "archived": archived}, ensure_ascii=False, indent=2),
+            compress_type=zipfile.ZIP_DEFLATED,
+        )
+    return index, missing, archived
+
+
+def stream_zip(documents, fetch, workers=4):
+    # ZIPファイルのデータを、できた部分から少しずつ（bytesのかたまりで）返します。（/export で使います）
+    buffer = ChunkWriter()
+    for _ in write_zip(documents, fetch, buffer, workers):
+        yield buffer.drain()
+    yield buffer.drain()
+
+
+def check_merged(documents):
+    # つなげて1つのPDFにできる件数かを調べます。多すぎるときは ValueError です。（まとめファイルに移した分は数えません）
+    count = sum(1 for document in documents if not document.archive)
+    if count > MAX_MERGED_DOCUMENTS:
+        raise ValueError(f"{count} documents is too many to merge into one PDF (max {MAX_MERGED_DOCUMENTS}); use the zip format.")
+
+
+def write_merged(documents, fetch, output, workers=4):
+    # 倉庫から取ってきたPDFを、そのままつなげて1つのPDFにして、output（ファイルなど）に書き込みます。
+    # 1人分ごとに「しおり」をつけます。戻り値は write_zip と同じ (目次, 取ってこられなかったもの, まとめファイルに移したもの) です。
+    # （つなげたPDFは、最後に1回で書き出すので、それまでは1人分ずつの中身をメモリに持っておきます。
+    #   そのため、MAX_MERGED_DOCUMENTS 件までにしています。書き出す先は、ファイルにしてください）
+    from pypdf import PdfWriter  # pypdf: PDFをつなぎ合わせる道具（使うときにだけ読み込みます）
+
+    check_merged(documents)
+    documents, archived = split_archived(documents)
+    index, missing = [], []
+    writer = PdfWriter()
+    for document, data in iter_downloads(documents, fetch, workers):
+        if data is None:
+            missing.append(index_entry(document))
+            continue
+        try:
+            writer.append(io.BytesIO(data), outline_item=outline_title(document), import_outline=False)
+        except Exception as e:
+            # 壊れたPDFがあっても、そこで止めずに、残りを続けます。
+            print(f"Error merging {document.pdf_key}: {e}")
+            missing.append(index_entry(document))
+            continue
+        index.append(index_entry(document))
+    if index:
+        writer.write(output)
+    writer.close()
+    return index, missing, archived
+
+
+def iter_file(f, chunk_size=64 * 1024):
+    # ファイルの中身を、はじめから64KBずつ返します。最後まで返したら、ファイルを閉じます。（/export で使います）
+    try:
+        f.seek(0)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+def new_archive_key(period):
+    # まとめファイルの名前です。例: "archive_2025-10_20251101_093000_<32文字>.zip"
+    # まとめるたびに名前が変わるので、同じ期間をもう一度まとめても、前のまとめファイルは上書きしません。
+    return f"archive_{period}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex}.zip"
+
+
+def compact(backend, audit_log, archive_path, archive_key, index, missing, period):
+    # まとめファイルと目次を倉庫に置いてから、ばらばらのPDFを倉庫から消します。
+    # 戻り値は (まとめファイルの場所, 目次の場所) です。
+    if missing:
+        raise Exception(f"{len(missing)} documents could not be downloaded; nothing was deleted.")
+    if not index:
+        raise Exception("No stored documents to compact; nothing was deleted.")
+    # 倉庫への送信は上書きしてしまうので、同じ名前のまとめファイルがもうあるときは、置かずに止めます。
+    # （前のまとめファイルに入っているPDFは、もう倉庫から消してあるので、上書きすると二度と取り出せません）
+    if backend.list(archive_key):
+        raise Exception(f"{archive_key} already exists; nothing was deleted.")
+    with open(archive_path, "rb") as f:
+        archive_location = backend.put(archive_key, f, "application/zip")
+    index_key = os.path.splitext(archive_key)[0] + ".index.json"
+    index_data = json.dumps({"archive": archive_location, "documents": index}, ensure_ascii=False, indent=2)
+    index_location = backend.put(index_key, index_data.encode("utf-8"), "application/json")
+    # 消す前に、どのPDFをどのまとめファイルに移したかを、記録帳に1枚ずつ書いておきます。
+    # （次にその期間をまとめるときは、この記録から、まとめファイルの場所を目次に書きます）
+    # 記録の日時は、もとの「pdf_stored」と同じにして、同じ期間で探せるようにします。まとめた日時は extra に入れます。
+    compacted_at = datetime.datetime.now().isoformat(timespec="seconds")
+    for entry in index:
+        audit_log.record(
+            "pdf_compacted",
+            timestamp=datetime.datetime.fromisoformat(entry["timestamp"]),
+            lang=entry["lang"],
+            explainer=entry["explainer"],
+            signature_key=entry["signature_key"],
+            pdf_key=entry["pdf_key"],
+            extra={"archive": archive_location, "entry": entry["entry"], "index": index_location, "compacted_at": compacted_at},
+        )
+    audit_log.record(
+        "compact",
+        extra={"period": period, "archive": archive_location, "index": index_location, "documents": len(index)},
+    )
+    audit_log.flush()
+    # まとめファイルと目次が、ちゃんと置けて、記録も書けてから消します。
+    for entry in index:
+        backend.delete(entry["pdf_key"], entry["location"])
+    # 日誌のかけらも、1つにまとめておきます。（今書いた「pdf_compacted」の記録も、いっしょに入ります）
+    if audit_log.journal is not None:
+        compact_journal(audit_log)
+    return archive_location, index_location
+
+
+def main():
+    parser = argparse.ArgumentParser(description="保存した確認書PDFを、日ごと・月ごとにまとめます。")
+    parser.add_argument("period", help="まとめる期間（例: 2025-10 なら10月分、2025-10-07 ならその日の分）")
+    parser.add_argument("-o", "--output", required=True, help="作ったファイルの保存先")
+    parser.add_argument("--format", choices=["zip", "pdf"], default="zip", help="zip: PDFをそのままZIPに / pdf: PDFをつなげて1つのPDFに")
+    parser.add_argument("--workers", type=int, default=4, help="同時にダウンロードする数")
+    parser.add_argument("--compact", action="store_true", help="まとめたあと、ばらばらのPDFを倉庫から消す（zip のときだけ）")
+    args = parser.parse_args()
+
+    from app import audit_log, pdf_store
+
+    try:
+        documents = find_documents(audit_log, args.period)
+    except Exception as e:
+        # 期間の書き方がまちがっているときや、日誌のかけらから記録帳を作り直せなかったときです。
+        print(f"Error finding documents for {args.period}: {e}")
+        return
+    if not documents:
+        print(f"No stored PDFs found for {args.period}")
+        return
+    if args.format == "pdf":
+        try:
+            check_merged(documents)
+        except ValueError as e:
+            print(e)
+            return
+
+    def fetch(document):
+        return pdf_store.backend.get(document.pdf_key, document.location)
+
+    with open(args.output, "wb") as f:
+        if args.format == "pdf":
+            index, missing, archived = write_merged(documents, fetch, f, args.workers)
+        else:
+            writer = write_zip(documents, fetch, f, args.workers)
+            # write_zip は1枚書くごとに止まるので、最後まで進めて、戻り値（目次など）を受け取ります。
+            try:
+                while True:
+                    next(writer)
+            except StopIteration as stop:
+                index, missing, archived = stop.value
+    print(f"{len(index)} confirmations -> {args.output} ({len(missing)} missing, {len(archived)} already archived)")
+    for archive in dict.fromkeys(entry["archive"] for entry in archived):
+        print(f"  already archived in {archive}")
+
+    if args.compact and args.format == "zip":
+        if not index:
+            print("Nothing left to compact.")
+            return
+        archive_location, index_location = compact(
+            pdf_store.backend, audit_log, args.output, new_archive_key(args.period), index, missing, args.period
+        )
+        print(f"archive -> {archive_location}, index -> {index_location}; {len(index)} individual PDFs deleted")
+
+
+# このファイルを直接実行したとき（python export.py）だけ、コマンドとして動きます。
+if __name__ == "__main__":
+    main()
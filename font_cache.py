@@ -0,0 +1,104 @@
+# --- 「フォントの読み込み」を1回で済ませるための道具 ---
+# 日本語フォント（NotoSansJP）は数MBもある大きなファイルで、
+# 読み込んで「どの文字がどの形か」を調べる（解析する）のに時間がかかります。
+# 以前は PDF を1枚作るたびに pdf.add_font() でこれを最初からやり直していました。
+#
+# この道具では、
+#   1. フォントファイルの中身と解析結果を、プログラム（ワーカー）ごとに1回だけ作って覚えておき、
+#   2. PDFを作るときは、その「コピー」を渡すだけにします。
+# さらに、確認書で実際に使う文字だけを取り出した「小さいフォント（サブセットフォント）」を
+# あらかじめ作っておけば、読み込みもPDFへの埋め込みもずっと軽くなります。
+#
+# サブセットフォントの作り方（フォルダの中で実行します）:
+#     python font_cache.py
+
+import copy  # copy: 覚えておいたフォントの「コピー」を作るための道具
+import os  # os: ファイルの大きさを調べるための道具
+import threading  # threading: 同時に来たリクエストで、フォントを二重に読み込まないための「鍵」の道具
+from io import BytesIO  # BytesIO: メモリの中のデータを「ファイル」のように扱うための道具
+
+from fontTools import subset as ftsubset  # fontTools: フォントファイルを読んだり、必要な文字だけ取り出したりする道具（fpdf2と一緒に入ります）
+from fontTools import ttLib
+from fpdf.fonts import SubsetMap, TTFFont  # fpdf: PDFの中でフォントを扱うための部品
+
+# 読み込んだフォントを、ファイルの場所ごとに覚えておく場所です。
+# 中身は (フォントファイルのデータ, 解析済みのフォント) の組です。
+_fonts = {}
+_fonts_lock = threading.Lock()
+
+
+def _load(font_file):
+    # フォントファイルを読み込み、解析します。（ここが重い処理です）
+    with open(font_file, "rb") as f:
+        font_bytes = f.read()
+    # fpdf の TTFFont は「PDF」を必要とするので、解析用の小さなPDFを1つだけ作って使います。
+    from fpdf import FPDF
+
+    prototype = TTFFont(FPDF(), font_file, "", "")
+    return font_bytes, prototype
+
+
+def get_font(font_file):
+    # 覚えておいたフォントを取り出します。まだなら、ここで1回だけ読み込みます。
+    cached = _fonts.get(font_file)
+    if cached is None:
+        with _fonts_lock:
+            cached = _fonts.get(font_file)
+            if cached is None:
+                cached = _load(font_file)
+                _fonts[font_file] = cached
+    return cached
+
+
+def add_cached_font(pdf, family, font_file, style=""):
+    # pdf.add_font() の代わりに使います。
+    # 解析済みのフォントをコピーして、このPDF専用のフォントとして登録します。
+    font_bytes, prototype = get_font(font_file)
+    fontkey = f"{family.lower()}{style}"
+
+    font = copy.copy(prototype)
+    font.i = len(pdf.fonts) + 1
+    font.fontkey = fontkey
+    # PDFを完成させる（pdf.output()）ときに、fpdf はフォントを「使った文字だけ」に書き換えてしまいます。
+    # なので、フォント本体だけは、覚えておいたデータ（メモリの中）から毎回新しく開きます。
+    # （ファイルを開き直すのとちがい、中身は使うときに少しずつしか読み込まれないので軽い処理です）
+    font.ttfont = ttLib.TTFont(BytesIO(font_bytes), recalcTimestamp=False, fontNumber=0, lazy=True)
+    # 「このPDFで使った文字のリスト」も、PDFごとに新しく用意します。（TTFFont の中と同じ作り方です）
+    font.missing_glyphs = []
+    sbarr = "\x00 \r\n"
+    if pdf.str_alias_nb_pages:
+        sbarr += "0123456789"
+        sbarr += pdf.str_alias_nb_pages
+    font.subset = SubsetMap(font, [ord(char) for char in sbarr])
+
+    pdf.fonts[fontkey] = font
+    return font
+
+
+def covers(font_file, text):
+    # このフォントで、text の文字を全部書けるかどうかを調べます。
+    _, prototype = get_font(font_file)
+    return all(ord(char) in prototype.cmap for char in text if not char.isspace())
+
+
+def build_subset(font_file, output_file, text):
+    # text に出てくる文字だけが入った、小さいフォントファイルを作ります。
+    font = ttLib.TTFont(font_file, recalcTimestamp=False, fontNumber=0)
+    options = ftsubset.Options(notdef_outline=True, recommended_glyphs=True)
+    # PDFの中では使わない情報は、ここで捨ててしまいます。（fpdf がPDFに埋め込むときと同じ設定です）
+    options.drop_tables += ["FFTM", "GDEF", "GPOS", "GSUB", "MATH", "hdmx", "meta"]
+    subsetter = ftsubset.Subsetter(options)
+    subsetter.populate(text="".join(sorted(set(text))))
+    subsetter.subset(font)
+    font.save(output_file)
+    font.close()
+
+
+# このファイルを直接実行したとき（python font_cache.py）は、サブセットフォントを作ります。
+if __name__ == "__main__":
+    from app import FONT_FILE, FONT_SUBSET_FILE, subset_text
+
+    build_subset(FONT_FILE, FONT_SUBSET_FILE, subset_text())
+    before = os.path.getsize(FONT_FILE)
+    after = os.path.getsize(FONT_SUBSET_FILE)
+    print(f"{FONT_SUBSET_FILE}: {before:,} bytes -> {after:,} bytes")
@@ -0,0 +1,134 @@
+# --- 「どこに時間がかかっているか」を測る道具 ---
+# 署名の送信やPDFの作成が遅いとき、それが
+#   base64を元に戻すところか、倉庫（Vercel Blob）への保存・取り出しか、
+#   署名画像を整えるところ（PIL）か、フォントの準備か、PDFのレイアウトや書き出し（pdf.output()）か
+# が分からないと、直しようがありません。
+#
+# そこで、
+#   ・ページ（ルート）ごとに、返事をするまでにかかった時間
+#   ・処理の「段階（ステージ）」ごとにかかった時間（with span("段階の名前"): で囲んだところ）
+# を測って覚えておき、
+#   ・/metrics … Prometheus（測った数字を集めてグラフにする道具）が読める形で見せます
+#   ・1回のリクエストごとに、1行のJSONとして記録（print）します（Vercelのログで検索できます）
+#
+# 数字はプロセスごとに覚えています。（gunicorn で何プロセスも動かしているときは、プロセスごとの数字になります）
+
+import json  # json: 1回ごとの記録を、1行の文字（JSON）にするための道具
+import threading  # threading: 同時に来たリクエストが、数字を同時に書きかえて壊さないようにする「鍵」の道具
+import time  # time: かかった時間を測るための道具
+from contextlib import contextmanager  # contextmanager: 「with span(...):」の形で使える道具を作るための部品
+
+from flask import g, has_request_context, request  # flask: 今のリクエストの情報を見たり、覚えておいたりする道具
+
+# かかった時間（秒）を数える「目盛り」です。（Prometheus のヒストグラムの le= に当たります）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    # かかった時間を、目盛りごとに数えておく入れ物です。
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += seconds
+        self.count += 1
+
+    def lines(self, name, labels):
+        # Prometheus の形（目盛りごとに「ここまでに何回」を積み上げた数）で書き出します。
+        label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+        prefix = label_text + "," if label_text else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{label_text}}} {self.sum:.6f}"
+        yield f"{name}_count{{{label_text}}} {self.count}"
+
+
+class Metrics:
+    # ページごと・段階ごとのヒストグラムをまとめて覚えておく場所です。
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._stages = {}
+
+    def observe_request(self, route, method, status, seconds):
+        with self._lock:
+            key = (("route", route), ("method", method), ("status", str(status)))
+            self._requests.setdefault(key, Histogram()).observe(seconds)
+
+    def observe_stage(self, stage, seconds):
+        with self._lock:
+            self._stages.setdefault((("stage", stage),), Histogram()).observe(seconds)
+
+    def render(self):
+        # /metrics で返す文字（Prometheus のテキスト形式）を作ります。
+        lines = []
+        with self._lock:
+            for name, help_text, histograms in (
+                ("app_request_duration_seconds", "Time spent handling a request, by route.", self._requests),
+                ("app_stage_duration_seconds", "Time spent in each stage of the hot path.", self._stages),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(histograms.items()):
+                    lines.extend(histogram.lines(name, labels))
+        return "\n".join(lines) + "\n"
+
+
+# このプロセスの数字を覚えておく場所です。（どこからでも同じものを使います）
+metrics = Metrics()
+
+
+@contextmanager
+def span(stage):
+    # with span("段階の名前"): で囲んだ部分にかかった時間を測ります。
+    # リクエストの中なら、そのリクエストの記録（1行のJSON）にも書き足します。
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        metrics.observe_stage(stage, seconds)
+        if has_request_context():
+            spans = g.setdefault("spans", {})
+            spans[stage] = spans.get(stage, 0.0) + seconds
+
+
+def init_app(app, log=True):
+    # Flask のアプリに、「リクエストの前後で時間を測る」しかけを取りつけます。
+    # log: True なら、1回のリクエストごとに1行のJSONを記録（print）します。
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        # （PDFやZIPを少しずつ送るページでは、送り終わるまでではなく、送り始めるまでの時間になります）
+        started = g.get("request_started")
+        if started is None:
+            return response
+        seconds = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.observe_request(route, request.method, response.status_code, seconds)
+        if log:
+            print(json.dumps({
+                "event": "request",
+                "route": route,
+                "method": request.method,
+                "status": response.status_code,
+                "duration_ms": round(seconds * 1000, 2),
+                "spans_ms": {stage: round(value * 1000, 2) for stage, value in g.get("spans", {}).items()},
+            }, ensure_ascii=False))
+        return response
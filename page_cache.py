@@ -0,0 +1,130 @@
+# --- 「できあがったページ」を覚えておく道具 ---
+# 言語選択ページや、各言語のガイダンスページの中身は、いつ誰が開いても同じです。
+# （変わるのは合言葉だけですが、合言葉はいつも SECRET_TOKEN と同じなので、結局いつも同じになります）
+# そこで、ページは起動時に1回だけ作って（HTMLにして）覚えておき、
+#   ・あらかじめ gzip / brotli で小さく縮めたものも用意しておく
+#   ・ページごとに「指紋（ETag）」をつけておき、ブラウザが「前にもらったページと同じ？」と
+#     聞いてきたら（If-None-Match）、中身を送らずに「同じです（304）」とだけ答える
+# ようにします。回線の遅いスマートフォンでも、ページがすぐに表示されるようになります。
+
+import gzip  # gzip: データを小さく縮める（圧縮する）道具
+import hashlib  # hashlib: データから「指紋（ハッシュ）」を作る道具
+import os  # os: 保存ファイルがあるかどうかを調べたり、置きかえたりするための道具
+import pickle  # pickle: 作ったページを、そのままファイルに保存したり、読み込んだりする道具
+
+from flask import Response, request  # flask: ブラウザへの返事を作ったり、ブラウザからの情報を見たりする道具
+
+# brotli: gzip よりもさらに小さく縮められる道具です。
+# 入っていなければ（pip install brotli していなければ）、gzip だけを使います。
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ページの「保存のしかた」の指示です。
+# no-cache は「保存してもいいけど、使う前に毎回 ETag で確かめてね」という意味です。
+PAGE_CACHE_CONTROL = "private, no-cache"
+
+
+class CachedPage:
+    # 1つのページの、縮めていないもの・gzip・brotli の3種類と、それぞれの指紋（ETag）を覚えておきます。
+
+    def __init__(self, html, mimetype="text/html"):
+        body = html.encode("utf-8")
+        self.mimetype = mimetype
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        # 縮め方ごとに中身がちがうので、指紋も縮め方ごとに変えておきます。
+        self.variants = {"identity": (body, digest)}
+        self.variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f"{digest}-gz")
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body, quality=11), f"{digest}-br")
+
+    def response(self):
+        # 今のリクエストに合わせた返事を作ります。
+        encoding = choose_encoding(self.variants)
+        body, etag = self.variants[encoding]
+        # ブラウザが持っているページと同じなら、中身は送らずに「304（同じです）」と答えます。
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=self.mimetype)
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = PAGE_CACHE_CONTROL
+        # 「縮め方によって中身が変わります」と、途中のキャッシュ（保存する仕組み）に伝えておきます。
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+def choose_encoding(variants):
+    # ブラウザが受け取れる縮め方（Accept-Encoding）の中から、いちばん小さくなるものを選びます。
+    accepted = request.accept_encodings
+    for encoding in ("br", "gzip"):
+        if encoding in variants and accepted[encoding] > 0:
+            return encoding
+    return "identity"
+
+
+def conditional_response(html, mimetype="text/html"):
+    # 毎回中身が変わるページ用です。縮めたりはせず、指紋（ETag）だけつけて、
+    # ブラウザが持っているものと同じなら「304」と答えます。
+    response = Response(html, mimetype=mimetype)
+    response.add_etag()
+    response.headers["Cache-Control"] = PAGE_CACHE_CONTROL
+    return response.make_conditional(request)
+
+
+# --- 作ったページを「スナップショット」として保存しておく ---
+# ページを作る（テンプレートを読んでHTMLにして、gzip / brotli で縮める）のは、起動のたびにやると時間がかかります。
+# Vercel のように、しばらく使われないとプログラムが止まり、次のアクセスでまた起動する（コールドスタート）ところでは、
+# そのたびに最初の人が待たされてしまいます。
+# そこで、デプロイの前に1回だけページを作ってファイルに保存しておき、起動時にはそれを読み込むだけにします。
+#
+# 作り方（リポジトリのフォルダで、本番と同じ SECRET_TOKEN を設定して実行します）:
+#     python page_cache.py
+# テンプレートや翻訳データを変えたときは、作り直してください。（作り直さなくても、古いものは使われません）
+#
+# デプロイの手順:
+# page_snapshot.pickle には合言葉（SECRET_TOKEN）が入るので、Git には入れていません（.gitignore）。
+# また、vercel.json の @vercel/python は、デプロイのときにコマンドを実行してくれません。
+# そのため、GitHub から自動でデプロイすると、スナップショットの無いまま動きます。（起動のたびにページを作るので、遅くなります）
+# スナップショットつきでデプロイするときは、手元で作ってから、Vercel のコマンドでアップロードします。
+# （vercel コマンドでアップロードするファイルは .vercelignore で決めていて、そこには page_snapshot.pickle を書いていません）
+#     SECRET_TOKEN=本番の合言葉 python page_cache.py
+#     vercel deploy --prod
+# スナップショットが無いときや古いときは、起動時にその旨を記録（print）するので、ログで確かめられます。
+
+
+def save_snapshot(path, fingerprint, pages):
+    # 作ったページを、材料の「指紋」といっしょにファイルに保存します。
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as f:
+        pickle.dump((fingerprint, pages), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+def load_snapshot(path, fingerprint):
+    # 保存しておいたページを読み込みます。
+    # ファイルが無いときや、材料が変わっていて指紋がちがうときは None を返します。（そのときは、ページを作り直します）
+    if not os.path.exists(path):
+        print(f"Page snapshot {path} not found; rendering pages at startup. (Run `python page_cache.py` before deploying.)")
+        return None
+    try:
+        with open(path, "rb") as f:
+            saved_fingerprint, pages = pickle.load(f)
+    except Exception as e:
+        print(f"Error loading page snapshot: {e}")
+        return None
+    if saved_fingerprint != fingerprint:
+        print(f"Page snapshot {path} is out of date; rendering pages at startup. (Run `python page_cache.py` before deploying.)")
+        return None
+    return pages
+
+
+# このファイルを直接実行したとき（python page_cache.py）は、スナップショットを作ります。
+if __name__ == "__main__":
+    from app import PAGE_SNAPSHOT_PATH, page_fingerprint, prerender_pages
+
+    save_snapshot(PAGE_SNAPSHOT_PATH, page_fingerprint(), prerender_pages())
+    print(f"{PAGE_SNAPSHOT_PATH}: {os.path.getsize(PAGE_SNAPSHOT_PATH):,} bytes")
@@ -0,0 +1,228 @@
+# --- 「確認書PDFのひな形（テンプレート）」を作る道具 ---
+# 事前ガイダンスの確認書は、毎回ほとんど同じ見た目です。
+# 毎回ちがうのは「日付」「説明者の名前」「署名画像」の3つだけです。
+#
+# そこで、変わらない部分（固定部分）は、プログラムが起動してから「最初の1回だけ」描いて、
+# その結果（PDFの描画命令）を覚えておきます（これを「キャッシュ」と呼びます）。
+# リクエストのたびに、覚えておいた固定部分をそのまま貼り付けて、
+# 変わる部分だけを上から書き足す（スタンプする）ことで、毎回のレイアウト計算を省きます。
+
+import threading  # threading: 複数のリクエストが同時に来ても、ひな形作りが1回で済むようにする「鍵」の道具
+from io import BytesIO  # BytesIO: 署名画像のデータを「ファイル」のように fpdf に渡すための道具
+
+from fpdf import FPDF  # fpdf: PDFファイルを作成するための専門的な道具
+
+from font_cache import add_cached_font  # font_cache: フォントを1回だけ読み込んで使い回す道具（このフォルダの中にあります）
+from metrics import span  # metrics: どこに時間がかかっているかを測る道具（このフォルダの中にあります）
+from signature_vector import draw_strokes, is_vector_signature  # signature_vector: 署名を「線のデータ」として描く道具（このフォルダの中にあります）
+
+# PDFの中で使うフォントの呼び名です。
+FONT_FAMILY = "NotoSansJP"
+
+# PDFに書く「固定の文章」です。
+FORM_NUMBER = "参考様式第５－９号"
+FORM_TITLE = "事 前 ガ イ ダ ン ス の 確 認 書"
+ORGANIZATION_LABEL = "特定技能所属機関（又は登録支援機関）の氏名又は名称"
+ORGANIZATION_NAME = "レバレジーズオフィスサポート株式会社"
+EXPLAINER_LABEL = "説明者の氏名"
+SIGNATURE_LABEL = "特定技能外国人の署名"
+# 確認項目と最後の確認文は、ガイダンスページと同じものを data/japanese.json から読み込んで、
+# TemplateText（registry.py）として渡してもらいます。
+
+# 日付の文字に使われる文字（数字と「年月日時分」など）です。
+# 日付は毎日変わるので、あらかじめ全部の数字をフォントの「使う文字リスト」に入れておきます。
+DATE_CHARS = "0123456789年月日時分からまで "
+
+# 下線の長さや、字下げの幅（単位はmm）
+UNDERLINE_LENGTH = 80
+INDENT = 70
+
+
+def template_chars(text):
+    # 確認書に出てくる文字を、いつも同じ順番で、重なりなく並べたものを返します。
+    # text は、registry.py の TemplateText（確認項目・最後の確認文・説明者の名前の文字）です。
+    static_text = "".join(
+        [FORM_NUMBER, FORM_TITLE, "について、", ORGANIZATION_LABEL, ORGANIZATION_NAME,
+         EXPLAINER_LABEL, "から説明を受け、内容を十分に理解しました。", text.final_confirmation, SIGNATURE_LABEL]
+        + [number + item for number, item in text.items]
+    )
+    return "".join(dict.fromkeys(static_text + DATE_CHARS + text.extra_chars))
+
+
+def format_guidance_datetime(today):
+    # 文字列内の全角スペースを半角2スペースに修正
+    return f"{today.year}年{today.month}月{today.day}日  13時00分から16時00分まで"
+
+
+def format_signature_date(today):
+    return f"{today.year}年{today.month}月{today.day}日"
+
+
+class ConfirmationTemplate:
+    # 確認書の「ひな形」です。
+    # 作るとき（__init__）に固定部分を1回だけ描いて、その描画命令と「変わる部分を書く場所（座標）」を覚えます。
+
+    def __init__(self, font_file, text):
+        self.font_file = font_file
+        self.text = text
+
+        # フォントの「使う文字リスト」に登録する順番を、毎回まったく同じにしておきます。
+        # （PDFの中では、文字はこの登録順の番号で書かれるので、順番がそろっていれば
+        #   覚えておいた描画命令を、新しいPDFにそのまま貼り付けても正しく表示されます）
+        self.char_order = template_chars(text)
+
+        pdf = self._new_document()
+        # ここから後に書き込まれた描画命令が「固定部分」です。
+        start = len(pdf.pages[pdf.page].contents)
+        self._draw_static(pdf)
+        self.base_stream = bytes(pdf.pages[pdf.page].contents[start:])
+
+        # 日付の文字の幅を、1文字ずつ前もって測っておきます。（サイズ11の文字で、単位はmm）
+        # 日付の文字は DATE_CHARS の中の文字だけなので、足し算するだけで、ガイダンスの日時の幅が分かります。
+        pdf.set_font(FONT_FAMILY, "", 11)
+        self.date_char_widths = {char: pdf.get_string_width(char) for char in DATE_CHARS}
+
+    def _new_document(self):
+        pdf = FPDF()
+        pdf.add_page()
+        # フォントは、読み込み済みのものをコピーして使います。（くわしくは font_cache.py を見てください）
+        font = add_cached_font(pdf, FONT_FAMILY, self.font_file)
+        # 決まった順番で、文字をフォントの「使う文字リスト」に登録します。
+        for char in self.char_order:
+            font.subset.pick(ord(char))
+        return pdf
+
+    def _draw_static(self, pdf):
+        # --- 固定部分のレイアウト ---
+        # （元々 generate_pdf の中で毎回やっていた「お絵かき」と同じ手順です。
+        #   変わる部分のところでは、何も書かずに「場所」だけを覚えておきます）
+        pdf.set_font(FONT_FAMILY, "", 10)
+        pdf.set_xy(pdf.l_margin, 10)
+        pdf.cell(0, 10, FORM_NUMBER, align="L")
+
+        pdf.set_xy(0, 25)
+        pdf.set_font(FONT_FAMILY, "", 16)
+        pdf.cell(0, 10, FORM_TITLE, new_x="LMARGIN", new_y="NEXT", align="C")
+
+        pdf.ln(12)
+        pdf.set_font(FONT_FAMILY, "", 10.5)
+
+        initial_x = pdf.get_x()
+        for number, item in self.text.items:
+            pdf.set_x(initial_x)
+            pdf.cell(8, 5, number, align="L")
+            pdf.multi_cell(pdf.w - pdf.l_margin - pdf.r_margin - 8, 5, item, new_x="LMARGIN", new_y="NEXT")
+            pdf.ln(1)
+
+        pdf.set_font_size(11)
+        pdf.ln(8)
+        pdf.multi_cell(0, 8, "について、")
+        pdf.ln(1)
+        # 【変わる部分①】ガイダンスの日時を書く場所（Y座標）を覚えて、1行分（8mm）空けておきます。
+        self.datetime_y = pdf.get_y()
+        pdf.set_y(self.datetime_y + 8)
+        pdf.ln(4)
+        pdf.cell(0, 8, ORGANIZATION_LABEL, new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(1)
+        pdf.set_x(pdf.l_margin + INDENT)
+        pdf.cell(UNDERLINE_LENGTH, 8, ORGANIZATION_NAME, new_x="LMARGIN", new_y="NEXT")
+        y_pos = pdf.get_y()
+        pdf.line(pdf.l_margin + INDENT, y_pos - 1, pdf.l_margin + INDENT + UNDERLINE_LENGTH, y_pos - 1)
+        pdf.ln(4)
+        pdf.cell(0, 8, EXPLAINER_LABEL, new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(1)
+        # 【変わる部分②】説明者の名前を書く場所です。下線は長さが決まっているので、先に引いておきます。
+        self.explainer_y = pdf.get_y()
+        pdf.set_y(self.explainer_y + 8)
+        y_pos = pdf.get_y()
+        pdf.line(pdf.l_margin + INDENT, y_pos - 1, pdf.l_margin + INDENT + UNDERLINE_LENGTH, y_pos - 1)
+        pdf.ln(4)
+        pdf.multi_cell(0, 8, "から説明を受け、内容を十分に理解しました。")
+        pdf.ln(2)
+        pdf.multi_cell(0, 8, self.text.final_confirmation)
+
+        # 署名欄のレイアウト
+        self.sig_y_pos = pdf.h - 35  # ページの下から35mmの位置
+        pdf.set_y(self.sig_y_pos)
+        pdf.cell(45, 8, SIGNATURE_LABEL)
+        self.line_start_x = pdf.get_x()
+        self.line_end_x = self.line_start_x + 65
+        pdf.line(self.line_start_x, self.sig_y_pos + 7, self.line_end_x, self.sig_y_pos + 7)  # 署名のための下線
+        # 【変わる部分③】署名画像と、右下の日付は render() で書き足します。
+
+    def render(self, explainer_name, signature, today):
+        # 1枚の確認書PDFを作って、PDFのデータを返します。
+        # signature には、署名画像のファイルの場所か、画像データ（bytes か BytesIOなど）か、
+        # 線のデータ（signature_vector.py で作ったもの）を渡します。
+        return self.render_pages([(explainer_name, signature)], today)
+
+    def render_pages(self, entries, today):
+        # 何人分かの確認書を、1つのPDF（1人1ページ）にまとめて作ります。
+        # entries は (説明者の名前, 署名画像) の並びです。
+        # フォントの埋め込みはPDF全体で1回だけなので、1枚ずつ作るよりずっと軽く済みます。
+        with span("add_font"):
+            pdf = self._new_document()
+        with span("layout"):
+            for index, (explainer_name, signature) in enumerate(entries):
+                if index > 0:
+                    # 2ページ目からは、ページを足してから同じように書きます。
+                    # （add_page() は、前のページの最後のフォント（サイズ11）をページの先頭で選び直してくれます）
+                    pdf.add_page()
+                self._stamp(pdf, explainer_name, signature, today)
+        # fpdf が作ったデータ（bytearray）を、コピーせずにそのまま返します。
+        # （bytes() に変えると、PDFがまるごともう1つメモリの中にできてしまうためです）
+        with span("output"):
+            return pdf.output()
+
+    def _stamp(self, pdf, explainer_name, signature, today):
+        # 今のページに、覚えておいた固定部分を貼り付けて、変わる部分を書き足します。
+        pdf.pages[pdf.page].contents += self.base_stream
+        pdf.set_font(FONT_FAMILY, "", 11)
+
+        # 【変わる部分①】ガイダンスの日時（真ん中寄せ＋下線）
+        date_time_str = format_guidance_datetime(today)
+        # （幅は、前もって測っておいた1文字ずつの幅を足すだけで求めます）
+        text_width = sum(self.date_char_widths[char] for char in date_time_str)
+        start_x = (pdf.w - text_width) / 2
+        pdf.set_xy(pdf.l_margin, self.datetime_y)
+        pdf.cell(0, 8, date_time_str, align="C")
+        pdf.line(start_x, self.datetime_y + 7, start_x + text_width, self.datetime_y + 7)
+
+        # 【変わる部分②】説明者の名前
+        pdf.set_xy(pdf.l_margin + INDENT, self.explainer_y)
+        pdf.cell(UNDERLINE_LENGTH, 8, explainer_name)
+
+        # 【変わる部分③】署名画像と日付
+        # 線のデータなら、画像を使わずに、線として直接描きます。
+        if is_vector_signature(signature):
+            with span("strokes"):
+                draw_strokes(pdf, signature, x=self.line_start_x + 5, y=self.sig_y_pos - 10, w=55, h=15)
+        else:
+            if isinstance(signature, (bytes, bytearray)):
+                signature = BytesIO(signature)
+            with span("image"):
+                pdf.image(signature, x=self.line_start_x + 5, y=self.sig_y_pos - 10, w=55, h=15)
+        pdf.set_xy(self.line_end_x + 5, self.sig_y_pos)
+        pdf.cell(0, 8, format_signature_date(today), align="R")  # 右寄せで日付を記載
+
+
+# 作ったひな形を、フォントファイルと文章のかたまりごとに覚えておく場所です。
+# （データが読み直されて文章が変わったら、新しいひな形を作り、前の文章のひな形は捨てます。
+#   読み直すたびにひな形が増えて、メモリがいっぱいにならないようにするためです）
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def get_template(font_file, text):
+    # ひな形を取り出します。まだ作っていなければ、ここで1回だけ作ります。
+    key = (font_file, text)
+    template = _templates.get(key)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(key)
+            if template is None:
+                template = ConfirmationTemplate(font_file, text)
+                for old_key in [old_key for old_key in _templates if old_key[1] != text]:
+                    del _templates[old_key]
+                _templates[key] = template
+    return template
@@ -0,0 +1,217 @@
+# --- 説明者と翻訳データの「登録簿（レジストリ）」 ---
+# 以前は、説明者の名前（EXPLAINERS）・各言語の翻訳（TRANSLATIONS）・日本語のお手本（JAPANESE_TEXT）が
+# app.py の中に直接書かれていて、PDFの確認項目は pdf_template.py にも同じものがもう1つありました。
+# 説明者や言語を1つ足すだけでも、プログラムを書きかえて、デプロイし直す必要がありました。
+#
+# ここでは、data フォルダのファイルを1回だけ読み込んで、使いやすい形にそろえた
+# 「読み取り専用の写し（スナップショット）」を作ります。
+#   data/explainers.json          : 言語ごとの説明者の名前（"common" の言語の説明者は、どの言語にも出ます）
+#   data/japanese.json            : 日本語のお手本（タイトル、確認項目、最後の確認文）
+#   data/translations/<言語>.json : 各言語の翻訳（ファイルを1つ足せば、言語が1つ増えます）
+#                                   "name" には、言語選択のページに出す名前（例: "English (英語)"）を書きます
+# どのファイルにも "version"（版の番号）を書いておきます。中身を直したら、番号を1つ上げてください。
+#
+# スナップショットには、前もって
+#   ・言語ごとの説明者の並び（ファイルに書いた順番どおり、重なりなし）
+#   ・ガイダンスページにそのまま出せる「日本語と翻訳の組」の並び
+#   ・PDFのひな形（pdf_template.py）に渡す文章のかたまり
+# を作って入れておくので、リクエストのたびに組み立て直す必要はありません。
+#
+# ファイルが書きかえられたら、プロセス（ワーカー）を止めずに読み直します。（ホットリロード）
+# 読み直しに失敗したとき（JSONの書きまちがいなど）は、エラーを記録して、前のスナップショットを使い続けます。
+#
+# ファイルを直したあと、正しく読めるかどうかは、次のコマンドで確かめられます（リポジトリのフォルダで実行します）:
+#     python registry.py [data フォルダの場所]
+
+import hashlib  # hashlib: ファイルの中身から「指紋（ハッシュ）」を作る道具
+import json  # json: データのファイル（JSON）を読むための道具
+import os  # os: ファイルの場所や、書きかえた時刻を調べるための道具
+import sys  # sys: コマンドで渡された設定を読むための道具
+import threading  # threading: 同時に来たリクエストで、二重に読み直さないための「鍵」の道具
+import time  # time: 前に確かめてから、どれだけ時間がたったかを測るための道具
+from collections import namedtuple  # namedtuple: 名前つきの「組（タプル）」を作る道具
+from types import MappingProxyType  # MappingProxyType: 辞書を「読み取り専用」にする道具
+
+# 翻訳のファイルに書いておく項目です。
+TRANSLATION_KEYS = ("name", "title", "items", "final_confirmation", "signature_label", "agree_checkbox", "submit_button")
+JAPANESE_KEYS = ("title", "items", "final_confirmation")
+
+# 1つの言語の「見え方」です。
+#   translations: その言語の翻訳（読み取り専用の辞書）
+#   items: ガイダンスページに出す (日本語, 翻訳) の組の並び
+#   explainers: 説明者を選ぶページに出す名前の並び
+LanguageView = namedtuple("LanguageView", ["lang", "translations", "items", "explainers"])
+
+# PDFのひな形に渡す文章のかたまりです。（ひな形は、これごとに1つ作って覚えておきます）
+#   items: (番号, 文章) の並び、final_confirmation: 最後の確認文、extra_chars: 説明者の名前に出てくる文字
+TemplateText = namedtuple("TemplateText", ["items", "final_confirmation", "extra_chars"])
+
+
+class RegistrySnapshot(namedtuple("RegistrySnapshot", ["version", "revisions", "japanese", "languages", "explainers", "template_text"])):
+    # ある時点で読み込んだデータの、読み取り専用の写しです。
+    #   version: ファイルの中身から作った指紋です。（中身が変われば変わるので、覚えておいたページを作り直す目印にします）
+    #   revisions: ファイルごとの "version"（版の番号）
+    #   japanese: 日本語のお手本（読み取り専用の辞書）
+    #   languages: 言語ごとの LanguageView（翻訳がある言語だけ）
+    #   explainers: 言語ごとの説明者の並び（翻訳が無い言語もふくみます）
+    __slots__ = ()
+
+    def explainers_for(self, lang):
+        # その言語の説明者の並びです。知らない言語なら、どの言語にも出す説明者だけを返します。
+        return self.explainers.get(lang) or self.explainers.get(None, ())
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get("version"), int):
+        raise ValueError(f"{path}: \"version\" is missing.")
+    return data
+
+
+def _check_text(path, data, keys):
+    for key in keys:
+        value = data.get(key)
+        if key == "items":
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise ValueError(f"{path}: \"items\" must be a list of strings.")
+        elif not isinstance(value, str):
+            raise ValueError(f"{path}: \"{key}\" is missing.")
+
+
+def _files(directory):
+    # 読み込むファイルの場所を、いつも同じ順番で返します。
+    folder = os.path.join(directory, "translations")
+    names = sorted(name for name in os.listdir(folder) if name.endswith(".json"))
+    return [os.path.join(directory, "explainers.json"), os.path.join(directory, "japanese.json")] + [
+        os.path.join(folder, name) for name in names
+    ]
+
+
+def load(directory):
+    # data フォルダのファイルを全部読んで、スナップショットを作ります。
+    # ファイルが足りなかったり、形がおかしかったりしたときは、エラー（例外）にします。
+    digest = hashlib.sha256()
+    revisions = {}
+    translations = {}
+    explainers_data = japanese = None
+    for path in _files(directory):
+        with open(path, "rb") as f:
+            digest.update(os.path.relpath(path, directory).encode("utf-8") + b"\0" + f.read())
+        data = _read(path)
+        name = os.path.splitext(os.path.relpath(path, directory))[0].replace(os.sep, "/")
+        revisions[name] = data["version"]
+        if name == "explainers":
+            explainers_data = data
+        elif name == "japanese":
+            _check_text(path, data, JAPANESE_KEYS)
+            japanese = data
+        else:
+            _check_text(path, data, TRANSLATION_KEYS)
+            if len(data["items"]) != len(japanese["items"]):
+                raise ValueError(f"{path}: has {len(data['items'])} items, but japanese.json has {len(japanese['items'])}.")
+            translations[os.path.basename(name)] = data
+
+    # 説明者の並びです。"common" の言語の説明者は、どの言語の並びにも、うしろにつけます。
+    # （同じ名前が2回出てきたら、最初の1回だけにします。順番は、ファイルに書いた順番のままです）
+    by_lang = explainers_data.get("explainers")
+    if not isinstance(by_lang, dict) or not all(isinstance(names, list) for names in by_lang.values()):
+        raise ValueError("explainers.json: \"explainers\" must map languages to lists of names.")
+    common = tuple(by_lang.get(explainers_data.get("common"), []))
+    explainers = {None: common}
+    for lang in list(by_lang) + list(translations):
+        explainers[lang] = tuple(dict.fromkeys(by_lang.get(lang, []) + list(common)))
+
+    japanese_view = MappingProxyType({key: tuple(japanese[key]) if key == "items" else japanese[key] for key in JAPANESE_KEYS})
+    languages = {}
+    for lang, data in translations.items():
+        languages[lang] = LanguageView(
+            lang,
+            MappingProxyType({key: tuple(data[key]) if key == "items" else data[key] for key in TRANSLATION_KEYS}),
+            tuple(zip(japanese_view["items"], data["items"])),
+            explainers[lang],
+        )
+
+    # PDFでは、確認項目の番号（「１」）と文章を分けて書くので、最初の空白で2つに分けておきます。
+    template_text = TemplateText(
+        tuple(tuple(item.split(" ", 1)) if " " in item else ("", item) for item in japanese_view["items"]),
+        japanese_view["final_confirmation"],
+        "".join(dict.fromkeys("".join(name for names in by_lang.values() for name in names))),
+    )
+    return RegistrySnapshot(
+        digest.hexdigest()[:16],
+        MappingProxyType(revisions),
+        japanese_view,
+        MappingProxyType(languages),
+        MappingProxyType(explainers),
+        template_text,
+    )
+
+
+class Registry:
+    # 今のスナップショットを渡す窓口です。
+    # current() を呼ぶと、reload_interval 秒ごとに1回だけ、ファイルが書きかえられていないかを確かめます。
+    # （確かめるのは、ファイルの大きさと書きかえた時刻だけなので、とても軽い処理です）
+
+    def __init__(self, directory, reload_interval=30):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        # 起動時に読めないときは、そのままエラーにします。（データが無いと、どのページも作れないためです）
+        self._snapshot = load(directory)
+        self._checked = time.monotonic()
+
+    def _file_stamp(self):
+        # ファイルの場所・大きさ・書きかえた時刻の並びです。これが変わったら、読み直します。
+        stamp = []
+        for path in _files(self.directory):
+            stat = os.stat(path)
+            stamp.append((path, stat.st_size, stat.st_mtime_ns))
+        return tuple(stamp)
+
+    def current(self):
+        if self.reload_interval > 0 and time.monotonic() - self._checked >= self.reload_interval:
+            self._check()
+        return self._snapshot
+
+    def _check(self):
+        # ほかのスレッドが確かめている最中なら、待たずに今のスナップショットを使います。
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked = time.monotonic()
+            stamp = self._file_stamp()
+            if stamp != self._stamp:
+                # 読み直しに失敗しても、同じファイルで何度も失敗しないように、先に覚えておきます。
+                # （ファイルがもう一度書きかえられたら、また読み直します）
+                self._stamp = stamp
+                self.reload()
+        except Exception as e:
+            print(f"Error checking registry files: {e}")
+        finally:
+            self._lock.release()
+
+    def reload(self):
+        # ファイルを読み直して、スナップショットを入れかえます。うまくいったら True を返します。
+        # （入れかえは1回の代入なので、読んでいる途中のリクエストは、前のスナップショットをそのまま使えます）
+        try:
+            snapshot = load(self.directory)
+        except Exception as e:
+            print(f"Error reloading registry: {e}")
+            return False
+        if snapshot.version != self._snapshot.version:
+            self._snapshot = snapshot
+            print(json.dumps({"event": "registry_reload", "version": snapshot.version, "revisions": dict(snapshot.revisions)}))
+        return True
+
+
+# このファイルを直接実行したとき（python registry.py）は、データを読んで、中身の一覧を表示します。
+if __name__ == "__main__":
+    directory = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+    snapshot = load(directory)
+    print(f"version: {snapshot.version}")
+    for name, revision in snapshot.revisions.items():
+        print(f"  {name}: v{revision}")
+    for lang, view in snapshot.languages.items():
+        print(f"{lang}: {len(view.items)} items, explainers: {', '.join(view.explainers)}")
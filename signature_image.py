@@ -0,0 +1,105 @@
+# --- 署名画像を「ちょうどいい大きさ」に整える道具 ---
+# ブラウザから届く署名画像は、画面の大きさ × 画面の細かさ（devicePixelRatio）で作られるので、
+# 高画質のスマートフォンだと、ほとんどが白い余白の、とても大きなカラー画像（PNG）になります。
+# でも、PDFの署名欄は 55mm × 15mm しかありません。
+#
+# そこで、保存する前に次のように整えます。
+#   1. 線が書かれている部分だけを切り取る（余白を捨てる）
+#   2. 署名欄と同じ縦横の比率になるように、白い余白を足して真ん中に置く
+#      （PDFに貼るときに、署名が縦や横に引きのばされないようにするためです）
+#   3. PDFの署名欄に必要な細かさ（dpi）まで小さくする
+#   4. 色を「白黒の濃淡（グレースケール16段階）」か「白と黒の2色」にして、PNGを小さく保存する
+# こうすると、倉庫への保存もアップロードも、PDFの大きさも小さくなります。
+
+from io import BytesIO  # BytesIO: メモリの中のデータを「ファイル」のように扱うための道具
+
+# PDFの署名欄の大きさ（mm）です。（pdf_template.py で画像を貼る大きさと同じです）
+BOX_WIDTH_MM = 55
+BOX_HEIGHT_MM = 15
+
+# 受け取る署名画像の大きさの上限（バイト）です。これより大きいものは、開かずに断ります。
+MAX_SIGNATURE_BYTES = 512 * 1024
+
+# 開いてよい画像の画素（ピクセル）の数の上限です。（小さいファイルに見せかけた、巨大な画像を防ぎます）
+MAX_SIGNATURE_PIXELS = 16 * 1024 * 1024
+
+# これより白に近い色は「余白」とみなします。（0が黒、255が白）
+INK_THRESHOLD = 250
+
+
+def decoded_size(encoded):
+    # base64のテキストを元に戻したときの、おおよその大きさ（バイト）です。
+    # 実際に戻す（デコードする）前に、大きすぎないかを調べるために使います。
+    return len(encoded) * 3 // 4
+
+
+def normalize_signature(image_data, dpi=300, mode="L"):
+    # 署名画像（PNGなど）のデータを受け取り、整えたPNGのデータを返します。
+    # dpi: 1インチ（25.4mm）あたりの画素の数。300あれば、印刷してもきれいです。
+    # mode: "L" なら白黒の濃淡16段階（なめらか）、"1" なら白と黒の2色（いちばん小さい）
+    # PIL は読み込むだけで時間がかかるので、署名画像を初めて整えるときに読み込みます。
+    from PIL import Image  # PIL (Image): 画像ファイルを開いたり、保存したりするための道具
+
+    image = Image.open(BytesIO(image_data))
+    if image.width * image.height > MAX_SIGNATURE_PIXELS:
+        raise ValueError("Signature image is too large.")
+
+    # 透明な部分は「白い紙」の上に置いてから、白黒の濃淡にします。
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        image = Image.alpha_composite(background, image)
+    gray = image.convert("L")
+
+    # 1. 線が書かれている部分（白くないところ）を囲む四角を見つけて、切り取ります。
+    ink = gray.point(lambda value: 255 if value < INK_THRESHOLD else 0)
+    bbox = ink.getbbox()
+    if bbox:
+        gray = gray.crop(bbox)
+
+    # 2. 署名欄と同じ比率になるように、白い余白を足して真ん中に置きます。
+    box_ratio = BOX_WIDTH_MM / BOX_HEIGHT_MM
+    width, height = gray.size
+    if width / height > box_ratio:
+        canvas_size = (width, max(height, round(width / box_ratio)))
+    else:
+        canvas_size = (max(width, round(height * box_ratio)), height)
+    canvas = Image.new("L", canvas_size, 255)
+    canvas.paste(gray, ((canvas_size[0] - width) // 2, (canvas_size[1] - height) // 2))
+
+    # 3. 署名欄に必要な細かさまで小さくします。（もともと小さい画像は、大きくはしません）
+    target_size = (round(BOX_WIDTH_MM / 25.4 * dpi), round(BOX_HEIGHT_MM / 25.4 * dpi))
+    if canvas.width > target_size[0]:
+        canvas = canvas.resize(target_size, Image.LANCZOS)
+
+    # 4. 色を減らして、できるだけ小さいPNGで保存します。
+    output = BytesIO()
+    if mode == "1":
+        canvas = canvas.point(lambda value: 255 if value >= 128 else 0).convert("1")
+        canvas.save(output, format="PNG", optimize=True)
+    else:
+        # 濃淡を16段階に減らして、1画素を4ビットで保存します。（線のふちのなめらかさは、ほとんど変わりません）
+        canvas = canvas.point(lambda value: value // 17 * 17).convert("P", palette=Image.ADAPTIVE, colors=16)
+        canvas.save(output, format="PNG", optimize=True, bits=4)
+    return output.getvalue()
+
+
+def check_signature(data):
+    # 保存してある署名（PNG画像か、線のデータ）が、PDFに描ける形かどうかを調べます。
+    # おかしいとき（PDFなど別のファイル、こわれた画像、途中で切れた線のデータ）は ValueError にします。
+    # （画像は、画素を全部読み込まずに、中身がこわれていないかだけを確かめるので、軽い処理です）
+    from signature_vector import decode_strokes, is_vector_signature
+
+    if is_vector_signature(data):
+        decode_strokes(data)
+        return
+
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(BytesIO(data))
+        if image.format != "PNG" or image.width * image.height > MAX_SIGNATURE_PIXELS:
+            raise ValueError("Signature is not a PNG image of a usable size.")
+        image.verify()
+    except (OSError, SyntaxError, UnidentifiedImageError) as e:
+        raise ValueError(f"Signature image is broken: {e}")
@@ -0,0 +1,210 @@
+# --- 「署名画像の置き場所（ストア）」を作る道具 ---
+# 以前は、署名画像を /sign で倉庫（Vercel Blob）に送り、/generate-pdf でまた倉庫から取ってきて、
+# PILで開き直して /tmp に保存してから、やっとPDFに貼り付けていました。
+#
+# ここでは、署名画像を2段がまえで置いておきます。
+#   1段目: メモリの中（MemoryStore）… すぐに取り出せる、小さな「手元の棚」です。
+#          古いものから順に捨てる（LRU）ので、置きすぎてメモリがあふれることはありません。
+#   2段目: 本当の保存先（バックエンド）… Vercel Blob（BlobBackend）か、
+#          手元のフォルダ（DiskBackend。テストや開発用の「代わりの倉庫」です）。
+# /generate-pdf では、まず手元の棚を見て、無いときだけ倉庫まで取りに行きます。
+#
+# 置くものの名前（鍵）は、中身から作った「指紋（ハッシュ）」にします（content_key()）。
+# 同じ中身なら同じ名前になるので、ボタンの二度押しや、やり直しのリクエストが来ても、
+#   ・すでに倉庫に置いたもの（索引に場所が残っているもの）は、もう一度アップロードしません
+#   ・同じ材料から作るPDFは、もう一度作らずに、手元の棚にあるものを返します（get_or_create()）
+# 以前のように「日時」で名前をつけると、同じ秒に来た2つの署名が、同じ名前になってしまうこともありました。
+
+import hashlib  # hashlib: 中身から「指紋（ハッシュ）」を作って、名前にするための道具
+import os  # os: フォルダやファイルの場所を扱うための道具
+import shutil  # shutil: 開いたファイルの中身を、少しずつ別のファイルに写すための道具
+import threading  # threading: 同時に来たリクエストが、棚を同時にさわって壊さないようにする「鍵」の道具
+import time  # time: 「いつ棚に置いたか」を覚えておくための道具
+from collections import OrderedDict  # OrderedDict: 「入れた順番」を覚えてくれる辞書。古いものから捨てるのに使います
+
+
+class MemoryStore:
+    # メモリの中の「手元の棚」です。
+    # max_bytes: 棚に置ける画像の合計の大きさ（バイト）
+    # ttl: 棚に置いておく時間（秒）。これを過ぎたものは、もう使いません。
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=60 * 60):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._items = OrderedDict()  # key -> (置いた時刻, 画像データ)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            stored_at, data = item
+            # 時間が過ぎていたら、棚から捨てます。
+            if time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            # 使ったものは「最近使った」側（うしろ）に動かします。
+            self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        # 1つで棚があふれてしまうほど大きいものは、置きません。
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (time.monotonic(), data)
+            self._size += len(data)
+            # 棚があふれたら、一番長く使われていないもの（先頭）から捨てます。
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._items)))
+
+    def _remove(self, key):
+        _, data = self._items.pop(key)
+        self._size -= len(data)
+
+
+class BlobBackend:
+    # 本当の保存先「インターネット上の倉庫（Vercel Blob）」です。
+    # 実際のやりとりは BlobClient（blob_client.py）に任せます。
+
+    def __init__(self, client):
+        self.client = client
+
+    def put(self, key, data, content_type="image/png"):
+        # 倉庫に画像を送って、その「公開URL」を返します。
+        return self.client.put(key, data, content_type)
+
+    def get(self, key, location):
+        # 公開URL（location）から、画像を取ってきます。
+        return self.client.get(location)
+
+    def delete(self, key, location):
+        # 倉庫から消します。（月ごとのまとめファイルを作ったあとの、お片付け（export.py）で使います）
+        self.client.delete([location])
+
+    def list(self, prefix):
+        # 名前が prefix で始まるものの (名前, 場所) の並びです。（記録帳の「日誌のかけら」を集めるときに使います）
+        return self.client.list(prefix)
+
+
+class DiskBackend:
+    # 手元のフォルダを「倉庫」の代わりに使います。（テストや開発用）
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        # 「../」などで、フォルダの外をさわられないように、ファイル名の部分だけを使います。
+        return os.path.join(self.directory, os.path.basename(key))
+
+    def put(self, key, data, content_type="image/png"):
+        path = self._path(key)
+        with open(path, "wb") as f:
+            if hasattr(data, "read"):
+                shutil.copyfileobj(data, f)
+            else:
+                f.write(data)
+        return path
+
+    def get(self, key, location):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def delete(self, key, location):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def list(self, prefix):
+        return [(name, self._path(name)) for name in sorted(os.listdir(self.directory)) if name.startswith(prefix)]
+
+
+def content_key(prefix, extension, *parts):
+    # 中身（parts）から作った指紋を使って、名前を作ります。例: "signature_3f2a...9c.png"
+    # parts には、bytes（画像やPDFのデータ）か、文字（説明者の名前や日付）を渡します。
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode("utf-8") if isinstance(part, str) else part
+        # 区切りを入れて、("ab", "c") と ("a", "bc") が同じ指紋にならないようにします。
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return f"{prefix}_{digest.hexdigest()[:32]}{extension}"
+
+
+class KeyLocks:
+    # 名前（鍵）ごとの「鍵（ロック）」です。同じ名前の仕事が同時に2回動かないようにします。
+    # 名前ごとに鍵を作ると増え続けてしまうので、決まった数の鍵を、名前から選んで使い回します。
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __call__(self, key):
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class SignatureStore:
+    # 「手元の棚（memory）」と「倉庫（backend）」をまとめて使うための窓口です。
+    # （署名画像だけでなく、できあがったPDFの置き場所としても使います）
+    # max_locations: 「倉庫に置いたものの場所」を覚えておく索引の、件数の上限
+
+    def __init__(self, backend, memory=None, max_locations=10000):
+        self.backend = backend
+        self.memory = memory if memory is not None else MemoryStore()
+        self.max_locations = max_locations
+        self._locations = OrderedDict()  # key -> 倉庫での場所（URLなど）
+        self._locations_lock = threading.Lock()
+        self._put_locks = KeyLocks()
+        self._create_locks = KeyLocks()
+
+    def put(self, key, data, content_type="image/png"):
+        # 倉庫に保存してから、手元の棚にも置いておきます。戻り値は倉庫での場所（URLなど）です。
+        # 同じ名前のものをもう倉庫に置いてあれば（索引に場所が残っていれば）、アップロードせずにその場所を返します。
+        with self._put_locks(key):
+            with self._locations_lock:
+                location = self._locations.get(key)
+            if location is None:
+                location = self.backend.put(key, data, content_type)
+                with self._locations_lock:
+                    self._locations[key] = location
+                    # 索引があふれたら、古いものから忘れます。（忘れたものは、次に来たときにもう一度アップロードします）
+                    while len(self._locations) > self.max_locations:
+                        self._locations.popitem(last=False)
+        self.memory.put(key, data)
+        return location
+
+    def location(self, key):
+        # 倉庫に置いたものの場所を返します。（このプロセスで置いていない・索引から忘れたときは None です）
+        with self._locations_lock:
+            return self._locations.get(key)
+
+    def get_or_create(self, key, create):
+        # 手元の棚に key があれば、それを返します。無ければ create() を呼んで作り、棚に置いてから返します。
+        # 戻り値は (データ, 今作ったかどうか) です。
+        # 同じ名前のものを同時に頼まれたときは、1つ目が作り終わるのを待って、それを使います。
+        data = self.memory.get(key)
+        if data is not None:
+            return data, False
+        with self._create_locks(key):
+            data = self.memory.get(key)
+            if data is not None:
+                return data, False
+            data = create()
+            self.memory.put(key, data)
+            return data, True
+
+    def get(self, key, location):
+        # まず手元の棚を見て、無ければ倉庫から取ってきます。（取ってきたものは棚にも置きます）
+        data = self.memory.get(key)
+        if data is None:
+            data = self.backend.get(key, location)
+            if data is not None:
+                self.memory.put(key, data)
+        return data
@@ -0,0 +1,198 @@
+# --- 署名を「線のデータ（ベクター）」として扱う道具 ---
+# 署名を書く画面（signature_pad）は、指やマウスが通った「点の並び（ストローク）」を持っています。
+# 以前は、それを画像（PNG）にしてから送っていたので、
+#   ・送るデータが大きい（画面の大きさ × 画面の細かさの画像になります）
+#   ・PDFを作るときに、画像を開いて読み直す（デコードする）必要がある
+#   ・PDFを拡大すると、署名がぼやける
+# という問題がありました。
+#
+# ここでは、点の並びをそのまま受け取って、
+#   1. 署名欄（55mm × 15mm）に合わせて位置と大きさをそろえ、0.05mm きざみの整数にする
+#   2. 「前の点からどれだけ動いたか（差分）」だけを、小さな数ほど短くなる書き方（varint）で並べる
+# という、小さなバイナリ（数百バイト〜数KB）にして保存します。
+# PDFには、fpdf の線（パス）の機能で、なめらかな曲線として直接描きます。（画像は使いません）
+#
+# 受け取るデータ（JSON）の形:
+#     {"pen": 1.5, "strokes": [[x0, y0, x1, y1, ...], ...]}
+#   pen: 線の太さ（画面上のピクセル）、strokes: 1本の線ごとの点の並び（画面上のピクセル）
+
+import json  # json: ブラウザから届いた点の並び（JSON）を読むための道具
+
+from signature_image import BOX_HEIGHT_MM, BOX_WIDTH_MM  # signature_image: 署名欄の大きさ（このフォルダの中にあります）
+
+# 保存するデータの最初につける「目印」です。これで、PNGの署名画像と見分けます。
+MAGIC = b"SGV1"
+
+# 1mm を何きざみにするかです。（20なら 0.05mm きざみ。印刷しても、ちがいは分かりません）
+GRID = 20
+
+# 受け取る線の数と、点の数の上限です。（これより多いものは、署名ではないとみなして断ります）
+MAX_STROKES = 500
+MAX_POINTS = 20000
+
+# PDFに描く線の太さの下限と上限（mm）です。
+MIN_PEN_MM = 0.15
+MAX_PEN_MM = 0.8
+
+
+def is_vector_signature(data):
+    # data が、この道具で作った「線のデータ」かどうかを調べます。
+    return isinstance(data, (bytes, bytearray)) and data[:len(MAGIC)] == MAGIC
+
+
+def parse_strokes(text):
+    # ブラウザから届いたJSONを読んで、(線の太さ, [[(x, y), ...], ...]) を返します。
+    # 形がおかしいときは ValueError にします。
+    payload = json.loads(text)
+    pen = float(payload.get("pen", 1.5))
+    if not 0 < pen < 100:
+        raise ValueError("Signature pen width is out of range.")
+    strokes = payload["strokes"]
+    if not isinstance(strokes, list) or not strokes or len(strokes) > MAX_STROKES:
+        raise ValueError("Signature strokes are missing or too many.")
+    parsed = []
+    total = 0
+    for stroke in strokes:
+        if not isinstance(stroke, list) or not stroke or len(stroke) % 2:
+            raise ValueError("Signature stroke is malformed.")
+        values = [float(value) for value in stroke]
+        if any(not abs(value) < 1e6 for value in values):
+            raise ValueError("Signature stroke is out of range.")
+        parsed.append(list(zip(values[0::2], values[1::2])))
+        total += len(values) // 2
+    if total > MAX_POINTS:
+        raise ValueError("Signature has too many points.")
+    return pen, parsed
+
+
+def _write_varint(output, value):
+    # 0以上の整数を、7ビットずつに分けて書きます。（小さい数ほど短くなります）
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            output.append(byte | 0x80)
+        else:
+            output.append(byte)
+            return
+
+
+def _read_varint(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def _zigzag(value):
+    # マイナスの数も、小さい「0以上の数」に置きかえます。（0, -1, 1, -2, 2 … → 0, 1, 2, 3, 4 …）
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value // 2 if value % 2 == 0 else -(value + 1) // 2
+
+
+def encode_strokes(text):
+    # ブラウザから届いたJSONを、署名欄に合わせてそろえた、小さなバイナリにします。
+    pen, strokes = parse_strokes(text)
+
+    # 1. 線が書かれている部分を囲む四角を見つけます。（線の太さの半分だけ、外側に広げます）
+    xs = [x for stroke in strokes for x, _ in stroke]
+    ys = [y for stroke in strokes for _, y in stroke]
+    left, right = min(xs) - pen / 2, max(xs) + pen / 2
+    top, bottom = min(ys) - pen / 2, max(ys) + pen / 2
+    width, height = right - left, bottom - top
+
+    # 2. 署名欄と同じ比率になるように余白を足して、真ん中に置きます。（signature_image.py と同じ考え方です）
+    box_ratio = BOX_WIDTH_MM / BOX_HEIGHT_MM
+    if width / height > box_ratio:
+        canvas_width, canvas_height = width, width / box_ratio
+    else:
+        canvas_width, canvas_height = height * box_ratio, height
+    offset_x = left - (canvas_width - width) / 2
+    offset_y = top - (canvas_height - height) / 2
+    scale = BOX_WIDTH_MM * GRID / canvas_width
+
+    # 3. 0.05mm きざみの整数にして、前の点からの差分だけを書きます。
+    output = bytearray(MAGIC)
+    pen_units = round(min(max(pen * scale / GRID, MIN_PEN_MM), MAX_PEN_MM) * GRID)
+    _write_varint(output, pen_units)
+    _write_varint(output, len(strokes))
+    previous_x = previous_y = 0
+    for stroke in strokes:
+        points = []
+        for x, y in stroke:
+            point = (round((x - offset_x) * scale), round((y - offset_y) * scale))
+            # 同じきざみに重なった点は、1つにまとめます。
+            if not points or point != points[-1]:
+                points.append(point)
+        _write_varint(output, len(points))
+        for x, y in points:
+            _write_varint(output, _zigzag(x - previous_x))
+            _write_varint(output, _zigzag(y - previous_y))
+            previous_x, previous_y = x, y
+    return bytes(output)
+
+
+def decode_strokes(data):
+    # encode_strokes() で作ったバイナリを、(線の太さ(mm), [[(x, y), ...], ...]) に戻します。（位置は署名欄の左上からのmm）
+    # 途中で切れていたり、形がおかしかったりするときは ValueError にします。
+    if not is_vector_signature(data):
+        raise ValueError("Not a vector signature.")
+    try:
+        return _decode(data)
+    except IndexError:
+        raise ValueError("Vector signature is truncated.")
+
+
+def _decode(data):
+    position = len(MAGIC)
+    pen_units, position = _read_varint(data, position)
+    count, position = _read_varint(data, position)
+    if not 0 < count <= MAX_STROKES:
+        raise ValueError("Vector signature has no strokes or too many.")
+    strokes = []
+    x = y = 0
+    for _ in range(count):
+        length, position = _read_varint(data, position)
+        if not 0 < length <= MAX_POINTS:
+            raise ValueError("Vector signature stroke is malformed.")
+        points = []
+        for _ in range(length):
+            dx, position = _read_varint(data, position)
+            dy, position = _read_varint(data, position)
+            x += _unzigzag(dx)
+            y += _unzigzag(dy)
+            points.append((x / GRID, y / GRID))
+        strokes.append(points)
+    return pen_units / GRID, strokes
+
+
+def draw_strokes(pdf, data, x, y, w=BOX_WIDTH_MM, h=BOX_HEIGHT_MM):
+    # 線のデータを、PDFの (x, y) から w × h の四角の中に、なめらかな曲線で描きます。（単位はmm）
+    from fpdf.enums import PathPaintRule, StrokeCapStyle, StrokeJoinStyle
+
+    pen, strokes = decode_strokes(data)
+    scale_x, scale_y = w / BOX_WIDTH_MM, h / BOX_HEIGHT_MM
+    with pdf.new_path(paint_rule=PathPaintRule.STROKE) as path:
+        path.style.stroke_color = "#000000"
+        path.style.stroke_width = pen * scale_x
+        # 線の端と曲がり角を丸くして、ペンで書いたように見せます。
+        path.style.stroke_cap_style = StrokeCapStyle.ROUND
+        path.style.stroke_join_style = StrokeJoinStyle.ROUND
+        for stroke in strokes:
+            points = [(x + px * scale_x, y + py * scale_y) for px, py in stroke]
+            path.move_to(*points[0])
+            if len(points) == 1:
+                # 点が1つだけ（トンと押しただけ）のときは、とても短い線にして、丸い点に見せます。
+                path.line_to(points[0][0] + 0.01, points[0][1])
+                continue
+            # となりの点の「まん中」を通るように、2次のベジェ曲線でつなぎます。（角ばらずに、なめらかになります）
+            for (x1, y1), (x2, y2) in zip(points[1:-1], points[2:]):
+                path.quadratic_curve_to(x1, y1, (x1 + x2) / 2, (y1 + y2) / 2)
+            path.line_to(*points[-1])
@@ -0,0 +1,31 @@
+const canvas = document.getElementById('signature-canvas');
+const signaturePad = new SignaturePad(canvas, { backgroundColor: 'rgb(255, 255, 255)' });
+function resizeCanvas() {
+    const ratio = Math.max(window.devicePixelRatio || 1, 1);
+    canvas.width = canvas.offsetWidth * ratio;
+    canvas.height = canvas.offsetHeight * ratio;
+    canvas.getContext("2d").scale(ratio, ratio);
+    signaturePad.clear();
+}
+window.addEventListener("resize", resizeCanvas);
+resizeCanvas();
+document.getElementById('clear-button').addEventListener('click', () => { signaturePad.clear(); });
+// 署名の「点の並び」を、小さなJSONにします。（座標は0.1ピクセルまでに丸めます）
+function compactStrokes() {
+    const round = (value) => Math.round(value * 10) / 10;
+    return JSON.stringify({
+        pen: (signaturePad.minWidth + signaturePad.maxWidth) / 2,
+        strokes: signaturePad.toData().map((group) => group.points.flatMap((point) => [round(point.x), round(point.y)])),
+    });
+}
+const form = document.getElementById('main-form');
+form.addEventListener('submit', (event) => {
+    if (signaturePad.isEmpty()) {
+        alert("署名が入力されていません。");
+        event.preventDefault();
+    } else if (form.dataset.signatureMode === 'vector') {
+        document.getElementById('signature-strokes').value = compactStrokes();
+    } else {
+        document.getElementById('signature-data').value = signaturePad.toDataURL('image/png');
+    }
+});
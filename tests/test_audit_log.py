@@ -0,0 +1,70 @@
+# --- audit_log.py のテスト ---
+# 記録帳の書き込みと、倉庫に置く「日誌のかけら」のまとめ方を、代わりの倉庫（DiskBackend）で確かめます。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python -m pytest -q tests
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audit_log import JOURNAL_PREFIX, AuditLog, compact_journal, import_journal  # noqa: E402
+from signature_store import DiskBackend  # noqa: E402
+
+
+def segments(backend):
+    return backend.list(JOURNAL_PREFIX)
+
+
+def test_unusable_path_fails_at_startup(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        AuditLog(str(tmp_path / "missing" / "audit.sqlite3"))
+
+
+def test_journal_is_batched(tmp_path):
+    backend = DiskBackend(str(tmp_path / "store"))
+    log = AuditLog(str(tmp_path / "audit.sqlite3"), journal=backend, journal_rows=5, journal_interval=3600)
+    for index in range(4):
+        log.record("sign", signature_key=f"signature_{index}.png")
+        log._queue.join()
+    # 5件たまるまでは、かけらを置きません。
+    assert segments(backend) == []
+    log.record("sign", signature_key="signature_4.png")
+    log.flush()
+    assert len(segments(backend)) == 1
+    # flush() は、たまっている分が少なくても置きます。
+    log.record("pdf", pdf_key="confirmation_0.pdf")
+    log.flush()
+    assert len(segments(backend)) == 2
+    assert len(log.find()) == 6
+
+
+def test_queue_is_bounded(tmp_path):
+    log = AuditLog(str(tmp_path / "audit.sqlite3"), max_pending=2)
+    # 書き込みのスレッドを動かさずに並べて、あふれた分が捨てられることを確かめます。
+    log._start_writer = lambda: None
+    for index in range(3):
+        log.record("sign", signature_key=f"signature_{index}.png")
+    assert log.dropped == 1
+    assert log._queue.qsize() == 2
+
+
+def test_compact_journal_keeps_every_record(tmp_path):
+    backend = DiskBackend(str(tmp_path / "store"))
+    log = AuditLog(str(tmp_path / "audit.sqlite3"), journal=backend, journal_rows=1)
+    for index in range(3):
+        log.record("sign", signature_key=f"signature_{index}.png")
+        log.flush()
+    assert len(segments(backend)) == 3
+    assert compact_journal(log) == (3, 3)
+    merged = segments(backend)
+    assert len(merged) == 1
+    # まとめたかけらから取り込み直しても、記録は全部そろっています。
+    restored = AuditLog(str(tmp_path / "restored.sqlite3"))
+    assert import_journal(restored, [merged[0][1]]) == 3
+    assert sorted(row["signature_key"] for row in restored.find()) == [f"signature_{index}.png" for index in range(3)]
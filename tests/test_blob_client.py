@@ -0,0 +1,114 @@
+# --- blob_client.py のテスト ---
+# 手元の「にせものの倉庫」（benchmarks/fake_blob_server.py）を裏側に立ち上げて、
+# やり直し（リトライ）・間のあけ方（バックオフ）・待ち時間の上限（タイムアウト）・順番待ちの列の上限を確かめます。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python -m pytest -q tests
+
+import os
+import random
+import sys
+import threading
+import time
+
+import pytest
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from blob_client import BlobClient, UploadQueue  # noqa: E402
+from fake_blob_server import start_server  # noqa: E402
+
+
+@pytest.fixture
+def blob_server():
+    server, base_url = start_server("127.0.0.1")
+    yield server, base_url
+    server.shutdown()
+
+
+def test_put_and_get(blob_server):
+    server, base_url = blob_server
+    client = BlobClient("test", base_url=base_url, backoff=0)
+    url = client.put("signature_abc.png", bytearray(b"png bytes"), "image/png")
+    # 名前のうしろに文字を足さないので、公開URLの最後は、いつも渡した名前のままです。
+    assert url.endswith("/signature_abc.png")
+    assert client.get(url) == b"png bytes"
+    assert server.put_count == 1
+
+
+def test_list(blob_server):
+    server, base_url = blob_server
+    client = BlobClient("test", base_url=base_url, backoff=0)
+    for name in ("audit_1.jsonl", "audit_2.jsonl", "signature_abc.png"):
+        client.put(name, b"data", "application/octet-stream")
+    found = client.list("audit_")
+    assert [name for name, _ in found] == ["audit_1.jsonl", "audit_2.jsonl"]
+    assert client.get(found[0][1]) == b"data"
+
+
+def test_retries_until_success(blob_server):
+    server, base_url = blob_server
+    server.fail_rate = 0.5
+    random.seed(1)
+    client = BlobClient("test", base_url=base_url, retries=20, backoff=0)
+    for index in range(10):
+        client.put(f"item_{index}", b"data", "application/octet-stream")
+    # 全部保存できていて、そのために何回かやり直しています。
+    assert server.put_count == 10
+    assert server.attempt_count > 10
+
+
+def test_gives_up_after_retries(blob_server):
+    server, base_url = blob_server
+    server.fail_rate = 1.0
+    client = BlobClient("test", base_url=base_url, retries=2, backoff=0)
+    with pytest.raises(requests.RequestException):
+        client.put("item", b"data", "application/octet-stream")
+    # 最初の1回と、やり直しの2回です。
+    assert server.attempt_count == 3
+    assert server.put_count == 0
+
+
+def test_backoff_waits_between_retries(blob_server):
+    server, base_url = blob_server
+    server.fail_rate = 1.0
+    client = BlobClient("test", base_url=base_url, retries=2, backoff=0.2)
+    started = time.perf_counter()
+    with pytest.raises(requests.RequestException):
+        client.put("item", b"data", "application/octet-stream")
+    # 1回目のやり直しはすぐに、2回目は backoff × 2 = 0.4秒 待ってから送ります。
+    assert time.perf_counter() - started >= 0.35
+
+
+def test_timeout(blob_server):
+    server, base_url = blob_server
+    server.delay = 1.0
+    client = BlobClient("test", base_url=base_url, timeout=(1, 0.2), retries=0, backoff=0)
+    started = time.perf_counter()
+    with pytest.raises(requests.RequestException):
+        client.put("item", b"data", "application/octet-stream")
+    # 倉庫の返事（1秒後）を待たずに、あきらめています。
+    assert time.perf_counter() - started < 0.9
+
+
+def test_upload_queue_is_bounded():
+    queue = UploadQueue(workers=1, max_pending=2)
+    release = threading.Event()
+    futures = [queue.submit(release.wait) for _ in range(3)]
+    # 上限（2つ）をこえた3つ目は、並べずに捨てます。
+    assert futures[2] is None
+    assert queue.dropped == 1
+    release.set()
+    for future in futures[:2]:
+        future.result()
+    # 終わった分だけ、また並べられるようになります。（終わったあとの片付けは、少しだけ遅れることがあります）
+    deadline = time.monotonic() + 5
+    future = queue.submit(lambda: "done")
+    while future is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+        future = queue.submit(lambda: "done")
+    assert future.result() == "done"
+    queue.shutdown()
@@ -0,0 +1,114 @@
+# --- export.py のテスト ---
+# 日誌のかけらから記録帳を作り直して探すことと、--compact のお片付け（まとめファイルを上書きしないこと）を、
+# 代わりの倉庫（DiskBackend）で確かめます。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python -m pytest -q tests
+
+import datetime
+import os
+import sys
+import zipfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import export  # noqa: E402
+from audit_log import AuditLog  # noqa: E402
+from export import check_merged, compact, find_documents, new_archive_key, write_zip  # noqa: E402
+from signature_store import DiskBackend  # noqa: E402
+
+
+def store_pdf(backend, audit_log, name, hour):
+    # 確認書PDFを1枚、倉庫に置いて、app.py と同じ「pdf_stored」の記録を書きます。
+    pdf_key = f"confirmation_{name}.pdf"
+    location = backend.put(pdf_key, f"%PDF {name}".encode(), "application/pdf")
+    audit_log.record(
+        "pdf_stored",
+        timestamp=datetime.datetime(2025, 10, 7, hour),
+        lang="vi",
+        explainer=name,
+        signature_key=f"signature_{name}.png",
+        pdf_key=pdf_key,
+        extra={"location": location},
+    )
+    audit_log.flush()
+
+
+def export_zip(backend, documents, path):
+    def fetch(document):
+        return backend.get(document.pdf_key, document.location)
+
+    with open(path, "wb") as f:
+        writer = write_zip(documents, fetch, f)
+        try:
+            while True:
+                next(writer)
+        except StopIteration as stop:
+            return stop.value
+
+
+def entries(path):
+    with zipfile.ZipFile(path) as archive:
+        return sorted(name for name in archive.namelist() if name != "index.json")
+
+
+def test_find_documents_reads_the_whole_journal(tmp_path):
+    backend = DiskBackend(str(tmp_path / "store"))
+    before = AuditLog(str(tmp_path / "before.sqlite3"), journal=backend, journal_rows=1)
+    store_pdf(backend, before, "A", 10)
+    # 起動し直したあと（手元の記録帳は空っぽ）でも、かけらから探せます。
+    after = AuditLog(str(tmp_path / "after.sqlite3"), journal=backend, journal_rows=1)
+    assert after.find() == []
+    assert [document.pdf_key for document in find_documents(after, "2025-10")] == ["confirmation_A.pdf"]
+
+
+def test_compacting_twice_keeps_the_first_archive(tmp_path):
+    backend = DiskBackend(str(tmp_path / "store"))
+    audit_log = AuditLog(str(tmp_path / "audit.sqlite3"), journal=backend, journal_rows=1)
+
+    store_pdf(backend, audit_log, "A", 10)
+    first_path = str(tmp_path / "first.zip")
+    index, missing, _ = export_zip(backend, find_documents(audit_log, "2025-10"), first_path)
+    first, _ = compact(backend, audit_log, first_path, new_archive_key("2025-10"), index, missing, "2025-10")
+
+    store_pdf(backend, audit_log, "B", 11)
+    second_path = str(tmp_path / "second.zip")
+    index, missing, archived = export_zip(backend, find_documents(audit_log, "2025-10"), second_path)
+    assert [entry["archive"] for entry in archived] == [first]
+    second, _ = compact(backend, audit_log, second_path, new_archive_key("2025-10"), index, missing, "2025-10")
+
+    # 2つ目のまとめファイルは別の名前なので、1つ目（Aが入っています）はそのまま残ります。
+    assert first != second
+    assert entries(first) == ["2025-10-07/vi_A_confirmation_A.pdf"]
+    assert entries(second) == ["2025-10-07/vi_B_confirmation_B.pdf"]
+    assert backend.list("confirmation_") == []
+    documents = {document.pdf_key: document.archive for document in find_documents(audit_log, "2025-10")}
+    assert documents == {"confirmation_A.pdf": first, "confirmation_B.pdf": second}
+
+
+def test_compact_refuses_to_overwrite(tmp_path):
+    backend = DiskBackend(str(tmp_path / "store"))
+    audit_log = AuditLog(str(tmp_path / "audit.sqlite3"))
+    store_pdf(backend, audit_log, "A", 10)
+    path = str(tmp_path / "export.zip")
+    index, missing, _ = export_zip(backend, find_documents(audit_log, "2025-10"), path)
+    backend.put("archive_2025-10.zip", b"older archive", "application/zip")
+    with pytest.raises(Exception):
+        compact(backend, audit_log, path, "archive_2025-10.zip", index, missing, "2025-10")
+    # 何も上書きせず、何も消していません。
+    assert backend.get("archive_2025-10.zip", None) == b"older archive"
+    assert backend.get("confirmation_A.pdf", None) == b"%PDF A"
+
+
+def test_merged_pdf_is_capped(tmp_path, monkeypatch):
+    backend = DiskBackend(str(tmp_path / "store"))
+    audit_log = AuditLog(str(tmp_path / "audit.sqlite3"))
+    store_pdf(backend, audit_log, "A", 10)
+    store_pdf(backend, audit_log, "B", 11)
+    documents = find_documents(audit_log, "2025-10")
+    monkeypatch.setattr(export, "MAX_MERGED_DOCUMENTS", 1)
+    with pytest.raises(ValueError):
+        check_merged(documents)
@@ -0,0 +1,125 @@
+# --- signature_store.py のテスト ---
+# 手元の棚（MemoryStore）の「古いものから捨てる（LRU）」と「時間切れ（TTL）」、
+# 代わりの倉庫（DiskBackend）を、本物の倉庫（Vercel Blob）なしで確かめます。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python -m pytest -q tests
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import signature_store  # noqa: E402
+from signature_store import DiskBackend, MemoryStore, SignatureStore  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # 棚が使う時計を、テストの中で進められる「にせものの時計」にかえます。
+    now = [1000.0]
+    monkeypatch.setattr(signature_store.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_memory_store_evicts_least_recently_used():
+    memory = MemoryStore(max_bytes=10)
+    memory.put("a", b"aaaa")
+    memory.put("b", b"bbbb")
+    # "a" を使ったので、次にあふれたときに捨てられるのは "b" です。
+    assert memory.get("a") == b"aaaa"
+    memory.put("c", b"cccc")
+    assert memory.get("b") is None
+    assert memory.get("a") == b"aaaa"
+    assert memory.get("c") == b"cccc"
+
+
+def test_memory_store_skips_items_larger_than_the_shelf():
+    memory = MemoryStore(max_bytes=4)
+    memory.put("big", b"12345")
+    assert memory.get("big") is None
+
+
+def test_memory_store_expires_items(clock):
+    memory = MemoryStore(ttl=60)
+    memory.put("a", b"data")
+    clock[0] += 60
+    assert memory.get("a") == b"data"
+    clock[0] += 1
+    assert memory.get("a") is None
+    # 時間切れで捨てたので、棚の大きさも元に戻っています。
+    assert memory._size == 0
+
+
+def test_disk_backend_round_trip(tmp_path):
+    backend = DiskBackend(str(tmp_path / "store"))
+    location = backend.put("signature_abc.png", b"png bytes")
+    assert backend.get("signature_abc.png", location) == b"png bytes"
+    backend.delete("signature_abc.png", location)
+    assert backend.get("signature_abc.png", location) is None
+
+
+def test_disk_backend_stays_inside_its_folder(tmp_path):
+    backend = DiskBackend(str(tmp_path / "store"))
+    location = backend.put("../outside.png", b"data")
+    # 「../」は無視して、フォルダの中に置きます。
+    assert os.path.dirname(location) == str(tmp_path / "store")
+    assert not (tmp_path / "outside.png").exists()
+
+
+def test_store_falls_back_to_the_backend(tmp_path):
+    backend = DiskBackend(str(tmp_path / "store"))
+    location = backend.put("signature_abc.png", b"png bytes")
+    store = SignatureStore(backend, MemoryStore())
+    # 手元の棚に無いものは倉庫から取ってきて、棚にも置きます。
+    assert store.get("signature_abc.png", location) == b"png bytes"
+    backend.delete("signature_abc.png", location)
+    assert store.get("signature_abc.png", location) == b"png bytes"
+
+
+class CountingBackend(DiskBackend):
+    # 倉庫に何回アップロードしたかを数える、代わりの倉庫です。
+    def __init__(self, directory):
+        super().__init__(directory)
+        self.put_count = 0
+
+    def put(self, key, data, content_type="image/png"):
+        self.put_count += 1
+        return super().put(key, data, content_type)
+
+
+def test_store_skips_repeat_uploads(tmp_path):
+    backend = CountingBackend(str(tmp_path / "store"))
+    store = SignatureStore(backend, MemoryStore())
+    assert store.location("signature_abc.png") is None
+    first = store.put("signature_abc.png", b"png bytes")
+    second = store.put("signature_abc.png", b"png bytes")
+    assert first == second == store.location("signature_abc.png")
+    assert backend.put_count == 1
+
+
+def test_store_forgets_old_locations(tmp_path):
+    backend = CountingBackend(str(tmp_path / "store"))
+    store = SignatureStore(backend, MemoryStore(), max_locations=1)
+    store.put("a.png", b"a")
+    store.put("b.png", b"b")
+    # 索引から忘れたものは、もう一度アップロードします。
+    assert store.location("a.png") is None
+    store.put("a.png", b"a")
+    assert backend.put_count == 3
+
+
+def test_get_or_create_runs_create_once(tmp_path):
+    store = SignatureStore(DiskBackend(str(tmp_path / "store")), MemoryStore())
+    calls = []
+
+    def create():
+        calls.append(1)
+        return b"%PDF"
+
+    assert store.get_or_create("confirmation_abc.pdf", create) == (b"%PDF", True)
+    assert store.get_or_create("confirmation_abc.pdf", create) == (b"%PDF", False)
+    assert len(calls) == 1
@@ -0,0 +1,69 @@
+# --- signature_vector.py のテスト ---
+# 署名の「線のデータ」を小さなバイナリにして（encode_strokes）、元に戻せること（decode_strokes）と、
+# 途中で切れたデータや形のおかしいデータを、エラー（ValueError）にできることを確かめます。
+#
+# 使い方（リポジトリのフォルダで実行します）:
+#     python -m pytest -q tests
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from signature_vector import (  # noqa: E402
+    BOX_HEIGHT_MM,
+    BOX_WIDTH_MM,
+    GRID,
+    MAGIC,
+    decode_strokes,
+    encode_strokes,
+    is_vector_signature,
+)
+
+STROKES = {"pen": 2, "strokes": [[0, 0, 100, 50, 200, 0], [50, 80, 150, 80]]}
+
+
+def test_round_trip():
+    data = encode_strokes(json.dumps(STROKES))
+    assert is_vector_signature(data)
+    pen, strokes = decode_strokes(data)
+    assert [len(stroke) for stroke in strokes] == [3, 2]
+    # 署名欄の中に収まっていて、線の形（点どうしの位置関係）も元のままです。
+    for stroke in strokes:
+        for x, y in stroke:
+            assert 0 <= x <= BOX_WIDTH_MM and 0 <= y <= BOX_HEIGHT_MM
+    (x0, y0), (x1, y1), (x2, y2) = strokes[0]
+    assert x1 - x0 == pytest.approx(x2 - x1, abs=1 / GRID)
+    assert y0 == pytest.approx(y2, abs=1 / GRID)
+    assert (x1 - x0) / (y1 - y0) == pytest.approx(2, rel=0.02)
+    assert pen > 0
+
+
+def test_repeated_points_are_merged():
+    data = encode_strokes(json.dumps({"strokes": [[0, 0, 0, 0, 100, 30]]}))
+    _, strokes = decode_strokes(data)
+    assert len(strokes[0]) == 2
+
+
+def test_truncated_data_is_rejected():
+    data = encode_strokes(json.dumps(STROKES))
+    # どこで切れていても、IndexError ではなく ValueError になります。
+    for end in range(len(MAGIC), len(data)):
+        with pytest.raises(ValueError):
+            decode_strokes(data[:end])
+
+
+def test_malformed_data_is_rejected():
+    with pytest.raises(ValueError):
+        decode_strokes(b"\x89PNG\r\n\x1a\n")
+    # 線の数が0本のもの
+    with pytest.raises(ValueError):
+        decode_strokes(MAGIC + b"\x05\x00")
+    with pytest.raises(ValueError):
+        encode_strokes(json.dumps({"strokes": [[0, 0, 1]]}))
+    with pytest.raises(ValueError):
+        encode_strokes(json.dumps({"strokes": []}))